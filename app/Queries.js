@@ -41,11 +41,23 @@ import { AddMessageContext, LocationsInfoContext, SizeContext, SpeciesInfoContex
  */
 export default function Queries({loadingCollections}) {
   const QUERY_RESULTS_SHOW_DELAY_SEC = 5
+  const QUERY_STATUS_POLL_MSEC = 1000
+  const QUERY_STAGE_NAMES = {'crawl': 'Loading collections',
+                             'filter': 'Filtering collections',
+                             'DrSandersonOutput': 'Generating Dr. Sanderson\'s output',
+                             'DrSandersonAllPictures': 'Generating Dr. Sanderson\'s pictures',
+                             'csvRaw': 'Generating all results',
+                             'csvLocation': 'Generating locations',
+                             'csvSpecies': 'Generating species',
+                             'imageDownloads': 'Generating image downloads',
+                            };
   const theme = useTheme();
   const apiRef = useGridApiRef(); // TODO: Auto size columns of grids using this api
   const dividerRef = React.useRef();   // Used for sizeing
   const expandCollapseRef = React.useRef();   // Used for sizeing
   const queryInterval = React.useRef(60);   // The current interval value
+  const activeQueryJob = React.useRef(null);   // The ID of the running query job
+  const loadingTabs = React.useRef({});   // The query result tabs being fetched
   const addMessage = React.useContext(AddMessageContext); // Function adds messages for display
   const locationItems = React.useContext(LocationsInfoContext); // Locations
   const queryToken = React.useContext(TokenContext);  // Login token
@@ -59,6 +71,7 @@ export default function Queries({loadingCollections}) {
   const [filterHeight, setFilterHeight] = React.useState(240); // Used to force redraw when new filter added
   const [isExpanded, setIsExpanded] = React.useState(false); // Used to indicate the filters are expanded
   const [queryCancelled, setQueryCancelled] = React.useState(false); // Used to indicate the user cancelled the query
+  const [queryProgress, setQueryProgress] = React.useState(null); // Description of the query's progress
   const [queryRedraw, setQueryRedraw] = React.useState(null); // Used to force redraw when new filter added
   const [queryResults, setQueryResults] = React.useState(null); // Used to store query results
   const [serverURL, setServerURL] = React.useState(utils.getServer());  // The server URL to use
@@ -238,6 +251,26 @@ export default function Queries({loadingCollections}) {
     return formData;
   }
 
+  /**
+   * Returns a description of the progress of a query job
+   * @function
+   * @param {object} jobStatus The status of the query job
+   * @returns {string} Returns the description of the job's current stage
+   */
+  function getQueryProgressText(jobStatus) {
+    if (!jobStatus.stage) {
+      return 'Waiting for the query to start';
+    }
+
+    const stageInfo = jobStatus.stages.find((item) => item.name === jobStatus.stage);
+    const stageName = QUERY_STAGE_NAMES[jobStatus.stage] || jobStatus.stage;
+    if (stageInfo && stageInfo.total > 1) {
+      return stageName + ' (' + stageInfo.done + ' of ' + stageInfo.total + ')';
+    }
+
+    return stageName;
+  }
+
   /**
    * Makes the call to get the query data and saves the results
    * @function
@@ -252,7 +285,95 @@ export default function Queries({loadingCollections}) {
     // Setup the UI for the query 
     setWaitingOnQuery(queryId);
     setQueryRedraw(queryId);
+    setQueryProgress(null);
     activeQuery = queryId;
+    activeQueryJob.current = null;
+
+    // Handles a failed query
+    const queryFailed = (err) => {
+      console.log('CATCH ERROR: ',err);
+      if (activeQuery === queryId) {
+        activeQuery = null;
+        activeQueryJob.current = null;
+        setWaitingOnQuery(null);
+        addMessage(Level.Error, 'An error was detected while executing the query', 'Query Error Detected');
+      }
+    };
+
+    // Shows the results of the query
+    const showResults = (respData) => {
+      // TODO: handle no results
+      console.log('QUERY:',respData);
+      if (activeQuery === queryId && Object.keys(respData).length > 0) {
+        const time_diff_sec = (waitingOnQuery - Date.now()) / 1000.0;
+        if (Math.round(time_diff_sec) < QUERY_RESULTS_SHOW_DELAY_SEC) {
+          setQueryResults(respData);
+          setIsExpanded(false);
+        } else  {
+          window.setTimeout(() => setQueryResults(respData), time_diff_sec * 1000);
+        }
+        activeQuery = null;
+        setWaitingOnQuery(null);
+      } else {
+        if (Object.keys(respData).length <= 0) {
+          addMessage(Level.Information, 'The query returned no results. Please adjust your query and try again');
+        }
+        activeQuery = null;
+        setWaitingOnQuery(null);
+      }
+      activeQueryJob.current = null;
+    };
+
+    // Checks on the query job until it's done
+    const checkQueryJob = (jobId) => {
+      if (activeQueryJob.current !== jobId) {
+        return;
+      }
+
+      const statusUrl = serverURL + '/queryStatus?t=' + encodeURIComponent(queryToken) + '&j=' + encodeURIComponent(jobId);
+      fetch(statusUrl, {
+        method: 'GET'
+      }).then(async (resp) => {
+          if (resp.ok) {
+            return resp.json();
+          } else {
+            throw new Error(`Failed to get query status: ${resp.status}`, {cause:resp});
+          }
+        })
+        .then((jobStatus) => {
+          if (activeQueryJob.current !== jobId) {
+            return;
+          }
+
+          switch(jobStatus.status) {
+            case 'queued':
+            case 'running':
+              setQueryProgress(getQueryProgressText(jobStatus));
+              window.setTimeout(() => checkQueryJob(jobId), QUERY_STATUS_POLL_MSEC);
+              break;
+
+            case 'done': {
+              const resultUrl = serverURL + '/queryResult?t=' + encodeURIComponent(queryToken) + '&j=' + encodeURIComponent(jobId);
+              fetch(resultUrl, {
+                method: 'GET'
+              }).then(async (resp) => {
+                  if (resp.ok) {
+                    return resp.json();
+                  } else {
+                    throw new Error(`Failed to get query results: ${resp.status}`, {cause:resp});
+                  }
+                })
+                .then((respData) => showResults(respData))
+                .catch(queryFailed);
+              break;
+            }
+
+            default:
+              throw new Error(`Query was not completed: ${jobStatus.status}`);
+          }
+        })
+        .catch(queryFailed);
+    };
 
     // Make the query
     try {
@@ -267,53 +388,44 @@ export default function Queries({loadingCollections}) {
           }
         })
         .then((respData) => {
-          // TODO: handle no results
-          console.log('QUERY:',respData);
-          if (activeQuery === queryId && Object.keys(respData).length > 0) {
-            const time_diff_sec = (waitingOnQuery - Date.now()) / 1000.0;
-            if (Math.round(time_diff_sec) < QUERY_RESULTS_SHOW_DELAY_SEC) {
-              setQueryResults(respData);
-              setIsExpanded(false);
-            } else  {
-              window.setTimeout(() => setQueryResults(respData), time_diff_sec * 1000);
-            }
-            activeQuery = null;
-            setWaitingOnQuery(null);
-          } else {
-            if (Object.keys(respData).length <= 0) {
-              addMessage(Level.Information, 'The query returned no results. Please adjust your query and try again');
-            }
-            activeQuery = null;
-            setWaitingOnQuery(null);
-          }
-        })
-        .catch(function(err) {
-          console.log('CATCH ERROR: ',err);
           if (activeQuery === queryId) {
-            activeQuery = null;
-            setWaitingOnQuery(null);
-            addMessage(Level.Error, 'An error was detected while executing the query', 'Query Error Detected');
+            activeQueryJob.current = respData.jobId;
+            checkQueryJob(respData.jobId);
           }
-        });
+        })
+        .catch(queryFailed);
     } catch (error) {
       console.log('HAVE ERROR:', error);
       if (activeQuery === queryId) {
         activeQuery = null;
+        activeQueryJob.current = null;
         setWaitingOnQuery(null);
         addMessage(Level.Error, 'An error ocurred while executing the query', 'Query Error');
       }
     }
-  }, [activeQuery, addMessage, getQueryFormData, queryToken, serverURL, setIsExpanded, setQueryRedraw, setQueryResults,
-                                                                    setWaitingOnQuery, waitingOnQuery, QUERY_RESULTS_SHOW_DELAY_SEC]);
+  }, [activeQuery, addMessage, getQueryFormData, queryToken, serverURL, setIsExpanded, setQueryProgress, setQueryRedraw,
+                          setQueryResults, setWaitingOnQuery, waitingOnQuery, QUERY_RESULTS_SHOW_DELAY_SEC, QUERY_STATUS_POLL_MSEC]);
 
   /**
    * Handles cancelling a query
    * @function
    */
   const cancelQuery = React.useCallback(() => {
+    const jobId = activeQueryJob.current;
+    activeQueryJob.current = null;
     setWaitingOnQuery(null);
     setQueryCancelled(true);
-  }, [setQueryCancelled, setWaitingOnQuery]);
+
+    // Let the server know to stop working on the query
+    if (jobId) {
+      const cancelUrl = serverURL + '/queryCancel?t=' + encodeURIComponent(queryToken) + '&j=' + encodeURIComponent(jobId);
+      fetch(cancelUrl, {
+        method: 'POST'
+      }).catch(function(err) {
+          console.log('CANCEL ERROR: ',err);
+        });
+    }
+  }, [queryToken, serverURL, setQueryCancelled, setWaitingOnQuery]);
 
   /**
    * Internal TabPanel element type
@@ -361,6 +473,68 @@ export default function Queries({loadingCollections}) {
     };
   }
 
+  /**
+   * Returns the tabs of the query results that are shown to the user
+   * @function
+   * @param {object} queryResults The results of the performed query
+   * @returns {array} The names of the tabs in display order
+   */
+  function getTabsOrder(queryResults) {
+    return userSettings.sandersonOutput ? queryResults.tabs.order : queryResults.tabs.order.filter((item) => !item.includes('DrSanderson'));
+  }
+
+  /**
+   * Fetches the results of a tab that the server hasn't returned yet
+   * @function
+   * @param {string} resultsId The ID of the query results the tab belongs to
+   * @param {string} tabName The name of the tab to fetch
+   */
+  const fetchQueryTab = React.useCallback((resultsId, tabName) => {
+    const tabKey = resultsId + ':' + tabName;
+    if (loadingTabs.current[tabKey]) {
+      return;
+    }
+    loadingTabs.current[tabKey] = true;
+
+    const tabUrl = serverURL + '/queryTab?t=' + encodeURIComponent(queryToken) + '&q=' + encodeURIComponent(tabName) +
+                                                                '&r=' + encodeURIComponent(resultsId);
+    fetch(tabUrl, {
+      method: 'GET'
+    }).then(async (resp) => {
+        if (resp.ok) {
+          return resp.json();
+        } else {
+          throw new Error(`Failed to get query results tab: ${resp.status}`, {cause:resp});
+        }
+      })
+      .then((tabData) => {
+        delete loadingTabs.current[tabKey];
+        setQueryResults((prevResults) => prevResults && prevResults.id === resultsId ?
+                                                        {...prevResults, [tabName]: tabData} : prevResults);
+      })
+      .catch((err) => {
+        console.log('CATCH ERROR: ',err);
+        delete loadingTabs.current[tabKey];
+        if (err.cause && err.cause.status === 422) {
+          addMessage(Level.Warning, 'These query results are no longer available. Please run the query again', 'Query Results Expired');
+        } else {
+          addMessage(Level.Error, 'An error was detected while loading the query results', 'Query Error Detected');
+        }
+      });
+  }, [addMessage, queryToken, serverURL, setQueryResults]);
+
+  // Fetch the results of the displayed tab the first time it's shown
+  React.useEffect(() => {
+    if (!queryResults || !queryResults.tabs) {
+      return;
+    }
+
+    const tabName = getTabsOrder(queryResults)[activeTab];
+    if (tabName && queryResults[tabName] === undefined) {
+      fetchQueryTab(queryResults.id, tabName);
+    }
+  }, [activeTab, fetchQueryTab, queryResults, userSettings]);
+
   /**
    * Handles the user downloading information
    * @function
@@ -393,6 +567,15 @@ export default function Queries({loadingCollections}) {
    */ 
   function generateResultPanel(queryResults, tabName, tabIndex) {
 
+    // Show that we're waiting if the tab's results haven't been fetched yet
+    if (queryResults[tabName] === undefined) {
+      return (
+          <Grid container direction="row" alignItems="center" justifyContent="center" sx={{height:'100%'}}>
+            <CircularProgress variant="indeterminate" />
+          </Grid>
+      );
+    }
+
       // Generate a textarea to display the results if we aren't generating a data grid
     if (queryResults.columns[tabName] == undefined) {
       return (
@@ -589,7 +772,7 @@ export default function Queries({loadingCollections}) {
    * @returns {object} The UI of the query results
    */
   function generateQueryResults(queryResults, maxHeight) {
-    const tabsOrder = userSettings.sandersonOutput ? queryResults.tabs.order : queryResults.tabs.order.filter((item) => !item.includes('DrSanderson'));
+    const tabsOrder = getTabsOrder(queryResults);
     return (
       <Grid container size="grow" alignItems="start" justifyContent="start">
         <Grid size={2}  sx={{backgroundColor:"#EAEAEA", height:maxHeight+'px'}}>
@@ -691,6 +874,11 @@ export default function Queries({loadingCollections}) {
                     Working on your query, please wait...
                   </Typography>
                   <CircularProgress variant="indeterminate" />
+                  { queryProgress &&
+                    <Typography gutterBottom variant="body2" color="lightgrey">
+                      {queryProgress}
+                    </Typography>
+                  }
                   <Box>
                     <Button sx={{'flex':'1'}} size="small" onClick={cancelQuery} >Cancel</Button>
                   </Box>
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+""" Benchmarks and checks the grouped independent event counting against the image list
+    functions
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from text_formatters.analysis import Analysis, MICROSECONDS_IN_SECOND
+from text_formatters.results import Results, CUBE_YEAR, CUBE_MONTH, CUBE_LOCATION, CUBE_SPECIES
+
+# The name of our script
+SCRIPT_NAME = os.path.basename(__file__)
+
+# Default number of images to generate
+DEFAULT_IMAGE_COUNT = 200000
+# Number of locations used in the generated data
+LOCATION_COUNT = 20
+# Number of species used in the generated data
+SPECIES_COUNT = 12
+# The image intervals, in minutes, that are checked
+CHECK_INTERVALS = (0, 1, 1.5, 10, 60, 90)
+# Seed for generating repeatable data
+RANDOM_SEED = 8675309
+
+# Argparse-related definitions
+# Declare the progam description
+ARGPARSE_PROGRAM_DESC = 'Checks and times the grouped period, activity, and abundance counts ' \
+                        'against the image list functions using synthetic images'
+# Number of images help
+ARGPARSE_IMAGES_HELP = f'Number of images to generate (default {DEFAULT_IMAGE_COUNT})'
+
+
+def make_images(image_count: int) -> list:
+    """ Generates date sorted images whose gaps fall on and around the checked intervals
+    Arguments:
+        image_count: the number of images to generate
+    Return:
+        Returns the list of images
+    """
+    rand = random.Random(RANDOM_SEED)
+    # Gaps of zero, exactly an interval, and a microsecond to either side of an interval
+    interval_gaps = [0] + [round(one_interval * 60 * MICROSECONDS_IN_SECOND) + offset \
+                                for one_interval in CHECK_INTERVALS if one_interval > 0 \
+                                for offset in (-1, 0, 1)]
+    timezone = datetime.timezone(datetime.timedelta(hours=-7))
+
+    # Images come in bursts at a location so that the gaps between a group's images are often
+    # on and around the intervals
+    images = []
+    image_dt = datetime.datetime(2019, 12, 31, 20, 0, 0, tzinfo=timezone)
+    while len(images) < image_count:
+        location_id = f'LOC{rand.randrange(LOCATION_COUNT):03d}'
+        burst_species = rand.choices(range(SPECIES_COUNT), k=rand.choice((0, 1, 1, 1, 2, 3)))
+        for _ in range(min(rand.randrange(1, 9), image_count - len(images))):
+            if rand.random() < 0.7:
+                gap = rand.choice(interval_gaps)
+            else:
+                gap = rand.randrange(0, 3 * 60 * 60 * MICROSECONDS_IN_SECOND)
+            image_dt = image_dt + datetime.timedelta(microseconds=gap)
+
+            # Images can have no species, more than one species, and the same species twice
+            repeat_species = rand.choices(burst_species, k=rand.randrange(2)) \
+                                                                    if burst_species else []
+            species = [{'name': f'Common {species_idx}',
+                        'scientificName': f'Species {species_idx}',
+                        'count': str(rand.randrange(0, 6))
+                       } for species_idx in burst_species + repeat_species]
+            images.append({'loc': location_id,
+                           'name': f'image_{len(images):07d}.JPG',
+                           'image_dt': image_dt,
+                           'species': species,
+                          })
+
+    return images
+
+
+def get_image_groups(images: list) -> dict:
+    """ Groups the images by their species, location, month, and year
+    Arguments:
+        images: the date sorted images to group
+    Return:
+        Returns the date sorted images of each group
+    """
+    groups = {}
+    for one_image in images:
+        image_dt = one_image['image_dt']
+        for species_name in dict.fromkeys(one_species['scientificName'] for one_species in \
+                                                                        one_image['species']):
+            groups.setdefault((species_name, one_image['loc'], image_dt.month, image_dt.year), \
+                                                                            []).append(one_image)
+
+    return groups
+
+
+def get_list_counts(groups: dict, interval_minutes: int) -> dict:
+    """ Counts each group's periods, activities, and abundance with the image list functions
+    Arguments:
+        groups: the images of each group
+        interval_minutes: the image interval
+    Return:
+        Returns the (period, activity, abundance) of each group
+    """
+    return {group_key: (Analysis.period_for_image_list(group_images, interval_minutes),
+                        Analysis.activity_for_image_list(group_images),
+                        Analysis.abundance_for_image_list(group_images, interval_minutes, \
+                                                          group_key[0]))
+                for group_key, group_images in groups.items()}
+
+
+def get_group_arrays(images: list) -> tuple:
+    """ Returns the arrays used to count all the (species, location, month, year) groups at once
+    Arguments:
+        images: the date sorted images
+    Return:
+        Returns the group keys, and the microsecond timestamps, animal counts, and
+        first row of each group sorted by group and date
+    """
+    first_dt = images[0]['image_dt']
+    one_microsecond = datetime.timedelta(microseconds=1)
+
+    group_keys, epochs, counts = [], [], []
+    for one_image in images:
+        image_dt = one_image['image_dt']
+        image_species = {}
+        for one_species in one_image['species']:
+            image_species[one_species['scientificName']] = max(image_species.get( \
+                                one_species['scientificName'], 0), int(one_species['count']))
+        for species_name, species_count in image_species.items():
+            group_keys.append((species_name, one_image['loc'], image_dt.month, image_dt.year))
+            epochs.append((image_dt - first_dt) // one_microsecond)
+            counts.append(species_count)
+
+    # The rows are in date order so a stable sort keeps each group's rows in date order
+    unique_keys = sorted(set(group_keys))
+    key_codes = {one_key: code for code, one_key in enumerate(unique_keys)}
+    group_codes = np.array([key_codes[one_key] for one_key in group_keys], dtype=np.int64)
+    row_order = np.argsort(group_codes, kind='stable')
+    epochs = np.array(epochs, dtype=np.int64)[row_order]
+    counts = np.array(counts, dtype=np.int64)[row_order]
+    group_starts = np.searchsorted(group_codes[row_order], np.arange(len(unique_keys)))
+
+    return unique_keys, epochs, counts, group_starts
+
+
+def get_grouped_counts(group_arrays: tuple, interval_minutes: int) -> dict:
+    """ Counts each group's periods, activities, and abundance with the grouped functions
+    Arguments:
+        group_arrays: the arrays returned by get_group_arrays()
+        interval_minutes: the image interval
+    Return:
+        Returns the (period, activity, abundance) of each group
+    """
+    unique_keys, epochs, counts, group_starts = group_arrays
+    periods = Analysis.period_for_groups(epochs, group_starts, interval_minutes)
+    activities = Analysis.activity_for_groups(epochs, group_starts)
+    abundances = Analysis.abundance_for_groups(epochs, counts, group_starts, interval_minutes)
+
+    return {one_key: (int(periods[code]), int(activities[code]), int(abundances[code])) \
+                                                    for code, one_key in enumerate(unique_keys)}
+
+
+def check_results(images: list, interval_minutes: int) -> int:
+    """ Checks the counts of Results slices against the image list functions
+    Arguments:
+        images: the date sorted images
+        interval_minutes: the image interval
+    Return:
+        Returns the number of slices whose counts don't match
+    """
+    locations = [{'nameProperty': f'Location {idx}', 'idProperty': f'LOC{idx:03d}'} \
+                                                                for idx in range(LOCATION_COUNT)]
+    results = Results(({'loc': one_image['loc'], 'images': [one_image]} for one_image in images), \
+                      [], locations, 'http://localhost', 'bench', '', {}, interval_minutes)
+
+    mismatches = 0
+    for one_slice in (results.get_images(),
+                      *(results.get_year_images(one_year) for one_year in results.get_years())):
+        for one_location in results.get_locations():
+            location_slice = results.filter_location(one_slice, one_location['idProperty'])
+            for one_species in results.get_species():
+                species_name = one_species['scientificName']
+                species_slice = results.filter_species(location_slice, species_name)
+                month_slices = [results.filter_month(species_slice, one_month) \
+                                                                for one_month in range(1, 13)]
+                for one_images in [species_slice] + month_slices:
+                    expected = (Analysis.period_for_image_list(one_images, interval_minutes),
+                                Analysis.activity_for_image_list(one_images),
+                                Analysis.abundance_for_image_list(one_images, interval_minutes, \
+                                                                  species_name),
+                                Analysis.abundance_for_image_list(one_images, interval_minutes))
+                    found = (results.period_for_image_list(one_images),
+                             results.activity_for_image_list(one_images),
+                             results.abundance_for_image_list(one_images, species_name),
+                             results.abundance_for_image_list(one_images))
+                    if found != expected:
+                        print(f'{SCRIPT_NAME}: ERROR: slice {one_images.cube_key[CUBE_YEAR]} ' \
+                              f'{one_images.cube_key[CUBE_MONTH]} ' \
+                              f'{one_images.cube_key[CUBE_LOCATION]} ' \
+                              f'{one_images.cube_key[CUBE_SPECIES]} found {found} ' \
+                              f'expected {expected}')
+                        mismatches += 1
+
+    return mismatches
+
+
+def run_benchmark(image_count: int) -> None:
+    """ Runs the checks and prints the timings
+    Arguments:
+        image_count: the number of images to generate
+    """
+    images = make_images(image_count)
+    groups = get_image_groups(images)
+    group_arrays = get_group_arrays(images)
+    print(f'{SCRIPT_NAME}: generated {image_count} images in {len(groups)} ' \
+          '(species, location, month, year) groups')
+
+    mismatches = 0
+    for interval_minutes in CHECK_INTERVALS:
+        list_counts = None
+        def run_list():
+            nonlocal list_counts
+            # pylint: disable=cell-var-from-loop
+            list_counts = get_list_counts(groups, interval_minutes)
+
+        grouped_counts = None
+        def run_grouped():
+            nonlocal grouped_counts
+            # pylint: disable=cell-var-from-loop
+            grouped_counts = get_grouped_counts(group_arrays, interval_minutes)
+
+        list_elapsed = timeit.timeit(run_list, number=1)
+        grouped_elapsed = timeit.timeit(run_grouped, number=1)
+        print(f'{SCRIPT_NAME}: interval {interval_minutes}: image lists {list_elapsed:.3f} ' \
+              f'seconds, grouped {grouped_elapsed:.3f} seconds')
+
+        for group_key, expected in list_counts.items():
+            if grouped_counts.get(group_key) != expected:
+                print(f'{SCRIPT_NAME}: ERROR: group {group_key} found ' \
+                      f'{grouped_counts.get(group_key)} expected {expected}')
+                mismatches += 1
+        if len(grouped_counts) != len(list_counts):
+            print(f'{SCRIPT_NAME}: ERROR: found {len(grouped_counts)} groups expected ' \
+                  f'{len(list_counts)}')
+            mismatches += 1
+
+    # Check the Results slices on a smaller set of the images
+    for interval_minutes in CHECK_INTERVALS:
+        mismatches += check_results(images[:min(len(images), 20000)], interval_minutes)
+
+    if mismatches:
+        print(f'{SCRIPT_NAME}: ERROR: {mismatches} counts differ from the image list functions')
+        sys.exit(1)
+    print(f'{SCRIPT_NAME}: all counts match the image list functions')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog=SCRIPT_NAME, description=ARGPARSE_PROGRAM_DESC)
+    parser.add_argument('--images', type=int, default=DEFAULT_IMAGE_COUNT,
+                        help=ARGPARSE_IMAGES_HELP)
+    args = parser.parse_args()
+
+    run_benchmark(args.images)
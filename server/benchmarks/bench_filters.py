@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+""" Benchmarks filtering uploads and images with query filters """
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import timeit
+
+import dateutil.tz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from query_filters import QueryFilter, DEFAULT_TIMEZONE_OFFSET
+from image_index import ImageIndex
+
+# The name of our script
+SCRIPT_NAME = os.path.basename(__file__)
+
+# Default number of images to generate
+DEFAULT_IMAGE_COUNT = 2000000
+# Number of images in each generated upload
+IMAGES_PER_UPLOAD = 1000
+# Number of locations used in the generated data
+LOCATION_COUNT = 50
+# Number of species used in the generated data
+SPECIES_COUNT = 30
+# Number of distinct timestamps used in the generated data
+TIMESTAMP_COUNT = 200000
+# Bucket name used for the generated data
+BENCH_BUCKET = 'sparcd-bench'
+# Seed for generating repeatable data
+RANDOM_SEED = 8675309
+
+# The filters that are timed
+BENCH_FILTERS = (('species', ['Species 1', 'Species 5', 'Species 9']),
+                 ('locations', [f'LOC{idx:03d}' for idx in range(0, LOCATION_COUNT, 2)]),
+                 ('years', json.dumps({'yearStart':2019, 'yearEnd':2023})),
+                 ('hour', list(range(6, 20))),
+                 ('startDate', datetime.datetime.fromisoformat('2019-03-01T00:00:00+00:00')),
+                 ('endDate', datetime.datetime.fromisoformat('2023-10-31T00:00:00+00:00')),
+                )
+
+# Argparse-related definitions
+# Declare the progam description
+ARGPARSE_PROGRAM_DESC = 'Times filtering a synthetic set of uploads and images'
+# Number of images help
+ARGPARSE_IMAGES_HELP = f'Number of images to generate (default {DEFAULT_IMAGE_COUNT})'
+# Skipping the legacy filtering help
+ARGPARSE_NO_LEGACY_HELP = 'Skip timing the previous, per-image match, filtering'
+
+
+def make_uploads(image_count: int) -> list:
+    """ Generates uploads containing images
+    Arguments:
+        image_count: the number of images to generate
+    Return:
+        Returns the list of uploads
+    """
+    rand = random.Random(RANDOM_SEED)
+    start_ts = datetime.datetime(2018, 1, 1).timestamp()
+    end_ts = datetime.datetime(2024, 12, 31).timestamp()
+    timestamps = [datetime.datetime.fromtimestamp(rand.uniform(start_ts, end_ts)).isoformat() \
+                                                                for _ in range(TIMESTAMP_COUNT)]
+    species = [[{'name': f'Common {idx}', 'scientificName': f'Species {idx}', 'count': '1'}] \
+                                                                for idx in range(SPECIES_COUNT)]
+
+    uploads = []
+    for upload_idx in range(0, (image_count + IMAGES_PER_UPLOAD - 1) // IMAGES_PER_UPLOAD):
+        upload_name = f'upload_{upload_idx:05d}'
+        first_image = upload_idx * IMAGES_PER_UPLOAD
+        images = [{'name': f'image_{image_idx:07d}.JPG',
+                   'timestamp': timestamps[rand.randrange(TIMESTAMP_COUNT)],
+                   'bucket': BENCH_BUCKET,
+                   's3_path': f'Collections/bench/Uploads/{upload_name}/image_{image_idx:07d}.JPG',
+                   'species': species[rand.randrange(SPECIES_COUNT)],
+                  } for image_idx in range(first_image, min(first_image + IMAGES_PER_UPLOAD, \
+                                                                                image_count))]
+        uploads.append({'bucket': BENCH_BUCKET,
+                        'name': upload_name,
+                        'info': {'name': upload_name,
+                                 'loc': f'LOC{upload_idx % LOCATION_COUNT:03d}',
+                                 'elevation': 1000 + upload_idx % 500,
+                                 'images': images}})
+
+    return uploads
+
+
+# pylint: disable=too-many-branches
+def legacy_filter_uploads(uploads_info: tuple, filters: tuple) -> list:
+    """ The previous filtering that matched every filter against every image
+    Arguments:
+        uploads_info: the tuple of uploads to filter
+        filters: the filters to apply to the uploads
+    Return:
+        Returns the list of upload information with their matching images
+    """
+    cur_uploads = uploads_info
+    for one_filter in filters:
+        if one_filter[0] == 'locations':
+            cur_uploads = [one_upload for one_upload in cur_uploads if \
+                            one_upload['info']['loc'] in one_filter[1]]
+
+    years_filter = None
+    start_date_ts = ([one_filter[1] for one_filter in filters if one_filter[0] == 'startDate'] \
+                                                                                    + [None])[0]
+    end_date_ts = ([one_filter[1] for one_filter in filters if one_filter[0] == 'endDate'] \
+                                                                                    + [None])[0]
+
+    matches = []
+    for one_upload in cur_uploads:
+        cur_images = []
+        for one_image in one_upload['info']['images']:
+            excluded = False
+            image_dt = None
+            if 'timestamp' in one_image and one_image['timestamp']:
+                image_dt = datetime.datetime.fromisoformat(one_image['timestamp'])
+                if image_dt and (image_dt.tzinfo is None or \
+                                        image_dt.tzinfo.utcoffset(image_dt) is None):
+                    image_dt = image_dt.replace(tzinfo=\
+                                    dateutil.tz.tzoffset(None,DEFAULT_TIMEZONE_OFFSET))
+
+            for one_filter in filters:
+                match(one_filter[0]):
+                    case 'dayofweek':
+                        if image_dt is None or image_dt.weekday() not in one_filter[1]:
+                            excluded = True
+                    case 'hour':
+                        if image_dt is None or image_dt.hour not in one_filter[1]:
+                            excluded = True
+                    case 'month':
+                        if image_dt is None or image_dt.month not in one_filter[1]:
+                            excluded = True
+                    case 'species':
+                        found = False
+                        for one_species in one_image['species']:
+                            if one_species['scientificName'] in one_filter[1]:
+                                found = True
+                        if not found:
+                            excluded = True
+                    case 'years':
+                        if years_filter is None:
+                            years_filter = json.loads(one_filter[1])
+                        if image_dt is None or not years_filter['yearStart'] <= image_dt.year <= \
+                                                                            years_filter['yearEnd']:
+                            excluded = True
+                    case 'endDate':
+                        if image_dt is None or image_dt > end_date_ts:
+                            excluded = True
+                    case 'startDate':
+                        if image_dt is None or image_dt < start_date_ts:
+                            excluded = True
+
+                if excluded:
+                    break
+
+            if not excluded:
+                one_image['image_dt'] = image_dt
+                cur_images.append(one_image)
+
+        if len(cur_images) > 0:
+            matches.append((one_upload, cur_images))
+
+    return [cur_upload['info']|{'images':cur_images} for cur_upload,cur_images in matches]
+
+
+def get_match_keys(results: list) -> list:
+    """ Returns the identifying information of the matched images
+    Arguments:
+        results: the filtering results
+    Return:
+        Returns the list of image paths and datetimes
+    """
+    return [(one_image['s3_path'], one_image['image_dt']) for one_result in results \
+                                                        for one_image in one_result['images']]
+
+
+def run_benchmark(image_count: int, run_legacy: bool) -> None:
+    """ Runs the benchmark and prints the timings
+    Arguments:
+        image_count: the number of images to generate
+        run_legacy: time the previous filtering when True
+    """
+    uploads = make_uploads(image_count)
+    print(f'{SCRIPT_NAME}: generated {image_count} images in {len(uploads)} uploads')
+
+    results = []
+    def run_compiled():
+        nonlocal results
+        results = QueryFilter(BENCH_FILTERS).filter_uploads(uploads)
+
+    elapsed = timeit.timeit(run_compiled, number=1)
+    match_count = sum(len(one_result['images']) for one_result in results)
+    print(f'{SCRIPT_NAME}: compiled filters: {elapsed:.3f} seconds, ' \
+          f'{image_count / elapsed:,.0f} images/second, {match_count} matches')
+
+    image_index = None
+    def build_index():
+        nonlocal image_index
+        image_index = ImageIndex(uploads)
+
+    elapsed = timeit.timeit(build_index, number=1)
+    print(f'{SCRIPT_NAME}: image index build: {elapsed:.3f} seconds')
+
+    index_results = None
+    def run_index():
+        nonlocal index_results
+        index_results = image_index.filter(QueryFilter(BENCH_FILTERS))
+
+    elapsed = timeit.timeit(run_index, number=1)
+    print(f'{SCRIPT_NAME}: image index filters: {elapsed:.3f} seconds, ' \
+          f'{image_count / elapsed:,.0f} images/second')
+    if get_match_keys(results) != get_match_keys(index_results):
+        print(f'{SCRIPT_NAME}: ERROR: image index results differ from the compiled filters')
+        sys.exit(1)
+
+    if run_legacy:
+        legacy_results = None
+        def run_legacy_filter():
+            nonlocal legacy_results
+            legacy_results = legacy_filter_uploads(uploads, BENCH_FILTERS)
+
+        elapsed = timeit.timeit(run_legacy_filter, number=1)
+        print(f'{SCRIPT_NAME}: previous filtering: {elapsed:.3f} seconds, ' \
+              f'{image_count / elapsed:,.0f} images/second')
+
+        if get_match_keys(results) != get_match_keys(legacy_results):
+            print(f'{SCRIPT_NAME}: ERROR: filtered images differ from the previous filtering')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog=SCRIPT_NAME, description=ARGPARSE_PROGRAM_DESC)
+    parser.add_argument('--images', type=int, default=DEFAULT_IMAGE_COUNT,
+                        help=ARGPARSE_IMAGES_HELP)
+    parser.add_argument('--no_legacy', action='store_true', help=ARGPARSE_NO_LEGACY_HELP)
+    args = parser.parse_args()
+
+    run_benchmark(args.images, not args.no_legacy)
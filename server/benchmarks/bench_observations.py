@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+""" Benchmarks assembling images from an observations.csv file """
+
+import argparse
+import csv
+import os
+import sys
+import timeit
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from s3_access import assemble_observation_images, get_common_name
+
+# The name of our script
+SCRIPT_NAME = os.path.basename(__file__)
+
+# Default number of observation rows to generate
+DEFAULT_ROW_COUNT = 100000
+# Default number of rows to run through the previous, list searching, assembly
+DEFAULT_LEGACY_ROW_COUNT = 10000
+# Number of observations generated per image
+OBSERVATIONS_PER_IMAGE = 2
+# Bucket name used for the generated data
+BENCH_BUCKET = 'sparcd-bench'
+
+# Argparse-related definitions
+# Declare the progam description
+ARGPARSE_PROGRAM_DESC = 'Times assembling images from a synthetic observations.csv file'
+# Number of rows help
+ARGPARSE_ROWS_HELP = f'Number of observation rows to generate (default {DEFAULT_ROW_COUNT})'
+# Number of legacy rows help
+ARGPARSE_LEGACY_ROWS_HELP = 'Number of observation rows to time with the previous list ' \
+                            f'searching assembly (default {DEFAULT_LEGACY_ROW_COUNT}, 0 to skip)'
+
+
+def make_observations_csv(row_count: int) -> str:
+    """ Generates observations CSV data
+    Arguments:
+        row_count: the number of rows to generate
+    Return:
+        Returns the CSV data as a string
+    """
+    out_data = StringIO()
+    writer = csv.writer(out_data)
+    for row in range(row_count):
+        image_index = row // OBSERVATIONS_PER_IMAGE
+        csv_row = [''] * 20
+        csv_row[0] = str(row)
+        csv_row[3] = f'Collections/bench/Uploads/upload/image_{image_index:07d}.JPG'
+        csv_row[4] = '2024-05-01T12:00:00'
+        csv_row[8] = f'Species {row % 17}'
+        csv_row[9] = '1'
+        csv_row[19] = f'[COMMONNAME:Common {row % 17}]'
+        writer.writerow(csv_row)
+
+    return out_data.getvalue()
+
+
+def legacy_assemble(csv_data: str, bucket: str) -> list:
+    """ The previous assembly that searched the image list for every row
+    Arguments:
+        csv_data: the CSV data to assemble
+        bucket: the bucket of the images
+    Return:
+        Returns the list of images
+    """
+    cur_images = []
+    for csv_info in csv.reader(StringIO(csv_data)):
+        if len(csv_info) >= 20:
+            cur_species = { 'name':get_common_name(csv_info[19]), \
+                            'scientificName':csv_info[8], \
+                            'count':csv_info[9]}
+
+            image_name = os.path.basename(csv_info[3].rstrip('/\\'))
+            temp_image = [one_image for one_image in cur_images if \
+                                one_image['name'] == image_name and \
+                                one_image['bucket'] == bucket and \
+                                one_image['s3_path'] == csv_info[3]]
+            if temp_image:
+                temp_image[0]['species'].append(cur_species)
+            else:
+                cur_images.append({ 'name':image_name,
+                                    'timestamp':csv_info[4],
+                                    'bucket': bucket,
+                                    's3_path': csv_info[3],
+                                    'species':[cur_species]})
+
+    return cur_images
+
+
+def run_benchmark(row_count: int, legacy_row_count: int) -> None:
+    """ Runs the benchmark and prints the timings
+    Arguments:
+        row_count: the number of rows to time the assembly with
+        legacy_row_count: the number of rows to time the previous assembly with
+    """
+    csv_data = make_observations_csv(row_count)
+    elapsed = timeit.timeit(lambda: assemble_observation_images(StringIO(csv_data), \
+                                                        BENCH_BUCKET, None, 'bench'), number=1)
+    print(f'{SCRIPT_NAME}: assemble_observation_images {row_count} rows: {elapsed:.3f} seconds')
+
+    if legacy_row_count > 0:
+        csv_data = make_observations_csv(legacy_row_count)
+        new_images = list(assemble_observation_images(StringIO(csv_data), BENCH_BUCKET, None, \
+                                                                            'bench').values())
+        if new_images != legacy_assemble(csv_data, BENCH_BUCKET):
+            print(f'{SCRIPT_NAME}: ERROR: assembled images differ from the previous assembly')
+            sys.exit(1)
+
+        elapsed = timeit.timeit(lambda: assemble_observation_images(StringIO(csv_data), \
+                                                        BENCH_BUCKET, None, 'bench'), number=1)
+        print(f'{SCRIPT_NAME}: assemble_observation_images {legacy_row_count} rows: ' \
+              f'{elapsed:.3f} seconds')
+        elapsed = timeit.timeit(lambda: legacy_assemble(csv_data, BENCH_BUCKET), number=1)
+        print(f'{SCRIPT_NAME}: previous list searching assembly {legacy_row_count} rows: ' \
+              f'{elapsed:.3f} seconds')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog=SCRIPT_NAME, description=ARGPARSE_PROGRAM_DESC)
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROW_COUNT, help=ARGPARSE_ROWS_HELP)
+    parser.add_argument('--legacy_rows', type=int, default=DEFAULT_LEGACY_ROW_COUNT,
+                        help=ARGPARSE_LEGACY_ROWS_HELP)
+    args = parser.parse_args()
+
+    run_benchmark(args.rows, args.legacy_rows)
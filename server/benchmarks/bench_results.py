@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+""" Benchmarks generating Dr. Sanderson's output from query results """
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from bench_filters import make_uploads, BENCH_BUCKET, LOCATION_COUNT
+from format_dr_sanderson import get_dr_sanderson_output, render_sections_parallel, \
+                                start_report_workers
+from query_filters import QueryFilter
+from text_formatters.analysis import Analysis
+from text_formatters.results import Results
+
+# The name of our script
+SCRIPT_NAME = os.path.basename(__file__)
+
+# Default number of images to generate
+DEFAULT_IMAGE_COUNT = 500000
+# The start of the line of Dr. Sanderson's output that changes between runs
+ELAPSED_TIME_LINE_START = 'ELAPSED TIME'
+
+# Argparse-related definitions
+# Declare the progam description
+ARGPARSE_PROGRAM_DESC = 'Times generating Dr. Sanderson\'s output from synthetic query results'
+# Number of images help
+ARGPARSE_IMAGES_HELP = f'Number of images to generate (default {DEFAULT_IMAGE_COUNT})'
+# Skipping the legacy results help
+ARGPARSE_NO_LEGACY_HELP = 'Skip timing the previous, list scanning, results'
+# Number of report processes help
+ARGPARSE_REPORT_WORKERS_HELP = 'Also time formatting the output\'s sections with this many ' \
+                               'processes (default 0 to skip)'
+
+
+class LegacyResults(Results):
+    """ The previous results that scanned the images for every filter """
+
+    def _build_cube(self, images: tuple) -> tuple:
+        """ Skips building the image cube """
+        return {}, tuple({} for _ in range(5)), set()
+
+    def get_location_images(self, location_id: str) -> tuple:
+        """ Returns the pre-filtered images of a location """
+        return self._location_images.get(location_id, ())
+
+    def get_species_images(self, species_sci_name: str) -> tuple:
+        """ Returns the pre-filtered images of a species """
+        return self._species_images.get(species_sci_name, ())
+
+    def get_year_images(self, year: int) -> tuple:
+        """ Returns the pre-filtered images of a year """
+        return self._year_images.get(year, ())
+
+    def filter_year(self, images: tuple, year: int) -> tuple:
+        """ Scans the images for the year """
+        return [one_image for one_image in images if one_image['image_dt'].year == year]
+
+    def filter_hours(self, images: tuple, hour_start: int, hour_end: int) -> tuple:
+        """ Scans the images for the hour range """
+        return [one_image for one_image in images if \
+                                            one_image['image_dt'].hour >= hour_start and \
+                                            one_image['image_dt'].hour < hour_end]
+
+    def filter_month(self, images: tuple, month: int) -> tuple:
+        """ Scans the images for the month """
+        return [one_image for one_image in images if one_image['image_dt'].month == month]
+
+    def filter_location(self, images: tuple, location_id: str) -> tuple:
+        """ Scans the images for the location """
+        return [one_image for one_image in images if one_image['loc'] == location_id]
+
+    def filter_species(self, images: tuple, species_sci_name: str) -> tuple:
+        """ Scans the images for the species """
+        return [one_image for one_image in images if \
+                                            Analysis.image_has_species(one_image, species_sci_name)]
+
+    def activity_for_image_list(self, images: tuple) -> int:
+        """ Counts the activities of the images every time """
+        return Analysis.activity_for_image_list(images)
+
+    def period_for_image_list(self, images: tuple) -> int:
+        """ Counts the periods of the images every time """
+        return Analysis.period_for_image_list(images, self.get_interval())
+
+    def abundance_for_image_list(self, images: tuple, species_filter: str=None) -> int:
+        """ Counts the abundance of the images every time """
+        return Analysis.abundance_for_image_list(images, self.get_interval(), species_filter)
+
+
+def make_locations() -> list:
+    """ Generates the locations used by the generated images
+    Return:
+        Returns the list of locations
+    """
+    return [{'nameProperty': f'Location {idx}',
+             'idProperty': f'LOC{idx:03d}',
+             'latProperty': 32.0 + idx / 100.0,
+             'lngProperty': -110.0 - idx / 100.0,
+             'elevationProperty': 1000.0 + idx * 10.0,
+             'utm_code': '12R',
+             'utm_x': 500000.0 + idx * 100.0,
+             'utm_y': 3500000.0 + idx * 100.0,
+            } for idx in range(LOCATION_COUNT)]
+
+
+def get_report_lines(report: str) -> list:
+    """ Returns the lines of Dr. Sanderson's output that don't change between runs
+    Arguments:
+        report: the output
+    Return:
+        Returns the list of lines
+    """
+    return [one_line for one_line in report.splitlines() \
+                                            if not one_line.startswith(ELAPSED_TIME_LINE_START)]
+
+
+def run_benchmark(image_count: int, run_legacy: bool, report_workers: int) -> None:
+    """ Runs the benchmark and prints the timings
+    Arguments:
+        image_count: the number of images to generate
+        run_legacy: time the previous results when True
+        report_workers: the number of processes to time formatting the sections with, or 0
+    Notes:
+        When there are fewer cores than report processes, the parallel time on enough cores is
+        estimated from the measured time and the share of the processes each core ran
+    """
+    query_results = QueryFilter(()).filter_uploads(make_uploads(image_count))
+    all_locations = make_locations()
+    print(f'{SCRIPT_NAME}: generated {image_count} images in {len(query_results)} uploads')
+
+    timings = []
+    for results_class in (LegacyResults, Results) if run_legacy else (Results,):
+        results = None
+        def build_results():
+            nonlocal results
+            # pylint: disable=cell-var-from-loop
+            results = results_class(query_results, [], all_locations, 'http://localhost', \
+                                    BENCH_BUCKET, '', {}, 60)
+
+        elapsed = timeit.timeit(build_results, number=1)
+        print(f'{SCRIPT_NAME}: {results_class.__name__} build: {elapsed:.3f} seconds')
+
+        report = None
+        def run_report(report_results: Results=results):
+            nonlocal report
+            report = get_dr_sanderson_output(report_results)
+
+        elapsed = timeit.timeit(run_report, number=1)
+        print(f'{SCRIPT_NAME}: {results_class.__name__} Dr. Sanderson output: ' \
+              f'{elapsed:.3f} seconds')
+        if results_class is Results:
+            reduction_stats = results.get_reduction_stats()
+            print(f'{SCRIPT_NAME}: analysis reuse: {reduction_stats["hits"]} hits ' \
+                  f'{reduction_stats["misses"]} misses {reduction_stats["uncached"]} uncached ' \
+                  f'({reduction_stats["hit_rate"]:.1%})')
+        timings.append((elapsed, get_report_lines(report)))
+
+    if report_workers > 0:
+        start_report_workers(report_workers)
+        def run_parallel_report():
+            nonlocal report
+            report = ''.join(render_sections_parallel(results, report_workers))
+
+        elapsed = timeit.timeit(run_parallel_report, number=1)
+        print(f'{SCRIPT_NAME}: Dr. Sanderson output with {report_workers} processes: ' \
+              f'{elapsed:.3f} seconds')
+        core_count = os.cpu_count() or 1
+        if core_count < report_workers:
+            print(f'{SCRIPT_NAME}: estimated with a core for each process: ' \
+                  f'{elapsed * core_count / report_workers:.3f} seconds')
+        if get_report_lines(report) != timings[-1][1]:
+            print(f'{SCRIPT_NAME}: ERROR: Dr. Sanderson output differs when formatted in parallel')
+            sys.exit(1)
+
+    if run_legacy:
+        print(f'{SCRIPT_NAME}: speedup: {timings[0][0] / timings[1][0]:.1f}x')
+        if timings[0][1] != timings[1][1]:
+            print(f'{SCRIPT_NAME}: ERROR: Dr. Sanderson output differs from the previous results')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog=SCRIPT_NAME, description=ARGPARSE_PROGRAM_DESC)
+    parser.add_argument('--images', type=int, default=DEFAULT_IMAGE_COUNT,
+                        help=ARGPARSE_IMAGES_HELP)
+    parser.add_argument('--no_legacy', action='store_true', help=ARGPARSE_NO_LEGACY_HELP)
+    parser.add_argument('--report_workers', type=int, default=0,
+                        help=ARGPARSE_REPORT_WORKERS_HELP)
+    args = parser.parse_args()
+
+    run_benchmark(args.images, not args.no_legacy, args.report_workers)
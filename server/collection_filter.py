@@ -0,0 +1,211 @@
+""" Filters the saved uploads of a collection, either on the calling thread or in a
+    worker process """
+
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import threading
+from typing import Iterator, Optional
+
+from sparcd_db import SPARCdDatabase
+from query_filters import QueryFilter
+from image_index import get_image_index, save_image_index
+
+
+# Environment variable name for the number of processes used to filter collections
+ENV_NAME_QUERY_WORKERS = 'SPARCD_QUERY_WORKERS'
+# Default number of processes used to filter collections (0 filters on the request thread)
+QUERY_WORKERS_DEFAULT = 0
+# Working number of processes used to filter collections
+QUERY_WORKERS = max(0, int(os.environ.get(ENV_NAME_QUERY_WORKERS, QUERY_WORKERS_DEFAULT)))
+
+# The pool of processes used to filter collections
+_WORKER_POOL = None
+_WORKER_POOL_LOCK = threading.Lock()
+
+# The database connections of a worker process keyed by the database path
+_WORKER_DATABASES = {}
+
+
+def filter_upload_images(db: SPARCdDatabase, s3_url: str, bucket: str, \
+                         query_filter: QueryFilter) -> Optional[list]:
+    """ Filters a collection's saved images by first intersecting the posting lists of
+        the species, location, and year filters
+    Arguments:
+        db: connections to the current database
+        s3_url: the URL to the S3 instance
+        bucket: the bucket of the collection
+        query_filter: the compiled filters
+    Return:
+        Returns the filtered results, or None if the collection's images aren't available
+    Notes:
+        Only the images in the intersection are loaded, so the cost of a selective query
+        depends on the number of matches and not on the size of the collection
+    """
+    posting_sizes = db.get_image_posting_sizes(s3_url, bucket, query_filter)
+    if posting_sizes is None:
+        return db.get_upload_images(s3_url, bucket, query_filter)
+
+    # Start with the shortest posting list and intersect it with each of the longer ones,
+    # either by looking up the current IDs in the longer list or by loading the list when
+    # that's cheaper
+    image_ids = None
+    for size, kind, values in posting_sizes:
+        if image_ids is not None and size < len(image_ids) * len(values):
+            posting_ids = db.get_image_postings(s3_url, bucket, kind, values)
+            if posting_ids is not None:
+                posting_ids = tuple(sorted(set(image_ids).intersection(posting_ids)))
+        else:
+            posting_ids = db.get_image_postings(s3_url, bucket, kind, values, image_ids)
+        if posting_ids is None:
+            return db.get_upload_images(s3_url, bucket, query_filter)
+
+        image_ids = posting_ids
+        if not image_ids:
+            break
+
+    return db.get_upload_images(s3_url, bucket, query_filter, image_ids)
+
+
+def filter_saved_collection(db: SPARCdDatabase, s3_url: str, bucket: str, uploads_version: tuple, \
+                            query_filter: QueryFilter) -> Iterator[dict]:
+    """ Filters a collection's current uploads in the database
+    Arguments:
+        db: connections to the current database
+        s3_url: the URL to the S3 instance
+        bucket: the bucket of the collection
+        uploads_version: the version of the collection's saved uploads
+        query_filter: the compiled filters
+    Return:
+        Yields the upload information with its matching images for each upload that
+        has matches
+    Notes:
+        The collection's in-memory image index is used when it's loaded. Otherwise, queries
+        for specific species, locations, or years are filtered by the database using its
+        posting lists, and all other queries build the image index
+    """
+    image_index = get_image_index(s3_url, bucket, uploads_version)
+    if image_index is None and query_filter.is_selective:
+        # Have the database find the matches instead of loading every upload
+        cur_results = filter_upload_images(db, s3_url, bucket, query_filter)
+        if cur_results is not None:
+            yield from cur_results
+            return
+
+    if image_index is None:
+        uploads_info = db.get_uploads(s3_url, bucket, None)
+        image_index = save_image_index(s3_url, bucket, uploads_version, \
+                                        [{'bucket':bucket,
+                                          'name':one_upload['name'],
+                                          'info':json.loads(one_upload['json'])}
+                                                for one_upload in uploads_info or []])
+
+    yield from image_index.iter_filter(query_filter)
+
+
+def get_match_records(results: Iterator[dict]) -> tuple:
+    """ Returns the compact form of filtered results for returning from a worker process
+    Arguments:
+        results: the filtered upload information with matching images
+    Return:
+        Returns a tuple of (upload information without images, image tuples) for each
+        upload. Each image tuple has the name, timestamp, S3 path, image datetime, and a
+        tuple of the (name, scientific name, count) of its species
+    """
+    return tuple(({key: value for key, value in one_result.items() if key != 'images'},
+                  tuple((one_image['name'], one_image.get('timestamp'), one_image['s3_path'],
+                         one_image['image_dt'],
+                         tuple((one_species.get('name'), one_species.get('scientificName'),
+                                one_species.get('count')) for one_species in one_image['species']))
+                        for one_image in one_result['images']))
+                 for one_result in results)
+
+
+def expand_match_records(bucket: str, records: tuple) -> Iterator[dict]:
+    """ Yields the filtered results from their compact form
+    Arguments:
+        bucket: the bucket of the collection the records are from
+        records: the compact records returned by get_match_records()
+    Return:
+        Yields the upload information with its matching images for each upload
+    """
+    for upload_info, images in records:
+        yield upload_info | {'images': [{'name': name,
+                                         'timestamp': timestamp,
+                                         'bucket': bucket,
+                                         's3_path': s3_path,
+                                         'species': [{'name': common_name,
+                                                      'scientificName': scientific_name,
+                                                      'count': count}
+                                                for common_name, scientific_name, count in species],
+                                         'image_dt': image_dt}
+                                for name, timestamp, s3_path, image_dt, species in images]}
+
+
+def _get_worker_database(db_path: str) -> SPARCdDatabase:
+    """ Returns the worker process's connection to the database
+    Arguments:
+        db_path: the path to the database
+    Return:
+        Returns the connected database
+    """
+    db = _WORKER_DATABASES.get(db_path)
+    if db is None:
+        db = SPARCdDatabase(db_path)
+        db.connect()
+        _WORKER_DATABASES[db_path] = db
+
+    return db
+
+
+def filter_collection_worker(db_path: str, s3_url: str, bucket: str, uploads_version: tuple, \
+                             filters: tuple) -> tuple:
+    """ Filters a collection's current uploads in a worker process
+    Arguments:
+        db_path: the path to the database
+        s3_url: the URL to the S3 instance
+        bucket: the bucket of the collection
+        uploads_version: the version of the collection's saved uploads
+        filters: the filters to apply to the data
+    Return:
+        Returns the compact records of the matches as returned by get_match_records()
+    Notes:
+        The filters are compiled in the worker since compiled filters can't be pickled.
+        Each worker keeps its own image indexes
+    """
+    return get_match_records(filter_saved_collection(_get_worker_database(db_path), s3_url, \
+                                                bucket, uploads_version, QueryFilter(filters)))
+
+
+def get_worker_pool() -> Optional[concurrent.futures.ProcessPoolExecutor]:
+    """ Returns the pool of processes used to filter collections
+    Return:
+        Returns the process pool, or None if collections are filtered on the calling thread
+    Notes:
+        The worker processes are spawned instead of forked since the server is threaded
+    """
+    # pylint: disable=global-statement
+    global _WORKER_POOL
+    if QUERY_WORKERS <= 0:
+        return None
+
+    with _WORKER_POOL_LOCK:
+        if _WORKER_POOL is None:
+            _WORKER_POOL = concurrent.futures.ProcessPoolExecutor(max_workers=QUERY_WORKERS, \
+                                                mp_context=multiprocessing.get_context('spawn'))
+
+    return _WORKER_POOL
+
+
+def reset_worker_pool() -> None:
+    """ Shuts down the process pool so that a new one is started when it's next needed
+    Notes:
+        Used when a worker process has died and the pool can no longer be used
+    """
+    # pylint: disable=global-statement
+    global _WORKER_POOL
+    with _WORKER_POOL_LOCK:
+        if _WORKER_POOL is not None:
+            _WORKER_POOL.shutdown(wait=False, cancel_futures=True)
+            _WORKER_POOL = None
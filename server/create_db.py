@@ -88,6 +88,30 @@ def build_database(path: str, admin_info: tuple=None) -> None:
              'CREATE TABLE uploads(id INTEGER PRIMARY KEY ASC, s3_url TEXT NOT NULL, '\
                             'bucket TEXT NOT NULL, ' \
                             'name TEXT NOT NULL, json TEXT NOT NULL)',
+             'CREATE TABLE images(id INTEGER PRIMARY KEY ASC, s3_url TEXT NOT NULL, ' \
+                            'bucket TEXT NOT NULL, upload TEXT NOT NULL, name TEXT NOT NULL, ' \
+                            's3_path TEXT NOT NULL, timestamp TEXT, epoch INTEGER, ' \
+                            'year INTEGER, month INTEGER, weekday INTEGER, hour INTEGER, ' \
+                            'loc_id TEXT, elevation REAL)',
+             'CREATE INDEX images_bucket_epoch ON images(s3_url, bucket, epoch)',
+             'CREATE INDEX images_bucket_loc_epoch ON images(s3_url, bucket, loc_id, epoch)',
+             'CREATE TABLE observations(id INTEGER PRIMARY KEY ASC, image_id INTEGER NOT NULL, ' \
+                            'common_name TEXT, scientific_name TEXT NOT NULL, count TEXT)',
+             'CREATE INDEX observations_species_image ON observations(scientific_name, image_id)',
+             'CREATE INDEX observations_image ON observations(image_id)',
+             'CREATE TABLE image_postings(id INTEGER PRIMARY KEY ASC, s3_url TEXT NOT NULL, ' \
+                            'bucket TEXT NOT NULL, kind TEXT NOT NULL, value TEXT NOT NULL, ' \
+                            'image_id INTEGER NOT NULL)',
+             'CREATE INDEX image_postings_lookup ON image_postings(s3_url, bucket, kind, value, ' \
+                            'image_id)',
+             'CREATE INDEX image_postings_image ON image_postings(image_id)',
+             'CREATE TABLE data_versions(id INTEGER PRIMARY KEY ASC, s3_url TEXT NOT NULL, ' \
+                            'bucket TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0, ' \
+                            'UNIQUE(s3_url, bucket))',
+             'CREATE TABLE upload_locations(id INTEGER PRIMARY KEY ASC, ' \
+                            's3_url TEXT NOT NULL, bucket TEXT NOT NULL, upload TEXT NOT NULL, ' \
+                            'loc_id TEXT, elevation TEXT, version TEXT NOT NULL, ' \
+                            'timestamp INTEGER, UNIQUE(s3_url, bucket, upload))',
              'CREATE TABLE queries(id INTEGER PRIMARY KEY ASC, timestamp INTEGER, ' \
                             'token TEXT, path TEXT NOT NULL)',
              'CREATE TABLE sandbox(id INTEGER PRIMARY KEY ASC, name TEXT NOT NULL, ' \
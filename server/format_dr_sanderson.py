@@ -1,7 +1,11 @@
 """ Provides the formatting for Dr. Sanderson's results """
 
+import concurrent.futures
 import datetime
+import multiprocessing
 import os
+import traceback
+from typing import Callable
 
 from text_formatters.activity_pattern_formatter import ActivityPatternFormatter
 from text_formatters.act_per_abu_loc_formatter import ActPerAbuLocFormatter
@@ -17,6 +21,88 @@ from text_formatters.total_day_formatter import TotalDayFormatter
 from text_formatters.trap_days_and_effort_formatter import TrapDaysAndEffortFormatter
 from text_formatters.results import Results
 
+# Environment variable name for the number of processes used to format Dr. Sanderson's output
+ENV_NAME_REPORT_WORKERS = 'SPARCD_REPORT_WORKERS'
+# Default number of processes used to format Dr. Sanderson's output (0 or 1 formats on the
+# calling thread)
+REPORT_WORKERS_DEFAULT = 0
+# Working number of processes used to format Dr. Sanderson's output
+REPORT_WORKERS = max(0, int(os.environ.get(ENV_NAME_REPORT_WORKERS, REPORT_WORKERS_DEFAULT)))
+# Environment variable name for the fewest images before Dr. Sanderson's output is formatted
+# in parallel
+ENV_NAME_REPORT_PARALLEL_MIN_IMAGES = 'SPARCD_REPORT_PARALLEL_MIN_IMAGES'
+# Default fewest images before Dr. Sanderson's output is formatted in parallel (see
+# benchmarks/bench_results.py --report_workers)
+REPORT_PARALLEL_MIN_IMAGES_DEFAULT = 5000
+# Working fewest images before Dr. Sanderson's output is formatted in parallel
+REPORT_PARALLEL_MIN_IMAGES = int(os.environ.get(ENV_NAME_REPORT_PARALLEL_MIN_IMAGES, \
+                                                REPORT_PARALLEL_MIN_IMAGES_DEFAULT))
+# The way report worker processes are started: forked from a server process that has already
+# loaded the formatters when it's available, otherwise spawned
+REPORT_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() \
+                                                                                else 'spawn'
+# The analysis reduction counts that are returned by the report workers
+REPORT_REDUCTION_STATS = ('hits', 'misses', 'uncached')
+
+# The (formatter, whether it's passed the results) of each section of Dr. Sanderson's output,
+# in the order they appear
+DR_SANDERSON_SECTIONS = (
+    (HeaderFormatter.print_locations, True),
+    (HeaderFormatter.print_species, True),
+    (HeaderFormatter.print_image_analysis_header, True),
+    (FirstLastSpeciesFormatter.print_days_in_camera_trap, True),
+    (FirstLastSpeciesFormatter.print_first_pic_of_each_species, True),
+    (FirstLastSpeciesFormatter.print_last_pic_of_each_species, True),
+    (FirstLastSpeciesFormatter.print_species_accumulation_curve, True),
+    (ActPerAbuLocFormatter.print_number_of_pictures_by_year, True),
+    (ActPerAbuLocFormatter.print_number_of_pictures_by_species_by_year, True),
+    (ActPerAbuLocFormatter.print_number_of_pictures_by_percent_total, True),
+    (TrapDaysAndEffortFormatter.print_camera_trap_days, True),
+    (TrapDaysAndEffortFormatter.print_camera_trap_effort, True),
+    (TrapDaysAndEffortFormatter.print_camera_trap_effort_summary, True),
+    (LocationStatFormatter.print_percent_of_species_in_loc, True),
+    (LocationStatFormatter.print_species_by_month_by_loc_by_year, True),
+    (LocationStatFormatter.print_species_by_month_by_loc, True),
+    (LocationStatFormatter.print_distance_between_locations, True),
+    (ActivityPatternFormatter.print_activity_patterns, True),
+    (ActivityPatternFormatter.print_species_pairs_activity_similarity, True),
+    (ActivityPatternFormatter.print_specie_pair_most_similar, True),
+    (ActivityPatternFormatter.print_chi_square_analysis_paired_activity, True),
+    (LunarActivityFormatter.print_lunar_activity, True),
+    (LunarActivityFormatter.print_lunar_activity_most_different, True),
+    (ActivityPatternFormatter.print_activity_patterns_season, True),
+    (ActPerAbuLocFormatter.print_species_abundance, True),
+    (RichnessFormatter.print_location_species_richness, True),
+    (LocationStatFormatter.print_loc_species_frequency_similiarity, False),
+    (LocationStatFormatter.print_loc_species_composition_similiarity, False),
+    (SpeciesLocCoordFormatter.print_species_by_loc_with_utm, True),
+    (LocationStatFormatter.print_species_overlap_at_loc, True),
+    (OccuranceFormatter.print_chi_sq_analysis_of_paired_specie_freq, False),
+    (TotalDayFormatter.print_pictures_by_month_year_loc, True),
+    (TotalDayFormatter.print_pictures_by_month_loc, True),
+    (TotalDayFormatter.print_pictures_by_month_year_species_richness, True),
+    (TotalDayFormatter.print_pictures_by_month_species_richness, True),
+    (TotalDayFormatter.print_pictures_by_month_species_loc_elevation, True),
+    (TotalDayFormatter.print_abundance_by_month_species_loc_elevation, True),
+    (TotalDayFormatter.print_species_by_loc_elevation_and_effort, True),
+    (TotalDayFormatter.print_species_by_loc_elevation_and_effort_table, True),
+    (ActPerAbuLocFormatter.print_species_abundance_year_site, True),
+    (ActPerAbuLocFormatter.print_species_abundance_site, True),
+    (OccuranceFormatter.print_co_occurance_matrix, True),
+    (OccuranceFormatter.print_absense_presence_matrix, True),
+    (OccuranceFormatter.print_max_min_species_elevation, True),
+    (DetectionRateFormatter.print_detection_rate_species_year, True),
+    (DetectionRateFormatter.print_detection_rate_summary, True),
+    (DetectionRateFormatter.print_detection_rate_location_month, True),
+    (DetectionRateFormatter.print_detection_rate_location_month_summary, True),
+    (DetectionRateFormatter.print_detection_rate_trend, True),
+    (OccuranceFormatter.print_native_occupancy, True),
+    (LocationStatFormatter.print_area_covered_by_traps, False),
+)
+
+# The query results of a report worker process
+_WORKER_RESULTS = None
+
 def elapsed_time_formatter(start: datetime.datetime, end: datetime.datetime) -> str:
     """ Formats the elapsed time output
     Arguments:
@@ -30,69 +116,125 @@ def elapsed_time_formatter(start: datetime.datetime, end: datetime.datetime) ->
     return "ELAPSED TIME " + "{:10.3f} ".format((end-start).total_seconds()) + "SECONDS" + \
             os.linesep
 
-def get_dr_sanderson_output(results: Results) -> str:
+def start_report_workers(workers: int=None) -> None:
+    """ Starts the process that report workers are forked from when reports are formatted in
+        parallel
+    Arguments:
+        workers: the number of report processes, or None to use REPORT_WORKERS
+    Notes:
+        Call this before the server starts its threads. The process loads the formatters once
+        so that each report's workers start without importing them again
+    """
+    if (REPORT_WORKERS if workers is None else workers) <= 1 or \
+                                                    REPORT_START_METHOD != 'forkserver':
+        return
+
+    multiprocessing.get_context(REPORT_START_METHOD).set_forkserver_preload([__name__])
+    # pylint: disable=import-outside-toplevel
+    from multiprocessing import forkserver
+    forkserver.ensure_running()
+
+def _render_section(section_index: int, results: Results) -> str:
+    """ Returns the text of one section of Dr. Sanderson's output
+    Arguments:
+        section_index: the index of the section in DR_SANDERSON_SECTIONS
+        results: contains the results of the query
+    Return:
+        Returns the section's text
+    """
+    section_formatter, needs_results = DR_SANDERSON_SECTIONS[section_index]
+    return section_formatter(results) if needs_results else section_formatter()
+
+def _init_report_worker(snapshot: dict) -> None:
+    """ Loads the query results of a report worker process
+    Arguments:
+        snapshot: the snapshot of the results from Results.get_snapshot()
+    Notes:
+        The S3 credentials aren't needed to format the sections and aren't sent to the workers
+    """
+    # pylint: disable=global-statement
+    global _WORKER_RESULTS
+    _WORKER_RESULTS = Results.from_snapshot(snapshot, '', '')
+
+def _render_worker_section(section_index: int) -> tuple:
+    """ Returns the text of one section of Dr. Sanderson's output in a report worker process
+    Arguments:
+        section_index: the index of the section in DR_SANDERSON_SECTIONS
+    Return:
+        Returns a tuple of the section's text and the analysis reduction counts of formatting it
+    """
+    start_stats = _WORKER_RESULTS.get_reduction_stats()
+    section_text = _render_section(section_index, _WORKER_RESULTS)
+    end_stats = _WORKER_RESULTS.get_reduction_stats()
+
+    return section_text, {one_key: end_stats[one_key] - start_stats[one_key] \
+                                                        for one_key in REPORT_REDUCTION_STATS}
+
+def render_sections_parallel(results: Results, workers: int, progress: Callable=None) -> list:
+    """ Formats the sections of Dr. Sanderson's output in a pool of processes
+    Arguments:
+        results: contains the results of the query
+        workers: the number of processes to use
+        progress: optional function called with the number of sections done and the total
+                number of sections as each section is formatted
+    Return:
+        Returns the text of each section in the order of DR_SANDERSON_SECTIONS
+    Notes:
+        The results are sent once to each worker as a snapshot. The workers' analysis
+        reduction counts are added to the results
+    """
+    section_count = len(DR_SANDERSON_SECTIONS)
+    sections = [None] * section_count
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, section_count), \
+                                    mp_context=multiprocessing.get_context(REPORT_START_METHOD), \
+                                    initializer=_init_report_worker, \
+                                    initargs=(results.get_snapshot(),)) as executor:
+        futures = {executor.submit(_render_worker_section, section_index): section_index \
+                                                    for section_index in range(section_count)}
+        for done_count, one_future in \
+                            enumerate(concurrent.futures.as_completed(futures), start=1):
+            sections[futures[one_future]], reduction_stats = one_future.result()
+            results.add_reduction_stats(reduction_stats)
+            if progress is not None:
+                progress(done_count, section_count)
+
+    return sections
+
+def get_dr_sanderson_output(results: Results, progress: Callable=None) -> str:
     """ Converts the results to Dr Sanderson results
     Arguments:
         results: contains the results of the query
+        progress: optional function called with the number of sections done and the total
+                number of sections after each section is formatted
     Return:
         Returns the result text
+    Notes:
+        The sections are formatted in parallel when REPORT_WORKERS is set and there are at
+        least REPORT_PARALLEL_MIN_IMAGES images. They're formatted one after the other if
+        that fails
     """
     if not results:
         return "No images found under directory"
 
     start_time = datetime.datetime.now()
-    return  HeaderFormatter.print_locations(results) + \
-            HeaderFormatter.print_species(results) + \
-            HeaderFormatter.print_image_analysis_header(results) + \
-            FirstLastSpeciesFormatter.print_days_in_camera_trap(results) + \
-            FirstLastSpeciesFormatter.print_first_pic_of_each_species(results) + \
-            FirstLastSpeciesFormatter.print_last_pic_of_each_species(results) + \
-            FirstLastSpeciesFormatter.print_species_accumulation_curve(results) + \
-            ActPerAbuLocFormatter.print_number_of_pictures_by_year(results) + \
-            ActPerAbuLocFormatter.print_number_of_pictures_by_species_by_year(results) + \
-            ActPerAbuLocFormatter.print_number_of_pictures_by_percent_total(results) + \
-            TrapDaysAndEffortFormatter.print_camera_trap_days(results) + \
-            TrapDaysAndEffortFormatter.print_camera_trap_effort(results) + \
-            TrapDaysAndEffortFormatter.print_camera_trap_effort_summary(results) + \
-            LocationStatFormatter.print_percent_of_species_in_loc(results) + \
-            LocationStatFormatter.print_species_by_month_by_loc_by_year(results) + \
-            LocationStatFormatter.print_species_by_month_by_loc(results) + \
-            LocationStatFormatter.print_distance_between_locations(results) + \
-            ActivityPatternFormatter.print_activity_patterns(results) + \
-            ActivityPatternFormatter.print_species_pairs_activity_similarity(results) + \
-            ActivityPatternFormatter.print_specie_pair_most_similar(results) + \
-            ActivityPatternFormatter.print_chi_square_analysis_paired_activity(results) + \
-            LunarActivityFormatter.print_lunar_activity(results) + \
-            LunarActivityFormatter.print_lunar_activity_most_different(results) + \
-            ActivityPatternFormatter.print_activity_patterns_season(results) + \
-            ActPerAbuLocFormatter.print_species_abundance(results) + \
-            RichnessFormatter.print_location_species_richness(results) + \
-            LocationStatFormatter.print_loc_species_frequency_similiarity() + \
-            LocationStatFormatter.print_loc_species_composition_similiarity() + \
-            SpeciesLocCoordFormatter.print_species_by_loc_with_utm(results) + \
-            LocationStatFormatter.print_species_overlap_at_loc(results) + \
-            OccuranceFormatter.print_chi_sq_analysis_of_paired_specie_freq() + \
-            TotalDayFormatter.print_pictures_by_month_year_loc(results) + \
-            TotalDayFormatter.print_pictures_by_month_loc(results) + \
-            TotalDayFormatter.print_pictures_by_month_year_species_richness(results) + \
-            TotalDayFormatter.print_pictures_by_month_species_richness(results) + \
-            TotalDayFormatter.print_pictures_by_month_species_loc_elevation(results) + \
-            TotalDayFormatter.print_abundance_by_month_species_loc_elevation(results) + \
-            TotalDayFormatter.print_species_by_loc_elevation_and_effort(results) + \
-            TotalDayFormatter.print_species_by_loc_elevation_and_effort_table(results) + \
-            ActPerAbuLocFormatter.print_species_abundance_year_site(results) + \
-            ActPerAbuLocFormatter.print_species_abundance_site(results) + \
-            OccuranceFormatter.print_co_occurance_matrix(results) + \
-            OccuranceFormatter.print_absense_presence_matrix(results) + \
-            OccuranceFormatter.print_max_min_species_elevation(results) + \
-            DetectionRateFormatter.print_detection_rate_species_year(results) + \
-            DetectionRateFormatter.print_detection_rate_summary(results) + \
-            DetectionRateFormatter.print_detection_rate_location_month(results) + \
-            DetectionRateFormatter.print_detection_rate_location_month_summary(results) + \
-            DetectionRateFormatter.print_detection_rate_trend(results) + \
-            OccuranceFormatter.print_native_occupancy(results) + \
-            LocationStatFormatter.print_area_covered_by_traps() + \
-            elapsed_time_formatter(start_time, datetime.datetime.now())
+
+    sections = None
+    if REPORT_WORKERS > 1 and len(results.get_images()) >= REPORT_PARALLEL_MIN_IMAGES:
+        # pylint: disable=broad-exception-caught
+        try:
+            sections = render_sections_parallel(results, REPORT_WORKERS, progress)
+        except Exception as ex:
+            print(f'Unable to format Dr. Sanderson\'s output in parallel: {ex}', flush=True)
+            traceback.print_exception(ex)
+
+    if sections is None:
+        sections = []
+        for section_index in range(len(DR_SANDERSON_SECTIONS)):
+            sections.append(_render_section(section_index, results))
+            if progress is not None:
+                progress(len(sections), len(DR_SANDERSON_SECTIONS))
+
+    return ''.join(sections) + elapsed_time_formatter(start_time, datetime.datetime.now())
 
 def get_dr_sanderson_pictures(results: Results) -> str:
     """ Returns the pictures links for Dr Sanderson's pictures
@@ -0,0 +1,345 @@
+""" Columnar in-memory index of a collection's images used for filtering queries """
+
+import os
+import threading
+from typing import Iterator, Optional
+
+import numpy as np
+
+from query_filters import QueryFilter, get_image_datetime, get_image_time_fields, \
+                          get_epoch_microseconds
+
+
+# Environment variable name for the maximum number of images in the indexes kept in memory
+ENV_NAME_IMAGE_INDEX_MAX_IMAGES = 'SPARCD_IMAGE_INDEX_MAX_IMAGES'
+# Default maximum number of images in the indexes kept in memory
+IMAGE_INDEX_MAX_IMAGES_DEFAULT = 4000000
+# Working maximum number of images in the indexes kept in memory (0 turns off keeping them)
+IMAGE_INDEX_MAX_IMAGES = max(0, int(os.environ.get(ENV_NAME_IMAGE_INDEX_MAX_IMAGES, \
+                                                            IMAGE_INDEX_MAX_IMAGES_DEFAULT)))
+
+# The loaded image indexes keyed by (S3 URL, bucket) with a (version, ImageIndex) value
+_IMAGE_INDEXES = {}
+_IMAGE_INDEXES_LOCK = threading.Lock()
+
+
+def _get_code(codes: dict, value: object) -> int:
+    """ Returns the interned code of a value, adding the value if it's new
+    Arguments:
+        codes: the dictionary of values to codes
+        value: the value to get the code of
+    Return:
+        Returns the code of the value
+    """
+    code = codes.get(value)
+    if code is None:
+        code = len(codes)
+        codes[value] = code
+    return code
+
+
+class ImageIndex:
+    """ The images of a collection's uploads stored in contiguous arrays so that the query
+        filters can be applied as vectorized mask operations. Only the columns needed to
+        rebuild the matching images are kept, not the images themselves
+    """
+
+    # pylint: disable=too-many-instance-attributes,too-many-locals,too-many-statements
+    def __init__(self, uploads_info: tuple):
+        """ Builds the index
+        Arguments:
+            uploads_info: the uploads to index containing the 'bucket', 'name', and
+                        decoded 'info' of each upload
+        Notes:
+            Image timestamps are decoded once while building the index and any invalid
+            timestamps are reported here instead of on every query
+        """
+        self.uploads = []
+        self.upload_buckets = []
+        self.location_codes = {}
+        self.species_codes = {}
+        common_name_codes = {}
+        count_codes = {}
+
+        # Per-image columns used to rebuild the matching images
+        self.image_names = []
+        self.image_timestamps = []
+        self.image_paths = []
+
+        upload_locations = []
+        upload_elevations = []
+        image_uploads = []
+        epochs = []
+        years = []
+        months = []
+        days = []
+        hours = []
+        has_timestamps = []
+        bad_timestamps = []
+        image_obs_starts = [0]
+        obs_images = []
+        obs_species = []
+        obs_common_names = []
+        obs_counts = []
+
+        for upload_id, one_upload in enumerate(uploads_info):
+            upload_info = one_upload['info']
+            self.uploads.append({key: value for key, value in upload_info.items() \
+                                                                            if key != 'images'})
+            self.upload_buckets.append(one_upload['bucket'])
+            upload_locations.append(_get_code(self.location_codes, upload_info.get('loc')))
+            try:
+                upload_elevations.append(float(upload_info['elevation']))
+            except (KeyError, TypeError, ValueError):
+                upload_elevations.append(np.nan)
+
+            for one_image in upload_info['images']:
+                image_id = len(self.image_names)
+                self.image_names.append(one_image['name'])
+                self.image_timestamps.append(one_image.get('timestamp'))
+                self.image_paths.append(one_image['s3_path'])
+                image_uploads.append(upload_id)
+
+                image_dt = None
+                bad_timestamp = False
+                # pylint: disable=broad-exception-caught
+                try:
+                    image_dt = get_image_datetime(one_image.get('timestamp'))
+                except Exception as ex:
+                    print(f'Error converting image timestamp: {one_image["name"]} ' \
+                          f'{one_image["timestamp"]} from upload {one_upload["bucket"]} '\
+                          f'{one_upload["name"]}')
+                    print(ex)
+                    bad_timestamp = True
+
+                time_fields = get_image_time_fields(image_dt) if image_dt is not None else \
+                                                                                (0, 0, 0, 0, 0)
+                epochs.append(time_fields[0])
+                years.append(time_fields[1])
+                months.append(time_fields[2])
+                days.append(time_fields[3])
+                hours.append(time_fields[4])
+                has_timestamps.append(image_dt is not None)
+                bad_timestamps.append(bad_timestamp)
+
+                for one_species in one_image['species']:
+                    obs_images.append(image_id)
+                    obs_species.append(_get_code(self.species_codes, \
+                                                            one_species['scientificName']))
+                    obs_common_names.append(_get_code(common_name_codes, \
+                                                            one_species.get('name')))
+                    obs_counts.append(_get_code(count_codes, one_species.get('count')))
+                image_obs_starts.append(len(obs_images))
+
+        # The values of the codes, indexed by code
+        self.species_names = list(self.species_codes)
+        self.common_names = list(common_name_codes)
+        self.count_values = list(count_codes)
+
+        # Per-upload arrays
+        self.upload_locations = np.array(upload_locations, dtype=np.int32)
+        self.upload_elevations = np.array(upload_elevations, dtype=np.float64)
+
+        # Per-image arrays (timestamps are microseconds since the epoch)
+        self.image_uploads = np.array(image_uploads, dtype=np.int32)
+        self.epochs = np.array(epochs, dtype=np.int64)
+        self.years = np.array(years, dtype=np.int16)
+        self.months = np.array(months, dtype=np.int8)
+        self.days = np.array(days, dtype=np.int8)
+        self.hours = np.array(hours, dtype=np.int8)
+        self.has_timestamps = np.array(has_timestamps, dtype=np.bool_)
+        self.bad_timestamps = np.array(bad_timestamps, dtype=np.bool_)
+
+        self.image_obs_starts = np.array(image_obs_starts, dtype=np.int64)
+
+        # Per-observation arrays (the counts are codes of the original count values)
+        self.obs_images = np.array(obs_images, dtype=np.int32)
+        self.obs_species = np.array(obs_species, dtype=np.int32)
+        self.obs_common_names = np.array(obs_common_names, dtype=np.int32)
+        self.obs_counts = np.array(obs_counts, dtype=np.int32)
+
+    @property
+    def image_count(self) -> int:
+        """ Returns the number of images in the index """
+        return len(self.image_names)
+
+    def select(self, query_filter: QueryFilter) -> np.ndarray:
+        """ Returns the positions of the images that match the filters
+        Arguments:
+            query_filter: the compiled query filters
+        Return:
+            Returns the sorted array of matching image positions
+        """
+        mask = ~self.bad_timestamps
+
+        # Upload level filters
+        upload_mask = None
+        if query_filter.locations is not None:
+            upload_mask = np.isin(self.upload_locations, \
+                                    [self.location_codes[one_loc] for one_loc in \
+                                        query_filter.locations if one_loc in self.location_codes])
+        for one_check in query_filter.elevation_checks:
+            elevation_mask = one_check(self.upload_elevations)
+            upload_mask = elevation_mask if upload_mask is None else upload_mask & elevation_mask
+        if upload_mask is not None:
+            mask &= upload_mask[self.image_uploads]
+
+        # Image level filters
+        if query_filter.species is not None:
+            obs_mask = np.isin(self.obs_species, \
+                                    [self.species_codes[one_species] for one_species in \
+                                        query_filter.species if one_species in self.species_codes])
+            species_mask = np.zeros(self.image_count, dtype=np.bool_)
+            species_mask[self.obs_images[obs_mask]] = True
+            mask &= species_mask
+
+        if query_filter.needs_timestamp:
+            mask &= self.has_timestamps
+            if query_filter.start_epoch is not None:
+                mask &= self.epochs >= get_epoch_microseconds(query_filter.start_epoch)
+            if query_filter.end_epoch is not None:
+                mask &= self.epochs <= get_epoch_microseconds(query_filter.end_epoch)
+            if query_filter.year_start is not None:
+                mask &= (self.years >= query_filter.year_start) & \
+                                                        (self.years <= query_filter.year_end)
+            if query_filter.months is not None:
+                mask &= np.isin(self.months, list(query_filter.months))
+            if query_filter.days is not None:
+                mask &= np.isin(self.days, list(query_filter.days))
+            if query_filter.hours is not None:
+                mask &= np.isin(self.hours, list(query_filter.hours))
+
+        return np.flatnonzero(mask)
+
+    def get_images(self, bucket: str, positions: np.ndarray) -> list:
+        """ Rebuilds the images at the positions
+        Arguments:
+            bucket: the bucket of the images
+            positions: the image positions to rebuild
+        Return:
+            Returns the list of images with their 'image_dt' set
+        """
+        species_names = self.species_names
+        common_names = self.common_names
+        count_values = self.count_values
+
+        images = []
+        for one_pos in positions.tolist():
+            start, end = self.image_obs_starts[one_pos:one_pos+2].tolist()
+            timestamp = self.image_timestamps[one_pos]
+            images.append({'name': self.image_names[one_pos],
+                           'timestamp': timestamp,
+                           'bucket': bucket,
+                           's3_path': self.image_paths[one_pos],
+                           'species': [{'name': common_names[common_code],
+                                        'scientificName': species_names[species_code],
+                                        'count': count_values[count_code]}
+                                            for species_code, common_code, count_code in \
+                                                zip(self.obs_species[start:end].tolist(),
+                                                    self.obs_common_names[start:end].tolist(),
+                                                    self.obs_counts[start:end].tolist())],
+                           'image_dt': get_image_datetime(timestamp)})
+
+        return images
+
+    def iter_results(self, positions: np.ndarray) -> Iterator[dict]:
+        """ Yields the uploads with their images for the image positions
+        Arguments:
+            positions: the sorted image positions to return
+        Return:
+            Yields the upload information with its images for each upload that has images
+            at the positions, in the same format as QueryFilter.iter_uploads()
+        Notes:
+            The images of each upload are rebuilt as it's yielded
+        """
+        if len(positions) <= 0:
+            return
+
+        upload_ids = self.image_uploads[positions]
+        boundaries = np.flatnonzero(np.diff(upload_ids)) + 1
+        for upload_positions in np.split(positions, boundaries):
+            upload_id = self.image_uploads[upload_positions[0]]
+            images = self.get_images(self.upload_buckets[upload_id], upload_positions)
+            yield self.uploads[upload_id] | {'images': images}
+
+    def get_results(self, positions: np.ndarray) -> list:
+        """ Returns the uploads with their images for the image positions
+        Arguments:
+            positions: the sorted image positions to return
+        Return:
+            Returns the list of upload information with their images, in the same format
+            as QueryFilter.filter_uploads()
+        """
+        return list(self.iter_results(positions))
+
+    def iter_filter(self, query_filter: QueryFilter) -> Iterator[dict]:
+        """ Yields the uploads and images that match the filters
+        Arguments:
+            query_filter: the compiled query filters
+        Return:
+            Yields the upload information with its matching images for each upload that
+            has matches
+        Notes:
+            The matching positions are found before the first upload is yielded
+        """
+        return self.iter_results(self.select(query_filter))
+
+    def filter(self, query_filter: QueryFilter) -> list:
+        """ Returns the uploads and images that match the filters
+        Arguments:
+            query_filter: the compiled query filters
+        Return:
+            Returns the list of upload information with their matching images
+        """
+        return self.get_results(self.select(query_filter))
+
+
+def get_image_index(s3_url: str, bucket: str, version: tuple) -> Optional[ImageIndex]:
+    """ Returns the loaded image index of a collection
+    Arguments:
+        s3_url: the URL of the S3 instance
+        bucket: the bucket of the collection
+        version: the version of the cached uploads the index needs to be built from
+    Return:
+        Returns the image index or None if there isn't one for this version of the uploads
+    Notes:
+        An index for a different version of the uploads is removed
+    """
+    with _IMAGE_INDEXES_LOCK:
+        found = _IMAGE_INDEXES.pop((s3_url, bucket), None)
+        if found is None or found[0] != version:
+            return None
+
+        # Keep the most recently used indexes at the end
+        _IMAGE_INDEXES[(s3_url, bucket)] = found
+
+    return found[1]
+
+
+def save_image_index(s3_url: str, bucket: str, version: tuple, \
+                     uploads_info: tuple) -> ImageIndex:
+    """ Builds and saves the image index of a collection
+    Arguments:
+        s3_url: the URL of the S3 instance
+        bucket: the bucket of the collection
+        version: the version of the cached uploads
+        uploads_info: the uploads to index containing the 'bucket', 'name', and
+                        decoded 'info' of each upload
+    Return:
+        Returns the new image index
+    Notes:
+        The least recently used indexes are removed when the indexes have more than
+        IMAGE_INDEX_MAX_IMAGES images. An index with more images than that is returned
+        without being saved
+    """
+    image_index = ImageIndex(uploads_info)
+
+    with _IMAGE_INDEXES_LOCK:
+        _IMAGE_INDEXES.pop((s3_url, bucket), None)
+        _IMAGE_INDEXES[(s3_url, bucket)] = (version, image_index)
+        total_images = sum(one_index.image_count for _, one_index in _IMAGE_INDEXES.values())
+        while total_images > IMAGE_INDEX_MAX_IMAGES:
+            _, removed_index = _IMAGE_INDEXES.pop(next(iter(_IMAGE_INDEXES)))
+            total_images -= removed_index.image_count
+
+    return image_index
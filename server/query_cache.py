@@ -0,0 +1,165 @@
+""" Disk cache of the formatted results of queries """
+
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+from typing import Optional
+
+from s3_access import SPARCD_PREFIX
+
+
+# Environment variable name for the maximum number of bytes of cached query results
+ENV_NAME_QUERY_CACHE_BYTES = 'SPARCD_QUERY_CACHE_BYTES'
+# Default maximum number of bytes of cached query results
+QUERY_CACHE_BYTES_DEFAULT = 512 * 1024 * 1024
+# Working maximum number of bytes of cached query results (0 turns off caching)
+QUERY_CACHE_BYTES = int(os.environ.get(ENV_NAME_QUERY_CACHE_BYTES, QUERY_CACHE_BYTES_DEFAULT))
+# The folder containing the cached query results
+QUERY_CACHE_DIR = os.path.join(tempfile.gettempdir(), SPARCD_PREFIX + 'query_cache')
+# The file extension of cached query results
+QUERY_CACHE_EXT = '.json'
+
+
+def _get_canonical_value(value: object) -> object:
+    """ Returns the filter value in a form that's the same no matter how it was specified
+    Arguments:
+        value: the filter value
+    Return:
+        Returns the value with any datetimes as ISO strings and lists sorted
+    """
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _get_canonical_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sorted((_get_canonical_value(item) for item in value), \
+                                                    key=lambda item: json.dumps(item, default=str))
+    return value
+
+
+def get_query_key(s3_url: str, filters: tuple, uploads_versions: dict, data_version: int, \
+                  interval: int, user_settings: dict) -> str:
+    """ Returns the key of a query's results
+    Arguments:
+        s3_url: the URL associated with the query
+        filters: the (name, value) filters of the query
+        uploads_versions: the version of the saved uploads of each bucket being queried
+        data_version: the version of the changes that apply to all buckets
+        interval: the image interval of the query
+        user_settings: the settings of the user making the query
+    Return:
+        Returns the key of the query
+    Notes:
+        The order that filters and their values are specified in doesn't change the key
+    """
+    key_info = {'url': s3_url,
+                'filters': sorted(([one_filter[0], _get_canonical_value(one_filter[1])] \
+                                                                    for one_filter in filters), \
+                                  key=lambda item: json.dumps(item, default=str)),
+                'buckets': sorted([bucket, version] for bucket, version in \
+                                                                    uploads_versions.items()),
+                'version': data_version,
+                'interval': interval,
+                'settings': user_settings,
+               }
+
+    return hashlib.sha256(json.dumps(key_info, sort_keys=True, default=str).encode('utf-8')). \
+                                                                                    hexdigest()
+
+
+def _get_cache_path(key: str) -> str:
+    """ Returns the path of the file containing cached query results
+    Arguments:
+        key: the key of the query
+    Return:
+        Returns the path to the file
+    """
+    return os.path.join(QUERY_CACHE_DIR, key + QUERY_CACHE_EXT)
+
+
+def load_query_results(key: str) -> Optional[object]:
+    """ Returns the cached results of a query
+    Arguments:
+        key: the key of the query
+    Return:
+        Returns the cached results, or None if they're not found
+    Notes:
+        Found results are marked as the most recently used
+    """
+    if QUERY_CACHE_BYTES <= 0:
+        return None
+
+    cache_path = _get_cache_path(key)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as infile:
+            results = json.load(infile)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as ex:
+        print(f'Unable to load cached query results: {cache_path}')
+        print(ex)
+        return None
+
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+
+    return results
+
+
+def save_query_results(key: str, results: object) -> None:
+    """ Saves the results of a query in the cache
+    Arguments:
+        key: the key of the query
+        results: the query results to save
+    Notes:
+        The least recently used results are removed when the cache is larger than
+        QUERY_CACHE_BYTES
+    """
+    if QUERY_CACHE_BYTES <= 0:
+        return
+
+    # pylint: disable=broad-exception-caught
+    save_path = None
+    try:
+        os.makedirs(QUERY_CACHE_DIR, exist_ok=True)
+        save_fd, save_path = tempfile.mkstemp(suffix='.tmp', dir=QUERY_CACHE_DIR)
+        with os.fdopen(save_fd, 'w', encoding='utf-8') as outfile:
+            json.dump(results, outfile)
+        os.replace(save_path, _get_cache_path(key))
+    except Exception as ex:
+        print(f'Unable to cache query results: {key}')
+        print(ex)
+        if save_path and os.path.exists(save_path):
+            os.unlink(save_path)
+        return
+
+    _evict_query_results()
+
+
+def _evict_query_results() -> None:
+    """ Removes the least recently used query results until the cache is small enough
+    """
+    cache_files = []
+    with os.scandir(QUERY_CACHE_DIR) as cache_entries:
+        for one_entry in cache_entries:
+            if not one_entry.name.endswith(QUERY_CACHE_EXT):
+                continue
+            try:
+                entry_stat = one_entry.stat()
+            except FileNotFoundError:
+                continue
+            cache_files.append((entry_stat.st_mtime, entry_stat.st_size, one_entry.path))
+
+    total_size = sum(one_file[1] for one_file in cache_files)
+    for _, file_size, file_path in sorted(cache_files):
+        if total_size <= QUERY_CACHE_BYTES:
+            break
+        try:
+            os.unlink(file_path)
+        except FileNotFoundError:
+            pass
+        total_size -= file_size
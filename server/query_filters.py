@@ -0,0 +1,355 @@
+""" Compiles the query filters into the checks used to select uploads and images """
+
+import datetime
+import json
+from typing import Callable, Iterable, Iterator, Optional
+import dateutil.tz
+
+
+# Default timezone offset in seconds
+# TODO: Set the default timezone elsewhere; perhaps as a environment variable?
+DEFAULT_TIMEZONE_OFFSET = -7.00*60*60
+
+# Timezone assigned to image timestamps that don't have one
+DEFAULT_TIMEZONE = dateutil.tz.tzoffset(None, DEFAULT_TIMEZONE_OFFSET)
+
+# Conversion factor from feet to meters for elevation filters
+FEET_TO_METERS = 0.3048
+
+# The start of the epoch used for calculating image timestamps
+EPOCH_DT = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# One microsecond, the resolution of indexed image timestamps
+ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+# The filter names that need an image's timestamp to be checked
+TIMESTAMP_FILTER_NAMES = ('dayofweek', 'hour', 'month', 'years', 'startDate', 'endDate')
+
+
+def get_image_datetime(timestamp: Optional[str]) -> Optional[datetime.datetime]:
+    """ Returns the timestamp of an image as a datetime with a timezone
+    Arguments:
+        timestamp: the ISO formatted timestamp of the image
+    Return:
+        Returns the datetime of the timestamp or None if there isn't a timestamp
+    Exceptions:
+        A ValueError is raised if the timestamp is not a valid ISO timestamp
+    Notes:
+        Timestamps without a timezone are assigned the default timezone
+    """
+    if not timestamp:
+        return None
+
+    image_dt = datetime.datetime.fromisoformat(timestamp)
+    if image_dt.tzinfo is None or image_dt.tzinfo.utcoffset(image_dt) is None:
+        image_dt = image_dt.replace(tzinfo=DEFAULT_TIMEZONE)
+
+    return image_dt
+
+
+def get_image_time_fields(image_dt: datetime.datetime) -> tuple:
+    """ Returns the indexed time fields of an image's timestamp
+    Arguments:
+        image_dt: the datetime of the image with a timezone
+    Return:
+        Returns a tuple of the microseconds since the epoch, and the year, month,
+        weekday, and hour of the image in its timezone
+    """
+    return ((image_dt - EPOCH_DT) // ONE_MICROSECOND, image_dt.year, image_dt.month, \
+                                                            image_dt.weekday(), image_dt.hour)
+
+
+def get_epoch_microseconds(epoch: float) -> int:
+    """ Returns the epoch seconds as microseconds for comparing against indexed images
+    Arguments:
+        epoch: the number of seconds since the epoch
+    Return:
+        Returns the number of microseconds since the epoch
+    """
+    return round(epoch * 1000000)
+
+
+def get_elevation_meters(elevation_filter: dict) -> float:
+    """ Returns the elevation of the filter in meters
+    Arguments:
+        elevation_filter: the elevation filtering information
+    Return:
+        Returns the elevation in meters
+    """
+    if elevation_filter['units'] == 'meters':
+        return float(elevation_filter['value'])
+
+    return float(elevation_filter['value']) * FEET_TO_METERS
+
+
+def get_elevation_check(elevation_filter: dict) -> Callable:
+    """ Returns the function that checks an elevation against the filter
+    Arguments:
+        elevation_filter: the elevation filtering information
+    Return:
+        Returns a function that takes an elevation in meters and returns True if it matches
+    Notes:
+        The elevation filter needs 'type', 'value', and 'units' fields
+        with ('=','<','>','<=','>='), elevation, and ('meters' or 'feet')
+    """
+    cur_elevation = get_elevation_meters(elevation_filter)
+
+    match(elevation_filter['type']):
+        case '=':
+            return lambda elevation: elevation == cur_elevation
+        case '<':
+            return lambda elevation: elevation < cur_elevation
+        case '>':
+            return lambda elevation: elevation > cur_elevation
+        case '<=':
+            return lambda elevation: elevation <= cur_elevation
+        case '>=':
+            return lambda elevation: elevation >= cur_elevation
+        case _:
+            raise ValueError('Invalid elevation filter comparison specified: ' \
+                             f'{elevation_filter["type"]}')
+
+
+def _decode_filter_value(value: object) -> object:
+    """ Returns the filter value with any JSON encoding removed
+    Arguments:
+        value: the value to decode
+    Return:
+        Returns the decoded value
+    """
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def _get_epoch(value: datetime.datetime) -> float:
+    """ Returns the UTC epoch of the filter datetime
+    Arguments:
+        value: the datetime to convert
+    Return:
+        Returns the number of seconds since the epoch
+    Notes:
+        Datetimes without a timezone are assumed to be in the default timezone
+    """
+    if value.tzinfo is None or value.tzinfo.utcoffset(value) is None:
+        value = value.replace(tzinfo=DEFAULT_TIMEZONE)
+    return value.timestamp()
+
+
+def _intersect(cur_set: Optional[frozenset], values: tuple) -> frozenset:
+    """ Returns the intersection of the current set of values and the new values
+    Arguments:
+        cur_set: the current set of allowed values, or None if all values are allowed
+        values: the new values that are allowed
+    Return:
+        Returns the values allowed by both
+    """
+    new_set = frozenset(values)
+    return new_set if cur_set is None else cur_set & new_set
+
+
+class QueryFilter:
+    """ The query filters compiled once per query into the checks made against uploads
+        and images
+    """
+
+    def __init__(self, filters: tuple):
+        """ Compiles the filters
+        Arguments:
+            filters: the (name, value) filters of the query
+        Notes:
+            A filter that's specified more than once must match all of its values
+        """
+        # Upload level filters
+        self.locations = None
+        self.elevations = []
+        self.elevation_checks = []
+
+        # Image level filters
+        self.species = None
+        self.days = None
+        self.hours = None
+        self.months = None
+        self.year_start = None
+        self.year_end = None
+        self.start_epoch = None
+        self.end_epoch = None
+
+        for filter_name, filter_value in filters:
+            match(filter_name):
+                case 'locations':
+                    self.locations = _intersect(self.locations, filter_value)
+                case 'elevation' | 'elevations':
+                    elevation_filter = _decode_filter_value(filter_value)
+                    self.elevation_checks.append(get_elevation_check(elevation_filter))
+                    self.elevations.append((elevation_filter['type'], \
+                                                        get_elevation_meters(elevation_filter)))
+                case 'species':
+                    self.species = _intersect(self.species, filter_value)
+                case 'dayofweek':
+                    self.days = _intersect(self.days, filter_value)
+                case 'hour':
+                    self.hours = _intersect(self.hours, filter_value)
+                case 'month':
+                    self.months = _intersect(self.months, filter_value)
+                case 'years':
+                    years = _decode_filter_value(filter_value)
+                    year_start, year_end = int(years['yearStart']), int(years['yearEnd'])
+                    self.year_start = year_start if self.year_start is None else \
+                                                                max(self.year_start, year_start)
+                    self.year_end = year_end if self.year_end is None else \
+                                                                min(self.year_end, year_end)
+                case 'startDate':
+                    start_epoch = _get_epoch(filter_value)
+                    self.start_epoch = start_epoch if self.start_epoch is None else \
+                                                            max(self.start_epoch, start_epoch)
+                case 'endDate':
+                    end_epoch = _get_epoch(filter_value)
+                    self.end_epoch = end_epoch if self.end_epoch is None else \
+                                                            min(self.end_epoch, end_epoch)
+
+        self.needs_timestamp = any(one_filter[0] in TIMESTAMP_FILTER_NAMES \
+                                                                    for one_filter in filters)
+        self.timestamp_checks = self._compile_timestamp_checks()
+
+    @property
+    def is_selective(self) -> bool:
+        """ Returns whether the filters select specific species, locations, or years
+        Return:
+            Returns True if there are species, location, or year filters
+        """
+        return self.species is not None or self.locations is not None or \
+                                                                    self.year_start is not None
+
+    @property
+    def has_upload_filters(self) -> bool:
+        """ Returns whether the filters select uploads by their location or elevation
+        Return:
+            Returns True if there are location or elevation filters
+        """
+        return self.locations is not None or bool(self.elevation_checks)
+
+    def _compile_timestamp_checks(self) -> tuple:
+        """ Returns the checks made against an image's timestamp
+        Return:
+            Returns the tuple of functions that take an image datetime and return True
+            if the image matches
+        Notes:
+            All checks are expecting a valid datetime
+        """
+        checks = []
+        if self.start_epoch is not None or self.end_epoch is not None:
+            start_epoch = self.start_epoch if self.start_epoch is not None else float('-inf')
+            end_epoch = self.end_epoch if self.end_epoch is not None else float('inf')
+            checks.append(lambda image_dt: start_epoch <= image_dt.timestamp() <= end_epoch)
+        if self.year_start is not None:
+            year_start, year_end = self.year_start, self.year_end
+            checks.append(lambda image_dt: year_start <= image_dt.year <= year_end)
+        if self.months is not None:
+            months = self.months
+            checks.append(lambda image_dt: image_dt.month in months)
+        if self.days is not None:
+            days = self.days
+            checks.append(lambda image_dt: image_dt.weekday() in days)
+        if self.hours is not None:
+            hours = self.hours
+            checks.append(lambda image_dt: image_dt.hour in hours)
+
+        return tuple(checks)
+
+    def upload_matches(self, upload_info: dict) -> bool:
+        """ Checks if an upload matches the upload level filters
+        Arguments:
+            upload_info: the upload's information
+        Return:
+            Returns True if the upload matches and False if not
+        """
+        if self.locations is not None and upload_info['loc'] not in self.locations:
+            return False
+
+        if self.elevation_checks:
+            try:
+                elevation = float(upload_info['elevation'])
+            except (KeyError, TypeError, ValueError):
+                return False
+            for one_check in self.elevation_checks:
+                if not one_check(elevation):
+                    return False
+
+        return True
+
+    def filter_images(self, images: tuple, bucket: str, upload_name: str) -> list:
+        """ Returns the images that match the image level filters
+        Arguments:
+            images: the images to filter
+            bucket: the bucket of the upload the images belong to
+            upload_name: the name of the upload the images belong to
+        Return:
+            Returns the list of matching images with their 'image_dt' set
+        """
+        species = self.species
+        needs_timestamp = self.needs_timestamp
+        timestamp_checks = self.timestamp_checks
+
+        matches = []
+        for one_image in images:
+            if species is not None:
+                for one_species in one_image['species']:
+                    if one_species['scientificName'] in species:
+                        break
+                else:
+                    continue
+
+            # pylint: disable=broad-exception-caught
+            try:
+                image_dt = get_image_datetime(one_image.get('timestamp'))
+            except Exception as ex:
+                print(f'Error converting image timestamp: {one_image["name"]} ' \
+                      f'{one_image["timestamp"]} from upload {bucket} {upload_name}')
+                print(ex)
+                continue
+
+            if needs_timestamp:
+                if image_dt is None:
+                    continue
+                for one_check in timestamp_checks:
+                    if not one_check(image_dt):
+                        break
+                else:
+                    one_image['image_dt'] = image_dt
+                    matches.append(one_image)
+            else:
+                one_image['image_dt'] = image_dt
+                matches.append(one_image)
+
+        return matches
+
+    def iter_uploads(self, uploads_info: Iterable) -> Iterator[dict]:
+        """ Filters the uploads and yields the selected images and their associated data
+        Arguments:
+            uploads_info: the uploads to filter
+        Return:
+            Yields the upload information with its matching images for each upload that
+            has matches
+        Notes:
+            Does not filter on collection
+        """
+        for one_upload in uploads_info:
+            if not self.upload_matches(one_upload['info']):
+                continue
+
+            cur_images = self.filter_images(one_upload['info']['images'], one_upload['bucket'], \
+                                                                            one_upload['name'])
+            if cur_images:
+                yield one_upload['info'] | {'images': cur_images}
+
+    def filter_uploads(self, uploads_info: tuple) -> list:
+        """ Filters the uploads and returns the selected images and their associated data
+        Arguments:
+            uploads_info: the tuple of uploads to filter
+        Return:
+            Returns the list of upload information with their matching images
+        Notes:
+            Does not filter on collection
+        """
+        return list(self.iter_uploads(uploads_info))
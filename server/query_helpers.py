@@ -1,14 +1,21 @@
 """ Functions to help queries """
 
 import concurrent.futures
-import datetime
+import itertools
 import json
+import os
+import threading
 import traceback
-from typing import Callable, Optional
-import dateutil.tz
+from typing import Callable, Iterator, Optional
 
 from sparcd_db import SPARCdDatabase
+import sparcd_file_utils as sdfu
 from s3_access import S3Connection
+from query_filters import QueryFilter
+from query_cache import get_query_key
+from image_index import save_image_index
+from collection_filter import filter_saved_collection, filter_collection_worker, \
+                              expand_match_records, get_worker_pool, reset_worker_pool
 
 from format_dr_sanderson import get_dr_sanderson_output, get_dr_sanderson_pictures
 from format_csv import get_csv_raw, get_csv_location, get_csv_species
@@ -18,136 +25,210 @@ from text_formatters.results import Results
 
 # Uploads table timeout length
 TIMEOUT_UPLOADS_SEC = 3 * 60 * 60
+# The formatters of the query results in the order they're run, with the result names
+QUERY_FORMATTERS = (('DrSandersonOutput', get_dr_sanderson_output),
+                    ('DrSandersonAllPictures', get_dr_sanderson_pictures),
+                    ('csvRaw', get_csv_raw),
+                    ('csvLocation', get_csv_location),
+                    ('csvSpecies', get_csv_species),
+                    ('imageDownloads', get_image_downloads),
+                   )
+# The names of the formatters that are passed a function to report their own progress
+QUERY_PROGRESS_FORMATTERS = ('DrSandersonOutput',)
+# The name of the progress stage of loading collections from S3
+PROGRESS_STAGE_CRAWL = 'crawl'
+# The name of the progress stage of filtering collections
+PROGRESS_STAGE_FILTER = 'filter'
+# The stages of running a query that progress is reported for, before the first tab is formatted
+QUERY_PROGRESS_STAGES = (PROGRESS_STAGE_CRAWL, PROGRESS_STAGE_FILTER)
+# The name of the file saved with the query results that has the snapshot of the results
+QUERY_SNAPSHOT_NAME = 'snapshot'
+# Environment variable name for the number of collections loaded from S3 at the same time
+ENV_NAME_QUERY_S3_LOADS = 'SPARCD_QUERY_S3_LOADS'
+# Default number of collections loaded from S3 at the same time
+QUERY_S3_LOADS_DEFAULT = 4
+# Working number of collections loaded from S3 at the same time
+QUERY_S3_LOADS = max(1, int(os.environ.get(ENV_NAME_QUERY_S3_LOADS, QUERY_S3_LOADS_DEFAULT)))
+
+# The counts of reused analysis reductions while formatting query results in this process
+_ANALYSIS_REUSE_STATS = {'formatted': 0, 'hits': 0, 'misses': 0, 'uncached': 0}
+_ANALYSIS_REUSE_STATS_LOCK = threading.Lock()
+
+
+def _record_analysis_reuse(start_stats: dict, end_stats: dict) -> None:
+    """ Adds the analysis reductions of formatting one set of results to the process counts
+    Arguments:
+        start_stats: the reduction statistics of the results before formatting
+        end_stats: the reduction statistics of the results after formatting
+    """
+    with _ANALYSIS_REUSE_STATS_LOCK:
+        _ANALYSIS_REUSE_STATS['formatted'] += 1
+        for stat_name in ('hits', 'misses', 'uncached'):
+            _ANALYSIS_REUSE_STATS[stat_name] += end_stats[stat_name] - start_stats[stat_name]
+
+
+def get_analysis_reuse_stats() -> dict:
+    """ Returns how often analysis reductions were reused while formatting query results in
+        this process
+    Return:
+        Returns a dict with the number of times results were 'formatted', the number of
+        'hits', 'misses', and 'uncached' reductions, and the 'hit_rate' of the reductions
+        that could be saved
+    """
+    with _ANALYSIS_REUSE_STATS_LOCK:
+        reuse_stats = dict(_ANALYSIS_REUSE_STATS)
 
-# Default timezone offset in seconds
-# TODO: Set the default timezone elsewhere; perhaps as a environment variable?
-DEFAULT_TIMEZONE_OFFSET = -7.00*60*60
+    saved_count = reuse_stats['hits'] + reuse_stats['misses']
+    return reuse_stats | {'hit_rate': reuse_stats['hits'] / saved_count if saved_count else 0.0}
 
 
-def filter_uploads(uploads_info: tuple, filters: tuple) -> tuple:
+def filter_uploads(uploads_info: tuple, filters: QueryFilter) -> list:
     """ Filters the uploads against the filters and returns the selected
         images and their associated data
     Arguments:
         uploads_info: the tuple of uploads to filter
-        filters: the filters to apply to the uploads
+        filters: the compiled filters to apply to the uploads
     Notes:
         Does not filter on collection
     """
-    cur_uploads = uploads_info
-
-    # Filter at the upload level
-    for one_filter in filters:
-        match(one_filter[0]):
-            case 'locations':
-                cur_uploads = [one_upload for one_upload in cur_uploads if \
-                                one_upload['info']['loc'] in one_filter[1]]
-            case 'elevation':
-                cur_uploads = filter_elevation(cur_uploads, json.loads(one_filter[1]))
-
-    # Filter at the image level
-    filtering_names = [one_filter[0] for one_filter in filters]
-    years_filter = None
-    try:
-        start_date_ts = None if 'startDate' not in filtering_names else \
-                                                        get_filter_dt('startDate', filters)
-        end_date_ts = None if 'endDate' not in filtering_names else \
-                                                        get_filter_dt('endDate', filters)
-    except Exception as ex:
-        print('Invalid start or end filter date')
-        print(ex)
-        raise ex
-
-    matches = []
-    for one_upload in cur_uploads:
-        cur_images = []
-        for one_image in one_upload['info']['images']:
-            excluded = False
-            image_dt = None
-            # pylint: disable=broad-exception-caught
-            if 'timestamp' in one_image and one_image['timestamp']:
-                try:
-                    image_dt = datetime.datetime.fromisoformat(one_image['timestamp'])
-                    # Add a timezone if there isn't one
-                    if image_dt and (image_dt.tzinfo is None or \
-                                            image_dt.tzinfo.utcoffset(image_dt) is None):
-                        image_dt = image_dt.replace(tzinfo=\
-                                        dateutil.tz.tzoffset(None,DEFAULT_TIMEZONE_OFFSET))
-                except Exception as ex:
-                    print(f'Error converting image timestamp: {one_image["name"]} ' \
-                          f'{one_image["timestamp"]} from upload {one_upload["bucket"]} '\
-                          f'{one_upload["name"]}')
-                    print(ex)
-                    excluded = True
-                    continue
+    return filters.filter_uploads(uploads_info)
+
 
-            # Filter the image
-            for one_filter in filters:
-                match(one_filter[0]):
-                    case 'dayofweek':
-                        if image_dt is None or image_dt.weekday() not in one_filter[1]:
-                            excluded = True
-                    case 'hour':
-                        if image_dt is None or image_dt.hour not in one_filter[1]:
-                            excluded = True
-                    case 'month':
-                        if image_dt is None or image_dt.month not in one_filter[1]:
-                            excluded = True
-                    case 'species':
-                        found = False
-                        for one_species in one_image['species']:
-                            if one_species['scientificName'] in one_filter[1]:
-                                found = True
-
-                        if not found:
-                            excluded = True
-                    case 'years':
-                        if years_filter is None:
-                            years_filter = json.loads(one_filter[1])
-                        if image_dt is None or not years_filter['yearStart'] <= image_dt.year <= \
-                                                                            years_filter['yearEnd']:
-                            excluded = True
-                    case 'endDate': # Need to compare against GMT of filter
-                        if image_dt is None or image_dt > end_date_ts:
-                            excluded = True
-                    case 'startDate': # Need to compare against GMT of filter
-                        if image_dt is None or image_dt < start_date_ts:
-                            excluded = True
-
-                # Break loop as soon as it's excluded
-                if excluded:
-                    break
-
-            # Return it if it's not excluded
-            if not excluded:
-                one_image['image_dt'] = image_dt
-                cur_images.append(one_image)
-
-        if len(cur_images) > 0:
-            matches.append((one_upload, cur_images))
-
-    return [cur_upload['info']|{'images':cur_images} for cur_upload,cur_images in matches]
-
-
-def list_uploads_thread(s3_url: str, user_name: str, user_secret: str, bucket: str) -> object:
+def list_uploads_thread(s3_url: str, user_name: str, user_secret: str, bucket: str, \
+                        known_uploads: Optional[tuple]=None) -> object:
     """ Used to load upload information from an S3 instance
     Arguments:
         s3_url - the URL to connect to
         user_name - the name of the user to connect with
         user_secret - the secret used to connect
         bucket - the bucket to look in
+        known_uploads - previously loaded uploads to refresh instead of loading everything
     Return:
         Returns an object with the loaded uploads
     """
-    uploads_info = S3Connection.list_uploads(s3_url, \
-                                        user_name, \
-                                        user_secret, \
-                                        bucket)
+    if known_uploads:
+        uploads_info = S3Connection.refresh_uploads(s3_url, \
+                                            user_name, \
+                                            user_secret, \
+                                            bucket, \
+                                            known_uploads)
+    else:
+        uploads_info = S3Connection.list_uploads(s3_url, \
+                                            user_name, \
+                                            user_secret, \
+                                            bucket)
 
     return {'bucket': bucket, 'uploads_info': uploads_info}
 
 
+def list_matching_uploads_thread(s3_url: str, user_name: str, user_secret: str, bucket: str, \
+                                 query_filter: QueryFilter) -> object:
+    """ Used to load only the uploads from an S3 instance that match the location and
+        elevation filters
+    Arguments:
+        s3_url - the URL to connect to
+        user_name - the name of the user to connect with
+        user_secret - the secret used to connect
+        bucket - the bucket to look in
+        query_filter - the compiled filters with location or elevation filters
+    Return:
+        Returns an object with the loaded uploads. When only the matching uploads are loaded
+        the object also has the 'locations' of all the uploads and 'partial' is set to True
+    Notes:
+        The uploads are loaded in two phases. First, only the location and elevation of each
+        upload is found from its deployment data. Then the observations of just the uploads
+        that match are loaded.
+        If the collection has an uploads manifest, all the uploads are loaded from it instead
+    """
+    if S3Connection.has_uploads_manifest(s3_url, user_name, user_secret, bucket):
+        return list_uploads_thread(s3_url, user_name, user_secret, bucket)
+
+    upload_locations = S3Connection.list_upload_locations(s3_url, user_name, user_secret, bucket)
+    if upload_locations is None:
+        return {'bucket': bucket, 'uploads_info': None}
+
+    upload_names = [one_location['name'] for one_location in upload_locations \
+                                                    if query_filter.upload_matches(one_location)]
+    uploads_info = S3Connection.list_uploads(s3_url, user_name, user_secret, bucket, \
+                                                        upload_names) if upload_names else []
+
+    return {'bucket': bucket, 'uploads_info': uploads_info, 'locations': upload_locations, \
+            'partial': True}
+
+
+def iter_s3_uploads(db: SPARCdDatabase, s3_url: str, user_name: str, fetch_password: Callable, \
+                    buckets: tuple, query_filter: Optional[QueryFilter]=None) -> Iterator[dict]:
+    """ Loads the uploads of collections from S3 and yields them as they're loaded
+    Arguments:
+        db - connections to the current database
+        s3_url - the URL to the S3 instance
+        user_name - the user's name for S3
+        fetch_password - returns the user's password
+        buckets - the buckets of the collections to load
+        query_filter - optional compiled filters used to only load the uploads that match
+                any location and elevation filters
+    Return:
+        Yields an object with the loaded uploads of each collection
+    Notes:
+        At most QUERY_S3_LOADS collections are being loaded, or are waiting to be consumed,
+        at any one time. Any expired uploads in the database are used as a starting point
+        for refreshing a collection and are only decoded when its load is started.
+        Collections without any saved uploads are loaded by list_matching_uploads_thread()
+        when there are location or elevation filters, unless the upload locations saved by
+        an earlier partial load are found. In that case all the uploads are loaded so that
+        they're saved for later queries
+    """
+    user_secret = fetch_password()
+    remaining_buckets = iter(buckets)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=QUERY_S3_LOADS) as executor:
+        cur_futures = set()
+        while True:
+            for cur_bucket in itertools.islice(remaining_buckets, \
+                                                            QUERY_S3_LOADS - len(cur_futures)):
+                expired_uploads = db.get_uploads(s3_url, cur_bucket, None)
+                if not expired_uploads and query_filter is not None and \
+                        query_filter.has_upload_filters and \
+                        not db.get_upload_locations(s3_url, cur_bucket, TIMEOUT_UPLOADS_SEC):
+                    cur_futures.add(executor.submit(list_matching_uploads_thread, s3_url, \
+                                        user_name, user_secret, cur_bucket, query_filter))
+                    continue
+
+                cur_futures.add(executor.submit(list_uploads_thread, s3_url, user_name, \
+                                        user_secret, cur_bucket, \
+                                        [json.loads(one_upload['json']) for one_upload in \
+                                                                    expired_uploads or []]))
+            if not cur_futures:
+                break
+
+            done_futures, cur_futures = concurrent.futures.wait(cur_futures, \
+                                            return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done_futures:
+                try:
+                    uploads_results = future.result()
+                # pylint: disable=broad-exception-caught
+                except Exception as ex:
+                    print(f'Generated exception: {ex}', flush=True)
+                    traceback.print_exception(ex)
+                    continue
+
+                yield uploads_results
+
+
+def _report_progress(progress: Optional[Callable], stage: str, done: int, total: int) -> None:
+    """ Reports the progress of a query stage when there's a progress function
+    Arguments:
+        progress: the function to report progress to
+        stage: the name of the stage
+        done: the amount of the stage that's been done
+        total: the total amount of work in the stage
+    """
+    if progress is not None:
+        progress(stage, done, total)
+
+
 def filter_collections(db: SPARCdDatabase, cur_coll: tuple, s3_url: str, user_name: str, \
-                       fetch_password: Callable, filters: tuple) -> tuple:
+                       fetch_password: Callable, filters: tuple, \
+                       progress: Callable=None) -> Iterator[dict]:
     """ Filters the collections in an efficient manner
     Arguments:
         db - connections to the current database
@@ -156,128 +237,235 @@ def filter_collections(db: SPARCdDatabase, cur_coll: tuple, s3_url: str, user_na
         user_name - the user's name for S3
         fetch_password - returns the user's password
         filters - the filters to apply to the data
+        progress - optional function called with the stage name (PROGRESS_STAGE_CRAWL or
+                PROGRESS_STAGE_FILTER), the number of collections done, and the total number
+                of collections in the stage
     Returns:
-        Returns the filtered results
+        Yields the filtered results one upload at a time
+    Notes:
+        Collections with current uploads in the database are filtered with their in-memory
+        image index, which is only rebuilt when the saved uploads change. If the index isn't
+        loaded, queries for specific species, locations, or years are filtered by the
+        database using its posting lists.
+        When there's a worker pool, each collection's saved uploads are filtered in a worker
+        process instead and the compact matches are expanded here.
+        Collections that aren't saved are loaded from S3. With location or elevation filters,
+        only the uploads at matching locations are loaded the first time a collection without
+        saved uploads or an uploads manifest is queried. These partial uploads aren't saved,
+        but their locations are, and the next query loads and saves all the uploads.
+        Nothing is loaded or filtered until the results are iterated, and only the uploads
+        of the collection currently being filtered are held on to
     """
-    all_results = []
-    s3_uploads = []
-
-    # Load all the DB data first
+    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    s3_buckets = []
+    query_filter = QueryFilter(filters)
+    worker_pool = get_worker_pool()
+    worker_futures = {}
+    filtered_count = 0
+    _report_progress(progress, PROGRESS_STAGE_FILTER, filtered_count, len(cur_coll))
+
+    # Filter the DB data first
     for one_coll in cur_coll:
         cur_bucket = one_coll['json']['bucketProperty']
-        uploads_info = db.get_uploads(s3_url, cur_bucket, TIMEOUT_UPLOADS_SEC)
-        if uploads_info is not None and uploads_info:
-            uploads_info = [{'bucket':cur_bucket,       \
-                             'name':one_upload['name'],                     \
-                             'info':json.loads(one_upload['json'])}         \
-                                    for one_upload in uploads_info]
+        uploads_version = db.get_uploads_version(s3_url, cur_bucket, TIMEOUT_UPLOADS_SEC)
+        if uploads_version is None:
+            s3_buckets.append(cur_bucket)
+        elif worker_pool is not None:
+            worker_futures[worker_pool.submit(filter_collection_worker, db.database_path, \
+                                    s3_url, cur_bucket, uploads_version, filters)] = \
+                                                                (cur_bucket, uploads_version)
         else:
-            s3_uploads.append(cur_bucket)
-            continue
-
-        # Filter on current DB uploads
-        if len(uploads_info) > 0:
-            cur_results = filter_uploads(uploads_info, filters)
-            if cur_results:
-                all_results = all_results + cur_results
-
+            yield from filter_saved_collection(db, s3_url, cur_bucket, uploads_version, \
+                                                                                query_filter)
+            filtered_count += 1
+            _report_progress(progress, PROGRESS_STAGE_FILTER, filtered_count, len(cur_coll))
 
     # Load the S3 uploads in an aynchronous fashion
-    if len(s3_uploads) > 0:
-        user_secret = fetch_password()
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            cur_futures = {executor.submit(list_uploads_thread, s3_url, user_name, \
-                                                                        user_secret, cur_bucket):
-                            cur_bucket for cur_bucket in s3_uploads}
-
-            for future in concurrent.futures.as_completed(cur_futures):
-                try:
-                    uploads_results = future.result()
-                    if 'uploads_info' in uploads_results and \
-                                                        len(uploads_results['uploads_info']) > 0:
-                        uploads_info = [{'bucket':uploads_results['bucket'],
+    if s3_buckets:
+        loaded_count = 0
+        _report_progress(progress, PROGRESS_STAGE_CRAWL, loaded_count, len(s3_buckets))
+        for uploads_results in iter_s3_uploads(db, s3_url, user_name, fetch_password, \
+                                                                    s3_buckets, query_filter):
+            loaded_count += 1
+            _report_progress(progress, PROGRESS_STAGE_CRAWL, loaded_count, len(s3_buckets))
+
+            cur_results = ()
+            try:
+                if uploads_results.get('partial', False):
+                    # Only the uploads matching the location filters were loaded, so they
+                    # can't be saved as the collection's uploads
+                    db.save_upload_locations(s3_url, uploads_results['bucket'], \
+                                                                uploads_results['locations'])
+                    cur_results = query_filter.iter_uploads( \
+                                        {'bucket':uploads_results['bucket'],
                                          'name':one_upload['name'],
-                                         'info':one_upload,
-                                         'json':json.dumps(one_upload)
-                                        } for one_upload in uploads_results['uploads_info']]
-                        db.save_uploads(s3_url, uploads_results['bucket'], uploads_info)
-
-                        # Filter on current DB uploads
-                        if len(uploads_info) > 0:
-                            cur_results = filter_uploads(uploads_info, filters)
-                            if cur_results:
-                                all_results = all_results + cur_results
-                # pylint: disable=broad-exception-caught
-                except Exception as ex:
-                    print(f'Generated exception: {ex}', flush=True)
-                    traceback.print_exception(ex)
+                                         'info':one_upload
+                                        } for one_upload in uploads_results['uploads_info'] or [])
+                elif 'uploads_info' in uploads_results and uploads_results['uploads_info']:
+                    uploads_info = [{'bucket':uploads_results['bucket'],
+                                     'name':one_upload['name'],
+                                     'info':one_upload,
+                                     'json':json.dumps(one_upload)
+                                    } for one_upload in uploads_results['uploads_info']]
+                    db.save_uploads(s3_url, uploads_results['bucket'], uploads_info)
+
+                    uploads_version = db.get_uploads_version(s3_url, uploads_results['bucket'], \
+                                                                            TIMEOUT_UPLOADS_SEC)
+                    if uploads_version is not None and worker_pool is not None:
+                        # Have a worker filter the saved uploads
+                        worker_futures[worker_pool.submit(filter_collection_worker, \
+                                        db.database_path, s3_url, uploads_results['bucket'], \
+                                        uploads_version, filters)] = \
+                                                    (uploads_results['bucket'], uploads_version)
+                        continue
+
+                    # Index the refreshed uploads so later queries don't rebuild it
+                    if uploads_version is not None:
+                        cur_results = save_image_index(s3_url, uploads_results['bucket'], \
+                                        uploads_version, uploads_info).iter_filter(query_filter)
+                    else:
+                        cur_results = query_filter.iter_uploads(uploads_info)
+            # pylint: disable=broad-exception-caught
+            except Exception as ex:
+                print(f'Generated exception: {ex}', flush=True)
+                traceback.print_exception(ex)
+
+            yield from cur_results
+            filtered_count += 1
+            _report_progress(progress, PROGRESS_STAGE_FILTER, filtered_count, len(cur_coll))
+
+    # Return the matches of the worker processes as they finish
+    for future in concurrent.futures.as_completed(worker_futures):
+        cur_bucket, uploads_version = worker_futures[future]
+        records = ()
+        try:
+            records = future.result()
+        except concurrent.futures.process.BrokenProcessPool as ex:
+            print(f'Worker process failed filtering collection {cur_bucket}: {ex}', flush=True)
+            reset_worker_pool()
+            yield from filter_saved_collection(db, s3_url, cur_bucket, uploads_version, \
+                                                                                query_filter)
+        # pylint: disable=broad-exception-caught
+        except Exception as ex:
+            print(f'Generated exception: {ex}', flush=True)
+            traceback.print_exception(ex)
+
+        yield from expand_match_records(cur_bucket, records)
+        filtered_count += 1
+        _report_progress(progress, PROGRESS_STAGE_FILTER, filtered_count, len(cur_coll))
+
+
+def get_query_cache_key(db: SPARCdDatabase, cur_coll: tuple, s3_url: str, filters: tuple, \
+                        interval: int, user_settings: dict) -> Optional[str]:
+    """ Returns the key of the query's results in the query cache
+    Arguments:
+        db - connections to the current database
+        cur_coll - the list of applicable collections
+        s3_url - the URL to the S3 instance
+        filters - the filters to apply to the data
+        interval - the image interval of the query
+        user_settings - the settings of the user making the query
+    Returns:
+        Returns the key of the query, or None if the results can't be cached because
+        a collection's uploads need to be loaded from S3
+    """
+    data_version = db.get_data_version(s3_url)
+    if data_version is None:
+        return None
+
+    uploads_versions = {}
+    for one_coll in cur_coll:
+        cur_bucket = one_coll['json']['bucketProperty']
+        uploads_version = db.get_uploads_version(s3_url, cur_bucket, TIMEOUT_UPLOADS_SEC)
+        if uploads_version is None:
+            return None
+        uploads_versions[cur_bucket] = uploads_version
 
-    return all_results
+    return get_query_key(s3_url, filters, uploads_versions, data_version, interval, \
+                                                                                user_settings)
 
 
-def filter_elevation(uploads: tuple, elevation_filter: dict) -> list:
-    """ Returns the uploads that match the filter
+def get_first_query_tab(user_settings: dict) -> str:
+    """ Returns the name of the first tab of the query results that's shown to the user
     Arguments:
-        uploads: the uploads to iterate through
-        elevation_filter: the elevation filtering information
-    Returns:
-        Returns uploads that match the elevation filtering criteria
+        user_settings: the settings of the user making the query
+    Return:
+        Returns the name of the tab
     Notes:
-        The elevation filter needs 'type', 'value', and 'units' fields
-        with ('=','<','>','<=','>='), elevation, and ('meters' or 'feet')
+        Dr. Sanderson's tabs are only shown when the user has them turned on
     """
-    # Get the comparison value in meters
-    if elevation_filter['units'] == 'meters':
-        cur_elevation = elevation_filter['value']
-    else:
-        cur_elevation = elevation_filter['value'] * 0.3048
-
-    # Filter the uploads based upon the filter type
-    match(elevation_filter['type']):
-        case '=':
-            return [one_upload for one_upload in uploads if \
-                                float(one_upload['info']['elevation']) == cur_elevation]
-        case '<':
-            return [one_upload for one_upload in uploads if \
-                                float(one_upload['info']['elevation']) < cur_elevation]
-        case '>':
-            return [one_upload for one_upload in uploads if \
-                                float(one_upload['info']['elevation']) > cur_elevation]
-        case '<=':
-            return [one_upload for one_upload in uploads if \
-                                float(one_upload['info']['elevation']) <= cur_elevation]
-        case '>=':
-            return [one_upload for one_upload in uploads if \
-                                float(one_upload['info']['elevation']) >= cur_elevation]
-        case _:
-            raise ValueError('Invalid elevation filter comparison specified: ' \
-                             f'{elevation_filter["type"]}')
-
-
-def get_filter_dt(filter_name: str, filters: tuple) -> Optional[datetime.datetime]:
-    """ Returns the datetime of the associated filter
+    show_sanderson = user_settings.get('sandersonOutput', False) \
+                                                if isinstance(user_settings, dict) else False
+    if isinstance(show_sanderson, str):
+        show_sanderson = show_sanderson.lower() == 'true'
+
+    for formatter_name, _ in QUERY_FORMATTERS:
+        if show_sanderson or not formatter_name.startswith('DrSanderson'):
+            return formatter_name
+
+    return QUERY_FORMATTERS[0][0]
+
+
+def get_query_tab(query_path: str, query_results: dict, tab: str, user_name: str, \
+                  fetch_password: Callable, timeout_sec: int) -> Optional[object]:
+    """ Returns the formatted results of a query's tab, formatting them when they're
+        first needed
     Arguments:
-        filter_name: the name of the filter to find
-        filterrs: the list of filters to search
+        query_path: the path to the saved query results
+        query_results: the saved query results
+        tab: the name of the tab
+        user_name: the user's name for S3
+        fetch_password: returns the user's password
+        timeout_sec: the number of seconds the saved query results are valid for
     Return:
-        The timestamp as a datetime object, or None if the filter or timestamp is 
-        missing or invalid
+        Returns the formatted results of the tab, or None if the tab is unknown or the
+        results snapshot isn't available
+    Notes:
+        The tab is formatted from the results snapshot saved with the query, and is then
+        saved with the query so that it's only formatted once
     """
-    found_filter = [one_filter for one_filter in filters if one_filter[0] == filter_name]
-    if len(found_filter) > 0:
-        return found_filter[0][1]
+    if tab in query_results:
+        return query_results[tab]
+
+    formatter = dict(QUERY_FORMATTERS).get(tab)
+    if formatter is None:
+        return None
+
+    tab_path = sdfu.get_companion_path(query_path, tab)
+    tab_results = sdfu.load_timed_info(tab_path, timeout_sec)
+    if tab_results is not None:
+        return tab_results
+
+    snapshot = sdfu.load_timed_info(sdfu.get_companion_path(query_path, QUERY_SNAPSHOT_NAME), \
+                                                                                    timeout_sec)
+    if snapshot is None:
+        return None
+
+    tab_results = formatter(Results.from_snapshot(snapshot, user_name, fetch_password()))
+    sdfu.save_timed_info(tab_path, tab_results)
 
-    return None
+    return tab_results
 
 
-def query_output(results: Results, results_id: str) -> tuple:
+def query_output(results: Results, results_id: str, progress: Callable=None, \
+                 tab_names: tuple=None) -> tuple:
     """ Formats the results into something that can be returned to the caller
     Arguments:
         results: the results class containing the results of the filter_uploads function
         results_id: the unique identifier for this result
-        user_settings: the user settings
+        progress: optional function called with the formatter name, the amount done, and
+                the total amount while running each formatter. Formatters in
+                QUERY_PROGRESS_FORMATTERS report their own progress, the others report 0 of 1
+                before and 1 of 1 after running
+        tab_names: optional names of the tabs to format. All tabs are formatted when not
+                specified
     Return:
         Returns a tuple containing the formatted results
+    Notes:
+        The tab information is always returned, even for tabs that aren't formatted. Those
+        tabs are available through get_query_tab()
+        The reuse of analysis reductions while formatting is added to the counts returned
+        by get_analysis_reuse_stats()
     """
     if not results:
         return tuple()
@@ -285,13 +473,24 @@ def query_output(results: Results, results_id: str) -> tuple:
     if not results.have_results():
         return tuple()
 
-    return {'id': results_id,
-            'DrSandersonOutput': get_dr_sanderson_output(results),
-            'DrSandersonAllPictures': get_dr_sanderson_pictures(results),
-            'csvRaw': get_csv_raw(results),
-            'csvLocation': get_csv_location(results),
-            'csvSpecies': get_csv_species(results),
-            'imageDownloads': get_image_downloads(results),
+    start_stats = results.get_reduction_stats()
+    formatted = {}
+    for formatter_name, formatter in QUERY_FORMATTERS:
+        if tab_names is not None and formatter_name not in tab_names:
+            continue
+        if progress is not None:
+            progress(formatter_name, 0, 1)
+        if progress is not None and formatter_name in QUERY_PROGRESS_FORMATTERS:
+            formatted[formatter_name] = formatter(results, lambda done, total, \
+                            formatter_name=formatter_name: progress(formatter_name, done, total))
+            continue
+        formatted[formatter_name] = formatter(results)
+        if progress is not None:
+            progress(formatter_name, 1, 1)
+
+    _record_analysis_reuse(start_stats, results.get_reduction_stats())
+
+    return {'id': results_id} | formatted | {
             'tabs': {   # Information on tabs to display
                  # The order that the tabs are to be displayed
                  'order':['DrSandersonOutput','DrSandersonAllPictures','csvRaw', \
@@ -0,0 +1,323 @@
+""" Runs queries as background jobs whose progress can be checked from any server process """
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from typing import Callable, Optional
+
+from s3_access import SPARCD_PREFIX
+
+
+# Environment variable name for the number of query jobs a server process runs at the same time
+ENV_NAME_QUERY_JOB_WORKERS = 'SPARCD_QUERY_JOB_WORKERS'
+# Default number of query jobs a server process runs at the same time
+QUERY_JOB_WORKERS_DEFAULT = 2
+# Working number of query jobs a server process runs at the same time
+QUERY_JOB_WORKERS = max(1, int(os.environ.get(ENV_NAME_QUERY_JOB_WORKERS, \
+                                              QUERY_JOB_WORKERS_DEFAULT)))
+# The folder containing the state of the query jobs
+QUERY_JOBS_DIR = os.path.join(tempfile.gettempdir(), SPARCD_PREFIX + 'query_jobs')
+# The file extension of a query job's state
+QUERY_JOB_EXT = '.json'
+# The file extension of the file containing the ID of a user's current query job
+QUERY_JOB_CURRENT_EXT = '.current'
+# Number of seconds before the state of a query job is removed
+QUERY_JOB_EXPIRE_SEC = 3 * 60 * 60
+# Minimum number of seconds between saving the progress of a running job
+QUERY_JOB_PROGRESS_INTERVAL_SEC = 0.5
+
+# The states of a query job
+QUERY_JOB_QUEUED = 'queued'
+QUERY_JOB_RUNNING = 'running'
+QUERY_JOB_DONE = 'done'
+QUERY_JOB_FAILED = 'failed'
+QUERY_JOB_CANCELLED = 'cancelled'
+
+# The background threads that run the query jobs of this process
+_JOB_EXECUTOR = None
+_JOB_EXECUTOR_LOCK = threading.Lock()
+
+
+class QueryCancelledError(Exception):
+    """ Raised when a query job has been cancelled or superseded by a newer job """
+
+
+def _get_owner_key(token: str) -> str:
+    """ Returns the key of the owner of a job that's safe to use as a file name
+    Arguments:
+        token: the session token of the job's owner
+    Return:
+        Returns the owner's key
+    """
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def _write_file(file_path: str, contents: str) -> None:
+    """ Replaces the contents of a file so that readers never see a partial file
+    Arguments:
+        file_path: the path of the file to write
+        contents: the new contents of the file
+    """
+    save_fd, save_path = tempfile.mkstemp(suffix='.tmp', dir=QUERY_JOBS_DIR)
+    try:
+        with os.fdopen(save_fd, 'w', encoding='utf-8') as outfile:
+            outfile.write(contents)
+        os.replace(save_path, file_path)
+    except OSError:
+        if os.path.exists(save_path):
+            os.unlink(save_path)
+        raise
+
+
+def _get_current_job_id(owner_key: str) -> Optional[str]:
+    """ Returns the ID of the owner's current query job
+    Arguments:
+        owner_key: the key of the job owner
+    Return:
+        Returns the ID of the current job, or None if there isn't one
+    """
+    try:
+        with open(os.path.join(QUERY_JOBS_DIR, owner_key + QUERY_JOB_CURRENT_EXT), 'r', \
+                                                                encoding='utf-8') as infile:
+            return infile.read().strip()
+    except OSError:
+        return None
+
+
+class QueryJob:
+    """ The state of a query job that's shared with all the server processes """
+
+    def __init__(self, job_id: str, owner_key: str, stages: tuple):
+        """ Initializes a new job
+        Arguments:
+            job_id: the unique ID of the job
+            owner_key: the key of the job's owner
+            stages: the names of the stages of the job, in the order they're run
+        """
+        self.id = job_id
+        self.owner_key = owner_key
+        self.status = QUERY_JOB_QUEUED
+        self.stage = None
+        self.stages = {one_stage: {'done': 0, 'total': None} for one_stage in stages}
+        self.message = None
+        self.results_path = None
+        self._last_saved = 0
+
+    def to_dict(self) -> dict:
+        """ Returns the job's state as a dictionary """
+        return {'id': self.id,
+                'owner': self.owner_key,
+                'status': self.status,
+                'stage': self.stage,
+                'stages': self.stages,
+                'message': self.message,
+                'resultsPath': self.results_path,
+                'timestamp': time.time(),
+               }
+
+    def save(self) -> None:
+        """ Saves the job's state so that it can be seen by other processes
+        """
+        _write_file(os.path.join(QUERY_JOBS_DIR, self.id + QUERY_JOB_EXT), \
+                                                                    json.dumps(self.to_dict()))
+        self._last_saved = time.monotonic()
+
+    def is_superseded(self) -> bool:
+        """ Returns whether the job has been cancelled or replaced by a newer job of its owner
+        """
+        return _get_current_job_id(self.owner_key) != self.id
+
+    def progress(self, stage: str, done: int, total: int) -> None:
+        """ Records the progress of the job
+        Arguments:
+            stage: the name of the stage that's running
+            done: the amount of the stage that's been done
+            total: the total amount of work in the stage
+        Exceptions:
+            A QueryCancelledError is raised when the job has been superseded
+        Notes:
+            The progress is saved at most every QUERY_JOB_PROGRESS_INTERVAL_SEC seconds,
+            unless a stage is starting or has finished
+        """
+        stage_changed = stage != self.stage
+        self.stage = stage
+        self.stages[stage] = {'done': done, 'total': total}
+
+        if stage_changed or done >= total or \
+                    time.monotonic() - self._last_saved >= QUERY_JOB_PROGRESS_INTERVAL_SEC:
+            if self.is_superseded():
+                raise QueryCancelledError(f'Query job {self.id} was cancelled')
+            self.save()
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """ Returns the executor that runs the query jobs of this process
+    """
+    # pylint: disable=global-statement
+    global _JOB_EXECUTOR
+    with _JOB_EXECUTOR_LOCK:
+        if _JOB_EXECUTOR is None:
+            _JOB_EXECUTOR = concurrent.futures.ThreadPoolExecutor( \
+                                                    max_workers=QUERY_JOB_WORKERS, \
+                                                    thread_name_prefix=SPARCD_PREFIX + 'query_job')
+
+    return _JOB_EXECUTOR
+
+
+def _run_job(job: QueryJob, job_func: Callable, job_args: tuple) -> None:
+    """ Runs a query job and saves its final state
+    Arguments:
+        job: the job to run
+        job_func: the function that runs the query
+        job_args: the arguments to pass to the function after the job
+    """
+    # pylint: disable=broad-exception-caught
+    try:
+        if job.is_superseded():
+            raise QueryCancelledError(f'Query job {job.id} was cancelled before it started')
+
+        job.status = QUERY_JOB_RUNNING
+        job.save()
+        job.results_path = job_func(job, *job_args)
+        job.status = QUERY_JOB_DONE
+    except QueryCancelledError as ex:
+        print(ex, flush=True)
+        job.status = QUERY_JOB_CANCELLED
+    except Exception as ex:
+        print(f'Query job {job.id} failed: {ex}', flush=True)
+        traceback.print_exception(ex)
+        job.status = QUERY_JOB_FAILED
+        job.message = 'An error ocurred while running the query'
+
+    try:
+        job.save()
+    except OSError as ex:
+        print(f'Unable to save the state of query job {job.id}: {ex}', flush=True)
+
+    cleanup_query_jobs()
+
+
+def start_query_job(token: str, stages: tuple, job_func: Callable, *job_args) -> str:
+    """ Starts a query job in the background, cancelling any previous job of the user
+    Arguments:
+        token: the session token of the user
+        stages: the names of the stages of the job, in the order they're run
+        job_func: the function that runs the query. It's called with the job, which is used
+                to report progress, followed by the job arguments and returns the path to
+                the query results
+        job_args: the arguments to pass to the function
+    Return:
+        Returns the ID of the new job
+    """
+    os.makedirs(QUERY_JOBS_DIR, exist_ok=True)
+
+    job = QueryJob(uuid.uuid4().hex, _get_owner_key(token), stages)
+    job.save()
+
+    # Supersede any previous job of this user
+    _write_file(os.path.join(QUERY_JOBS_DIR, job.owner_key + QUERY_JOB_CURRENT_EXT), job.id)
+
+    _get_executor().submit(_run_job, job, job_func, job_args)
+
+    return job.id
+
+
+def _load_query_job(token: str, job_id: str) -> Optional[dict]:
+    """ Loads the state of a query job belonging to the user
+    Arguments:
+        token: the session token of the user
+        job_id: the ID of the job
+    Return:
+        Returns the state of the job, or None if it's not found or belongs to someone else
+    """
+    if not job_id or not job_id.isalnum():
+        return None
+
+    try:
+        with open(os.path.join(QUERY_JOBS_DIR, job_id + QUERY_JOB_EXT), 'r', \
+                                                                encoding='utf-8') as infile:
+            job_info = json.load(infile)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+    if job_info['owner'] != _get_owner_key(token):
+        return None
+
+    return job_info
+
+
+def get_query_job_status(token: str, job_id: str) -> Optional[dict]:
+    """ Returns the status and progress of a query job
+    Arguments:
+        token: the session token of the user
+        job_id: the ID of the job
+    Return:
+        Returns the status of the job, or None if it's not found
+    """
+    job_info = _load_query_job(token, job_id)
+    if job_info is None:
+        return None
+
+    return {'id': job_info['id'],
+            'status': job_info['status'],
+            'stage': job_info['stage'],
+            'stages': [{'name': name} | progress for name, progress in \
+                                                                job_info['stages'].items()],
+            'message': job_info['message'],
+           }
+
+
+def get_query_job_results_path(token: str, job_id: str) -> Optional[str]:
+    """ Returns the path of the results of a finished query job
+    Arguments:
+        token: the session token of the user
+        job_id: the ID of the job
+    Return:
+        Returns the path of the results, or None if the job isn't found or hasn't finished
+    """
+    job_info = _load_query_job(token, job_id)
+    if job_info is None or job_info['status'] != QUERY_JOB_DONE:
+        return None
+
+    return job_info['resultsPath']
+
+
+def cancel_query_job(token: str, job_id: str) -> bool:
+    """ Cancels a query job if it's still the user's current job
+    Arguments:
+        token: the session token of the user
+        job_id: the ID of the job
+    Return:
+        Returns True if the job is being cancelled and False if not
+    Notes:
+        A running job stops the next time it reports progress
+    """
+    owner_key = _get_owner_key(token)
+    if _load_query_job(token, job_id) is None or _get_current_job_id(owner_key) != job_id:
+        return False
+
+    try:
+        os.unlink(os.path.join(QUERY_JOBS_DIR, owner_key + QUERY_JOB_CURRENT_EXT))
+    except FileNotFoundError:
+        pass
+
+    return True
+
+
+def cleanup_query_jobs() -> None:
+    """ Removes the state of query jobs that have expired
+    """
+    expire_ts = time.time() - QUERY_JOB_EXPIRE_SEC
+    with os.scandir(QUERY_JOBS_DIR) as job_entries:
+        for one_entry in job_entries:
+            try:
+                if one_entry.stat().st_mtime < expire_ts:
+                    os.unlink(one_entry.path)
+            except FileNotFoundError:
+                pass
@@ -1,19 +1,28 @@
 """This script contains the interface to an S3 instance
 """
 
+import contextlib
 import csv
 import concurrent.futures
 import dataclasses
 import datetime
-from io import BytesIO, StringIO
+import gzip
+import hashlib
+from io import BytesIO, TextIOWrapper
 import json
 import os
 import tempfile
+import threading
+import time
 import traceback
-from typing import Optional, Callable
+from typing import Optional, Callable, Iterator, TextIO
 import uuid
+import certifi
+import urllib3
 from minio import Minio, S3Error
 
+from s3_metrics import InstrumentedMinio, get_request_endpoint
+
 # Prefix for SPARCd things
 SPARCD_PREFIX='sparcd-'
 
@@ -52,6 +61,148 @@ S3_UPLOADS_PATH_PART = 'Uploads/'
 # The metadata JSON file name for uploads
 S3_UPLOAD_META_JSON_FILE_NAME = 'UploadMeta.json'
 
+# The files of an upload whose ETags are checked to find out if the upload has changed
+S3_UPLOAD_DATA_FILE_NAMES = (S3_UPLOAD_META_JSON_FILE_NAME, *CAMTRAP_FILE_NAMES)
+# The file name of the uploads manifest of a collection
+S3_UPLOADS_MANIFEST_FILE_NAME = 'UploadsManifest.json'
+# The version of the uploads manifest contents
+S3_UPLOADS_MANIFEST_VERSION = 2
+# Number of times saving the uploads manifest is tried when another save changed it first
+S3_UPLOADS_MANIFEST_SAVE_TRIES = 3
+# Environment variable name for turning off compression of the uploads manifest
+ENV_NAME_S3_MANIFEST_COMPRESS = 'SPARCD_S3_MANIFEST_COMPRESS'
+# Working flag for compressing the uploads manifest
+S3_UPLOADS_MANIFEST_COMPRESS = os.environ.get(ENV_NAME_S3_MANIFEST_COMPRESS, 'true').lower() \
+                                                                    not in ('0', 'false', 'no')
+
+# Environment variable name for the number of pooled connections per S3 client
+ENV_NAME_S3_POOL_SIZE = 'SPARCD_S3_POOL_SIZE'
+# Default number of pooled connections per S3 client
+S3_POOL_SIZE_DEFAULT = 10
+# Working number of pooled connections per S3 client
+S3_POOL_SIZE = int(os.environ.get(ENV_NAME_S3_POOL_SIZE, S3_POOL_SIZE_DEFAULT))
+# Number of seconds a cached S3 client can be unused before it's released
+S3_CLIENT_IDLE_TIMEOUT_SEC = 10 * 60
+# Maximum number of cached S3 clients
+S3_CLIENT_MAX_COUNT = 32
+# Environment variable name for the number of upload folders loaded at the same time
+ENV_NAME_S3_UPLOAD_WORKERS = 'SPARCD_S3_UPLOAD_WORKERS'
+# Default number of upload folders loaded at the same time
+S3_UPLOAD_WORKERS_DEFAULT = 8
+# Working number of upload folders loaded at the same time
+S3_UPLOAD_WORKERS = int(os.environ.get(ENV_NAME_S3_UPLOAD_WORKERS, S3_UPLOAD_WORKERS_DEFAULT))
+# Environment variable name for the number of collection files loaded at the same time
+ENV_NAME_S3_DISCOVERY_WORKERS = 'SPARCD_S3_DISCOVERY_WORKERS'
+# Default number of collection files loaded at the same time
+S3_DISCOVERY_WORKERS_DEFAULT = 8
+# Working number of collection files loaded at the same time
+S3_DISCOVERY_WORKERS = int(os.environ.get(ENV_NAME_S3_DISCOVERY_WORKERS, \
+                                          S3_DISCOVERY_WORKERS_DEFAULT))
+# Largest S3 object size, in bytes, that's read into memory before spilling to disk
+S3_READ_MEMORY_MAX_BYTES = 8 * 1024 * 1024
+# Size of the chunks, in bytes, read from an S3 object
+S3_READ_CHUNK_BYTES = 256 * 1024
+# Timeout in seconds for connecting to, and reading from, the S3 endpoint
+S3_CLIENT_TIMEOUT_SEC = 5 * 60
+
+# Number of seconds an on-demand presigned URL is valid for
+S3_PRESIGNED_URL_EXPIRE_SEC = 12 * 60 * 60
+# Number of seconds before its expiration that a cached presigned URL is no longer used
+S3_PRESIGNED_URL_MARGIN_SEC = 10 * 60
+# Maximum number of cached presigned URLs
+S3_PRESIGNED_URL_MAX_COUNT = 50000
+
+# Cached S3 clients keyed by endpoint, user, and credential hash
+_S3_CLIENTS = {}
+# Lock protecting the cached S3 clients
+_S3_CLIENTS_LOCK = threading.Lock()
+# Cached presigned URLs keyed by endpoint, user, credential hash, bucket, and object path
+_PRESIGNED_URLS = {}
+# Lock protecting the cached presigned URLs
+_PRESIGNED_URLS_LOCK = threading.Lock()
+
+
+def _s3_client_key(url: str, user: str, password: str) -> tuple:
+    """ Returns the key identifying an S3 endpoint and credentials
+    Arguments:
+        url: the S3 endpoint
+        user: the user name
+        password: the user's password
+    Return:
+        Returns the key tuple
+    """
+    return (url, user, hashlib.sha256(str(password).encode('utf-8')).hexdigest())
+
+
+def _evict_s3_clients(now: float) -> None:
+    """ Releases idle S3 clients and trims the cache to its maximum size. The caller must
+        hold the client lock
+    Arguments:
+        now: the current monotonic time in seconds
+    """
+    expired_keys = [one_key for one_key, one_entry in _S3_CLIENTS.items() if \
+                                now - one_entry['last_used'] > S3_CLIENT_IDLE_TIMEOUT_SEC]
+    if len(_S3_CLIENTS) - len(expired_keys) > S3_CLIENT_MAX_COUNT:
+        remaining = sorted([one_key for one_key in _S3_CLIENTS if one_key not in expired_keys],
+                                            key=lambda one_key: _S3_CLIENTS[one_key]['last_used'])
+        expired_keys.extend(remaining[:len(remaining) - S3_CLIENT_MAX_COUNT])
+
+    for one_key in expired_keys:
+        _S3_CLIENTS.pop(one_key)['http'].clear()
+
+
+def get_s3_client(url: str, user: str, password: str) -> InstrumentedMinio:
+    """ Returns a shared S3 client for the endpoint and credentials, creating one if needed
+    Arguments:
+        url: the S3 endpoint
+        user: the user name
+        password: the user's password
+    Return:
+        Returns the S3 client instance wrapped in an InstrumentedMinio, which passes the
+        Minio calls through to the client
+    Notes:
+        Clients share a connection pool per endpoint and credentials so that keep-alive
+        connections are reused across requests. Clients unused for S3_CLIENT_IDLE_TIMEOUT_SEC
+        are released.
+        The returned client records metrics on its calls, tagged with the endpoint of the
+        request being handled when it was requested
+    """
+    client_key = _s3_client_key(url, user, password)
+    now = time.monotonic()
+
+    with _S3_CLIENTS_LOCK:
+        _evict_s3_clients(now)
+
+        found_entry = _S3_CLIENTS.get(client_key)
+        if found_entry is None:
+            # Same settings as the Minio default client, with our pool size
+            http_client = urllib3.PoolManager(
+                            timeout=urllib3.Timeout(connect=S3_CLIENT_TIMEOUT_SEC,
+                                                    read=S3_CLIENT_TIMEOUT_SEC),
+                            maxsize=S3_POOL_SIZE,
+                            cert_reqs='CERT_REQUIRED',
+                            ca_certs=os.environ.get('SSL_CERT_FILE') or certifi.where(),
+                            retries=urllib3.Retry(total=5, backoff_factor=0.2,
+                                                  status_forcelist=[500, 502, 503, 504]))
+            found_entry = {'client': Minio(url, access_key=user, secret_key=password, \
+                                           http_client=http_client),
+                           'http': http_client,
+                          }
+            _S3_CLIENTS[client_key] = found_entry
+
+        found_entry['last_used'] = now
+
+    return InstrumentedMinio(found_entry['client'], get_request_endpoint())
+
+
+def release_s3_clients() -> None:
+    """ Releases all the cached S3 clients and their connections
+    """
+    with _S3_CLIENTS_LOCK:
+        for one_entry in _S3_CLIENTS.values():
+            one_entry['http'].clear()
+        _S3_CLIENTS.clear()
+
 
 def make_s3_path(parts: tuple) -> str:
     """ Makes the parts into an S3 path
@@ -63,26 +214,96 @@ def make_s3_path(parts: tuple) -> str:
     return "/".join([one_part.rstrip('/').rstrip('\\') for one_part in parts])
 
 
-def get_s3_file(minio: Minio, bucket: str, file: str, dest_file: str):
-    """Downloads files from S3 server
+@contextlib.contextmanager
+def open_s3_file(minio: Minio, bucket: str, file: str) -> Iterator[Optional[TextIO]]:
+    """Opens a file on the S3 server for reading as text
     Arguments:
         minio: the s3 client instance
         bucket: the bucket to download from
         file: the S3 file to download and read
-        dest_file: the file to write the download to
     Returns:
-        Returns the content of the file or None if there was an error
+        Yields the opened text file or None if the file wasn't found
+    Notes:
+        The file is held in memory unless it's larger than S3_READ_MEMORY_MAX_BYTES, in which
+        case it's spilled to a temporary file
     """
     try:
-        minio.fget_object(bucket, file, dest_file)
-        with open(dest_file, 'r', encoding='utf-8') as in_file:
-            return in_file.read()
+        response = minio.get_object(bucket, file)
     except S3Error as ex:
         if ex.code != "NoSuchKey":
             raise ex
+        yield None
+        return
+
+    with tempfile.SpooledTemporaryFile(max_size=S3_READ_MEMORY_MAX_BYTES, \
+                                       prefix=SPARCD_PREFIX) as spool_file:
+        try:
+            for one_chunk in response.stream(S3_READ_CHUNK_BYTES):
+                spool_file.write(one_chunk)
+        finally:
+            response.close()
+            response.release_conn()
+        spool_file.seek(0)
+
+        with TextIOWrapper(spool_file, encoding='utf-8', newline='') as in_file:
+            yield in_file
+
+
+def get_s3_file(minio: Minio, bucket: str, file: str) -> Optional[str]:
+    """Downloads files from S3 server
+    Arguments:
+        minio: the s3 client instance
+        bucket: the bucket to download from
+        file: the S3 file to download and read
+    Returns:
+        Returns the content of the file or None if there was an error
+    """
+    with open_s3_file(minio, bucket, file) as in_file:
+        if in_file is not None:
+            return in_file.read()
     return None
 
 
+def get_presigned_url(url: str, user: str, password: str, bucket: str, s3_path: str) -> str:
+    """ Returns a presigned URL for an object, reusing a cached one when it's not close to
+        expiring
+    Arguments:
+        url: the S3 endpoint
+        user: the user name
+        password: the user's password
+        bucket: the bucket of the object
+        s3_path: the path of the object
+    Return:
+        Returns the presigned URL
+    """
+    url_key = (*_s3_client_key(url, user, password), bucket, s3_path)
+    now = time.monotonic()
+
+    with _PRESIGNED_URLS_LOCK:
+        found_url = _PRESIGNED_URLS.get(url_key)
+        if found_url is not None and found_url['use_until'] > now:
+            return found_url['url']
+
+    presigned_url = get_s3_client(url, user, password).presigned_get_object(bucket, s3_path, \
+                            expires=datetime.timedelta(seconds=S3_PRESIGNED_URL_EXPIRE_SEC))
+
+    with _PRESIGNED_URLS_LOCK:
+        # Make room by removing the URLs that can't be used anymore, and then the oldest ones
+        if len(_PRESIGNED_URLS) >= S3_PRESIGNED_URL_MAX_COUNT:
+            for one_key in [one_key for one_key, one_url in _PRESIGNED_URLS.items() if \
+                                                                    one_url['use_until'] <= now]:
+                del _PRESIGNED_URLS[one_key]
+            while len(_PRESIGNED_URLS) >= S3_PRESIGNED_URL_MAX_COUNT:
+                del _PRESIGNED_URLS[next(iter(_PRESIGNED_URLS))]
+
+        _PRESIGNED_URLS[url_key] = {'url': presigned_url,
+                                    'use_until': now + S3_PRESIGNED_URL_EXPIRE_SEC - \
+                                                                    S3_PRESIGNED_URL_MARGIN_SEC
+                                   }
+
+    return presigned_url
+
+
 def put_s3_file(minio: Minio, bucket: str, file: str, src_file: str, \
                 content_type: str='text/plain'):
     """ Upload files to the S3 server
@@ -101,6 +322,24 @@ def put_s3_file(minio: Minio, bucket: str, file: str, src_file: str, \
         if ex.code != "NoSuchKey":
             raise ex
 
+def find_settings_bucket(minio: Minio) -> Optional[str]:
+    """ Finds the name of the settings bucket
+    Arguments:
+        minio: the s3 client instance
+    Return:
+        Returns the name of the settings bucket, or None if one isn't found
+    """
+    settings_bucket = None
+    for one_bucket in minio.list_buckets():
+        if one_bucket.name == SETTINGS_BUCKET_LEGACY:
+            settings_bucket = one_bucket.name
+            break
+        if one_bucket.name.startswith(SETTINGS_BUCKET_PREFIX):
+            settings_bucket = one_bucket.name
+
+    return settings_bucket
+
+
 def get_user_collections(minio: Minio, user: str, buckets: tuple) -> tuple():
     """ Gets the collections that the user can access
     Arguments:
@@ -110,26 +349,41 @@ def get_user_collections(minio: Minio, user: str, buckets: tuple) -> tuple():
     Return:
         Returns a tuple containing the collections and buckets that the user has permissions for
     """
+    # pylint: disable=broad-exception-caught
     user_collections = []
 
-    # Loop through and get all the information for a collection
-    temp_file = tempfile.mkstemp(prefix=SPARCD_PREFIX)
-    os.close(temp_file[0])
-    for one_bucket in buckets:
-        collections_path = 'Collections'
-        base_path = make_s3_path((collections_path, one_bucket[len(SPARCD_PREFIX):]))
-
-        coll_info_path = make_s3_path((base_path, COLLECTION_JSON_FILE_NAME))
-        coll_data = get_s3_file(minio, one_bucket, coll_info_path, temp_file[1])
-        if coll_data is None or not coll_data:
-            continue
-        coll_data = json.loads(coll_data)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=S3_DISCOVERY_WORKERS) as executor:
+        # Request the collection and permissions of all the buckets at the same time
+        bucket_futures = []
+        for one_bucket in buckets:
+            collections_path = 'Collections'
+            base_path = make_s3_path((collections_path, one_bucket[len(SPARCD_PREFIX):]))
+
+            coll_info_path = make_s3_path((base_path, COLLECTION_JSON_FILE_NAME))
+            permissions_path = make_s3_path((base_path, PERMISSIONS_JSON_FILE_NAME))
+            bucket_futures.append((one_bucket, base_path,
+                                   executor.submit(get_s3_file, minio, one_bucket, coll_info_path),
+                                   executor.submit(get_s3_file, minio, one_bucket, permissions_path)
+                                 ))
+
+        # Loop through and get all the information for a collection in bucket order. A problem
+        # with one bucket only skips that bucket
+        for one_bucket, base_path, coll_future, perm_future in bucket_futures:
+            try:
+                coll_data = coll_future.result()
+                if coll_data is None or not coll_data:
+                    continue
+                coll_data = json.loads(coll_data)
 
-        permissions_path = make_s3_path((base_path, PERMISSIONS_JSON_FILE_NAME))
-        perm_data = get_s3_file(minio, one_bucket, permissions_path, temp_file[1])
+                perm_data = perm_future.result()
+                if perm_data is None:
+                    continue
+                perms = json.loads(perm_data)
+            except Exception as ex:
+                print(f'get_user_collections: Unable to load collection information from bucket ' \
+                      f'{one_bucket}: {ex}', flush=True)
+                continue
 
-        if perm_data is not None:
-            perms = json.loads(perm_data)
             found_perm = None
             for one_perm in perms:
                 if one_perm and 'usernameProperty' in one_perm and \
@@ -142,7 +396,6 @@ def get_user_collections(minio: Minio, user: str, buckets: tuple) -> tuple():
                               'all_permissions': perms
                              })
             user_collections.append(coll_data)
-    os.unlink(temp_file[1])
 
     return tuple(user_collections)
 
@@ -169,6 +422,44 @@ def get_uploaded_folders(minio: Minio, bucket: str, upload_path: str) -> tuple:
     return subfolders
 
 
+def get_upload_folder_contents(minio: Minio, bucket: str, upload_path: str) -> tuple:
+    """ Gets the folders and the ETags of the data files of an upload folder
+    Arguments:
+        minio - the S3 instance
+        bucket - the bucket to load from
+        upload_path: the top-level folder for the upload
+    Return:
+        A tuple of the folder names under the upload folder and a dict of the ETags of the
+        upload's S3_UPLOAD_DATA_FILE_NAMES files keyed by their names
+    """
+    subfolders = []
+    file_etags = {}
+
+    # Make sure we end with a path separator
+    upload_path = upload_path.rstrip('/') + '/'
+
+    for one_obj in minio.list_objects(bucket, upload_path):
+        if one_obj.is_dir:
+            if not one_obj.object_name == upload_path:
+                subfolders.append(one_obj.object_name[len(upload_path):].strip('/').strip('\\'))
+        elif one_obj.object_name[len(upload_path):] in S3_UPLOAD_DATA_FILE_NAMES:
+            file_etags[one_obj.object_name[len(upload_path):]] = one_obj.etag
+
+    return subfolders, file_etags
+
+
+def can_save_uploads_manifest(collection: dict) -> bool:
+    """ Returns whether the user's permissions on a collection allow saving its uploads manifest
+    Arguments:
+        collection - the collection returned by get_user_collections()
+    Return:
+        Returns True if the user can upload to, or owns, the collection and False if not
+    """
+    permissions = collection.get('permissions', None) or {}
+    return permissions.get('uploadProperty', False) is True or \
+                                                permissions.get('ownerProperty', False) is True
+
+
 def update_user_collections(minio: Minio, collections: tuple) -> tuple:
     """Updates the collections returned by get_user_collections() 
     Arguments:
@@ -239,44 +530,20 @@ def get_upload_data_thread(minio: Minio, bucket: str, upload_paths: tuple, colle
     # Get the data on each upload
     upload_info = []
 
-    temp_file = tempfile.mkstemp(prefix=SPARCD_PREFIX)
-    os.close(temp_file[0])
-
-    for one_path in upload_paths:
-        # Upload information
-        upload_info_path = make_s3_path((one_path, S3_UPLOAD_META_JSON_FILE_NAME))
-        coll_info_data = get_s3_file(minio, bucket, upload_info_path, temp_file[1])
-        if coll_info_data is not None:
-            try:
-                coll_info = json.loads(coll_info_data)
-            except json.JSONDecodeError:
-                print('get_upload_data_thread: Unable to load JSON information: ' \
-                      f'{upload_info_path}')
-                continue
-        else:
-            print(f'get_upload_data_thread: Unable to get upload information: {upload_info_path}')
+    for one_entry in load_upload_entries(minio, bucket, upload_paths, \
+                                         save_manifest=can_save_uploads_manifest(collection)):
+        # Only uploads with a known location are returned
+        if one_entry['loc'] is None:
             continue
 
-        # Location data
-        upload_info_path = make_s3_path((one_path, DEPLOYMENT_CSV_FILE_NAME))
-        csv_data = get_s3_file(minio, bucket, upload_info_path, temp_file[1])
-        if csv_data is not None:
-            reader = csv.reader(StringIO(csv_data))
-            for csv_info in reader:
-                if csv_info and len(csv_info) >= 23:
-                    upload_info.append({
-                                 'path':one_path,
-                                 'info':coll_info,
-                                 'location':csv_info[1],
-                                 'elevation':csv_info[12],
-                                 'key':os.path.basename(one_path.rstrip('/\\')),
-                                 'uploaded_folders': get_uploaded_folders(minio, bucket, one_path)
-                                })
-                    break
-        else:
-            print(f'Unable to get deployment information: {upload_info_path}')
-
-    os.unlink(temp_file[1])
+        upload_info.append({
+                     'path':one_entry['path'],
+                     'info':one_entry['meta'],
+                     'location':one_entry['loc'],
+                     'elevation':one_entry['elevation'],
+                     'key':one_entry['name'],
+                     'uploaded_folders': one_entry['uploaded_folders']
+                    })
 
     return {'collection': collection, 'uploads': upload_info}
 
@@ -337,6 +604,356 @@ def get_s3_images(minio: Minio, bucket: str, upload_paths: tuple, need_url: bool
     return images
 
 
+def assemble_observation_images(csv_file: TextIO, bucket: str, images: Optional[dict], \
+                                source_path: str) -> dict:
+    """ Adds the species observations from observations.csv data to their images
+    Arguments:
+        csv_file: the opened observations CSV file
+        bucket: the bucket the images are in
+        images: the known images keyed by their S3 path, or None to build the images from the
+                CSV data
+        source_path: the S3 path of the CSV data for messages
+    Return:
+        Returns the dict of images keyed by S3 path
+    Notes:
+        The CSV data is read one row at a time and images are found by their S3 path.
+        When images is None, an image is created for each new S3 path in the CSV data. Otherwise
+        rows for unknown images are reported and skipped, and rows without a species are not
+        added to the image's species
+    """
+    add_missing = images is None
+    if add_missing:
+        images = {}
+
+    cur_row = 0
+    for csv_info in csv.reader(csv_file):
+        cur_row = cur_row + 1
+        if len(csv_info) < 20:
+            if csv_info:
+                print(f'Invalid CSV row ({cur_row}) read from {source_path}')
+            continue
+
+        # Get the fields of interest
+        cur_species = { 'name':get_common_name(csv_info[19]), \
+                        'scientificName':csv_info[8], \
+                        'count':csv_info[9]}
+
+        cur_img = images.get(csv_info[3])
+        if cur_img is None:
+            if add_missing:
+                images[csv_info[3]] = { 'name':os.path.basename(csv_info[3].rstrip('/\\')),
+                                        'timestamp':csv_info[4],
+                                        'bucket': bucket,
+                                        's3_path': csv_info[3],
+                                        'species':[cur_species]}
+            else:
+                print(f'Unable to find collection image: {csv_info[3]}')
+            continue
+
+        if add_missing:
+            cur_img['species'].append(cur_species)
+            continue
+
+        # Add the species
+        if cur_img.get('species') is None:
+            cur_img['species'] = []
+
+        # Only return items that have data
+        if csv_info[8] and csv_info[9]:
+            cur_img['species'].append(cur_species)
+
+    return images
+
+
+def get_upload_location(minio: Minio, bucket: str, upload_folder: str) -> Optional[tuple]:
+    """ Loads the location and elevation of one upload folder from its deployment data
+    Arguments:
+        minio: the s3 client instance
+        bucket: the bucket of the upload
+        upload_folder: the S3 path of the upload folder
+    Return:
+        Returns a tuple of the location ID and elevation, which are None if the deployment
+        doesn't have them, or None if the deployment information couldn't be loaded
+    """
+    upload_info_path = make_s3_path((upload_folder, DEPLOYMENT_CSV_FILE_NAME))
+    with open_s3_file(minio, bucket, upload_info_path) as csv_file:
+        if csv_file is None:
+            print(f'Unable to get deployment information: {upload_info_path}')
+            return None
+
+        reader = csv.reader(csv_file)
+        for csv_info in reader:
+            if len(csv_info) >= 23:
+                return csv_info[1], csv_info[12]
+
+    return None, None
+
+
+def get_upload_location_thread(minio: Minio, bucket: str, upload_folder: str) -> Optional[dict]:
+    """ Loads only the location and elevation of one upload folder
+    Arguments:
+        minio: the s3 client instance
+        bucket: the bucket of the upload
+        upload_folder: the S3 path of the upload folder
+    Return:
+        Returns the upload's 'name', 'loc', and 'elevation', or None if the deployment
+        information couldn't be loaded
+    """
+    upload_location = get_upload_location(minio, bucket, upload_folder)
+    if upload_location is None:
+        return None
+
+    return {'name': os.path.basename(upload_folder.rstrip('/\\')),
+            'loc': upload_location[0],
+            'elevation': upload_location[1],
+           }
+
+
+def get_upload_listing_thread(minio: Minio, bucket: str, upload_folder: str) -> Optional[dict]:
+    """ Loads the metadata, location, subfolders, and image observations of one upload folder
+    Arguments:
+        minio: the s3 client instance
+        bucket: the bucket of the upload
+        upload_folder: the S3 path of the upload folder
+    Return:
+        Returns the uploads manifest entry for the upload, or None if the upload information
+        couldn't be loaded
+    """
+    upload_entry = {'name': os.path.basename(upload_folder.rstrip('/\\')),
+                    'path': upload_folder.rstrip('/') + '/',
+                    'loc': None,
+                    'elevation': None,
+                   }
+
+    # The folder contents are found first so that a file changed while loading is reloaded
+    # the next time the uploads are refreshed
+    upload_entry['uploaded_folders'], upload_entry['etags'] = \
+                                        get_upload_folder_contents(minio, bucket, upload_folder)
+
+    # Upload information
+    upload_info_path = make_s3_path((upload_folder, S3_UPLOAD_META_JSON_FILE_NAME))
+    meta_info_data = get_s3_file(minio, bucket, upload_info_path)
+    if meta_info_data is None:
+        print(f'list_uploads: Unable to get upload information: {upload_info_path}')
+        return None
+    try:
+        upload_entry['meta'] = json.loads(meta_info_data)
+    except json.JSONDecodeError as ex:
+        print(f'list_uploads: Unable to load upload information: {upload_info_path}: {ex}')
+        return None
+
+    # Location data
+    upload_location = get_upload_location(minio, bucket, upload_folder)
+    if upload_location is None:
+        return None
+    upload_entry['loc'], upload_entry['elevation'] = upload_location
+
+    # Uploaded images data
+    cur_images = {}
+    upload_info_path = make_s3_path((upload_folder, OBSERVATIONS_CSV_FILE_NAME))
+    with open_s3_file(minio, bucket, upload_info_path) as csv_file:
+        if csv_file is not None:
+            cur_images = assemble_observation_images(csv_file, bucket, None, upload_info_path)
+        else:
+            print(f'Unable to get deployment information: {upload_info_path}')
+    upload_entry['images'] = list(cur_images.values())
+
+    return upload_entry
+
+
+def upload_entry_to_upload(upload_entry: dict) -> dict:
+    """ Converts an uploads manifest entry to the upload information returned by list_uploads
+    Arguments:
+        upload_entry: the manifest entry to convert
+    Return:
+        Returns the upload's metadata with its name, location, the ETags of its data files,
+        and images added
+    """
+    upload = upload_entry['meta'] | {'name': upload_entry['name'], 'loc': upload_entry['loc'],
+                                     'etags': upload_entry['etags']}
+    if upload_entry['loc'] is not None:
+        upload['elevation'] = upload_entry['elevation']
+    upload['images'] = upload_entry['images']
+
+    return upload
+
+
+def get_uploads_manifest_path(bucket: str) -> str:
+    """ Returns the path of the uploads manifest of a collection
+    Arguments:
+        bucket: the bucket of the collection
+    Return:
+        Returns the S3 path of the manifest
+    """
+    return make_s3_path(('Collections', bucket[len(SPARCD_PREFIX):], S3_UPLOADS_MANIFEST_FILE_NAME))
+
+
+def get_uploads_manifest(minio: Minio, bucket: str) -> tuple:
+    """ Loads the uploads manifest of a collection
+    Arguments:
+        minio: the s3 client instance
+        bucket: the bucket of the collection
+    Return:
+        Returns a tuple of the manifest entries keyed by upload name, and the ETag of the
+        manifest. The ETag is None if the manifest isn't found, and there are no entries if
+        the manifest isn't found or isn't usable
+    """
+    manifest_path = get_uploads_manifest_path(bucket)
+    try:
+        response = minio.get_object(bucket, manifest_path)
+    except S3Error as ex:
+        if ex.code != "NoSuchKey":
+            print(f'Unable to get uploads manifest {bucket}:{manifest_path}: {ex}')
+        return {}, None
+
+    try:
+        manifest_data = response.data
+        manifest_etag = response.headers.get('ETag', '').strip('"')
+    finally:
+        response.close()
+        response.release_conn()
+
+    # pylint: disable=broad-exception-caught
+    try:
+        # Check for compressed contents
+        if manifest_data[:2] == b'\x1f\x8b':
+            manifest_data = gzip.decompress(manifest_data)
+        manifest = json.loads(manifest_data.decode('utf-8'))
+    except Exception as ex:
+        print(f'Unable to load uploads manifest {bucket}:{manifest_path}: {ex}')
+        return {}, manifest_etag
+
+    if not isinstance(manifest, dict) or \
+                            manifest.get('version', None) != S3_UPLOADS_MANIFEST_VERSION or \
+                            not isinstance(manifest.get('uploads', None), list):
+        print(f'Ignoring unknown version of uploads manifest {bucket}:{manifest_path}')
+        return {}, manifest_etag
+
+    return {one_entry['name']: one_entry for one_entry in manifest['uploads']}, manifest_etag
+
+
+def put_s3_object_if_match(minio: Minio, bucket: str, s3_path: str, data: bytes, \
+                           content_type: str, etag: Optional[str]) -> bool:
+    """ Saves an object only if it hasn't changed since it was read
+    Arguments:
+        minio: the s3 client instance
+        bucket: the bucket of the object
+        s3_path: the path of the object
+        data: the contents of the object
+        content_type: the content type of the object
+        etag: the ETag of the object when it was read, or None if the object wasn't found
+    Return:
+        Returns True if the object was saved and False if it was changed, or added, since
+        it was read
+    Exceptions:
+        Any other S3Error is raised
+    Notes:
+        Minio's put_object() can't send conditional headers, so the single PUT request is
+        made directly
+    """
+    headers = {'Content-Type': content_type}
+    if etag is None:
+        headers['If-None-Match'] = '*'
+    else:
+        headers['If-Match'] = f'"{etag}"'
+
+    try:
+        # pylint: disable=protected-access
+        minio._put_object(bucket, s3_path, data, headers=headers)
+    except S3Error as ex:
+        if ex.code in ('PreconditionFailed', 'ConditionalRequestConflict'):
+            return False
+        raise ex
+
+    return True
+
+
+def save_uploads_manifest(minio: Minio, bucket: str, upload_entries: tuple, \
+                          manifest: Optional[tuple]=None) -> bool:
+    """ Adds or replaces the entries of uploads in the uploads manifest of a collection
+    Arguments:
+        minio: the s3 client instance
+        bucket: the bucket of the collection
+        upload_entries: the manifest entries of the uploads
+        manifest: the entries and ETag of the manifest as returned by get_uploads_manifest(),
+                if it's already been loaded
+    Return:
+        Returns True if the manifest was saved and False if not
+    Notes:
+        The manifest is only replaced if it hasn't changed since it was loaded. When it has
+        changed it's loaded again and the entries are added to the new contents.
+        The manifest only saves time when loading uploads, so problems saving it are reported
+        and otherwise ignored
+    """
+    manifest_path = get_uploads_manifest_path(bucket)
+    for _ in range(S3_UPLOADS_MANIFEST_SAVE_TRIES):
+        manifest_entries, manifest_etag = manifest if manifest is not None else \
+                                                            get_uploads_manifest(minio, bucket)
+        manifest = None
+
+        manifest_entries = manifest_entries | \
+                                {one_entry['name']: one_entry for one_entry in upload_entries}
+        manifest_data = json.dumps({'version': S3_UPLOADS_MANIFEST_VERSION,
+                                    'uploads': [manifest_entries[one_name] for one_name in \
+                                                                    sorted(manifest_entries)]
+                                   }, separators=(',', ':')).encode('utf-8')
+        content_type = 'application/json'
+        if S3_UPLOADS_MANIFEST_COMPRESS:
+            manifest_data = gzip.compress(manifest_data)
+            content_type = 'application/gzip'
+
+        try:
+            if put_s3_object_if_match(minio, bucket, manifest_path, manifest_data, content_type, \
+                                                                                manifest_etag):
+                return True
+        except S3Error as ex:
+            print(f'Unable to save uploads manifest {bucket}:{manifest_path}: {ex}')
+            return False
+
+    print(f'Unable to save uploads manifest {bucket}:{manifest_path}: it kept changing')
+    return False
+
+
+def load_upload_entries(minio: Minio, bucket: str, upload_folders: tuple, \
+                        save_manifest: bool=False) -> tuple:
+    """ Returns the manifest entries of the upload folders, loading any that aren't in the
+        collection's uploads manifest and then adding them to the manifest
+    Arguments:
+        minio: the s3 client instance
+        bucket: the bucket of the uploads
+        upload_folders: the S3 paths of the upload folders
+        save_manifest: set to True to add the loaded uploads to the manifest when the user
+                is able to save it
+    Return:
+        Returns the list of manifest entries in the same order as the upload folders. Folders
+        that couldn't be loaded are skipped
+    Notes:
+        The manifest is loaded with one GET. Its entries are kept current by saving each
+        upload that's changed through this server with update_uploads_manifest(), and the
+        uploads that aren't in it are found by comparing it to the upload folders
+    """
+    manifest = get_uploads_manifest(minio, bucket)
+    folder_names = [os.path.basename(one_folder.rstrip('/\\')) for one_folder in upload_folders]
+    upload_entries = [manifest[0].get(one_name) for one_name in folder_names]
+
+    # Load the uploads that aren't in the manifest
+    missing_idx = [idx for idx, one_entry in enumerate(upload_entries) if one_entry is None]
+    loaded_entries = []
+    if missing_idx:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=S3_UPLOAD_WORKERS) as executor:
+            for idx, one_entry in zip(missing_idx, executor.map(lambda idx: \
+                            get_upload_listing_thread(minio, bucket, upload_folders[idx]), \
+                                                                                missing_idx)):
+                upload_entries[idx] = one_entry
+                if one_entry is not None:
+                    loaded_entries.append(one_entry)
+
+    if save_manifest and loaded_entries:
+        save_uploads_manifest(minio, bucket, loaded_entries, manifest)
+
+    return [one_entry for one_entry in upload_entries if one_entry is not None]
+
+
 def get_common_name(csv_comment: str) -> Optional[str]:
     """ Returns the common name from a CSV observation comment
     Arguments:
@@ -377,7 +994,7 @@ class S3Connection:
         """
         found_buckets = []
 
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
         all_buckets = minio.list_buckets()
 
         # Get the SPARCd buckets
@@ -400,7 +1017,7 @@ class S3Connection:
         """
         found_buckets = []
 
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
         all_buckets = minio.list_buckets()
 
         # Get the SPARCd buckets
@@ -425,7 +1042,7 @@ class S3Connection:
         Return:
             Returns the information on the collection or None if the collection isn't found
         """
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
         all_buckets = minio.list_buckets()
 
         # Get the matching bucket
@@ -463,7 +1080,7 @@ class S3Connection:
         Return:
             Returns the information on the collection or None if the collection isn't found
         """
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
         all_buckets = minio.list_buckets()
 
         # Get the matching bucket
@@ -472,34 +1089,28 @@ class S3Connection:
         if not found_buckets:
             return None
 
-        # Temporary file
-        temp_file = tempfile.mkstemp(prefix=SPARCD_PREFIX)
-        os.close(temp_file[0])
-
         # Upload information
         upload_info_path = make_s3_path((upload_path, S3_UPLOAD_META_JSON_FILE_NAME))
-        upload_info_data = get_s3_file(minio, bucket, upload_info_path, temp_file[1])
+        upload_info_data = get_s3_file(minio, bucket, upload_info_path)
         if upload_info_data is not None:
             try:
                 coll_info = json.loads(upload_info_data)
             except json.JSONDecodeError:
                 print(f'get_upload_info: Unable to load JSON information: {upload_info_path}')
-                os.unlink(temp_file[1])
                 return None
         else:
             print(f'get_upload_info: Unable to get upload information: {upload_info_path}')
-            os.unlink(temp_file[1])
             return None
 
         # Location data
         upload_info = None
         upload_info_path = make_s3_path((upload_path, DEPLOYMENT_CSV_FILE_NAME))
-        csv_data = get_s3_file(minio, bucket, upload_info_path, temp_file[1])
-        if csv_data is not None:
-            reader = csv.reader(StringIO(csv_data))
-            for csv_info in reader:
-                if csv_info and len(csv_info) >= 23:
-                    upload_info = {
+        with open_s3_file(minio, bucket, upload_info_path) as csv_file:
+            if csv_file is not None:
+                reader = csv.reader(csv_file)
+                for csv_info in reader:
+                    if csv_info and len(csv_info) >= 23:
+                        upload_info = {
                                  'path':upload_path,
                                  'info':coll_info,
                                  'location':csv_info[1],
@@ -507,11 +1118,9 @@ class S3Connection:
                                  'key':os.path.basename(upload_path.rstrip('/\\')),
                                  'uploaded_folders':get_uploaded_folders(minio, bucket, upload_path)
                                 }
-                    break
-        else:
-            print(f'Unable to get deployment information: {upload_info_path}')
-
-        os.unlink(temp_file[1])
+                        break
+            else:
+                print(f'Unable to get deployment information: {upload_info_path}')
 
         return upload_info
 
@@ -532,7 +1141,7 @@ class S3Connection:
         bucket = SPARCD_PREFIX + collection_id
         upload_path = make_s3_path(('Collections', collection_id, 'Uploads', upload_name)) + '/'
 
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
 
         images = get_s3_images(minio, bucket, [upload_path])
 
@@ -540,7 +1149,7 @@ class S3Connection:
 
     @staticmethod
     def get_images(url: str, user: str, password: str, collection_id: str, \
-                   upload_name: str) -> Optional[tuple]:
+                   upload_name: str, need_url: bool=True) -> Optional[tuple]:
         """ Returns the image information for an upload of a collection
         Arguments:
             url: the URL to the s3 instance
@@ -548,6 +1157,7 @@ class S3Connection:
             password: the user's password
             collection_id: the ID of the collection of the upload
             upload_name: the name of the upload to get image data on
+            need_url: set to False to skip presigning the image URLs (see get_object_url)
         Returns:
             Returns the images, or None
         """
@@ -555,59 +1165,97 @@ class S3Connection:
         upload_path = make_s3_path(('Collections', collection_id, S3_UPLOADS_PATH_PART, \
                                                                                 upload_name)) + '/'
 
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
 
-        images = get_s3_images(minio, bucket, [upload_path])
+        images = get_s3_images(minio, bucket, [upload_path], need_url)
 
         images_dict = {obj['s3_path']: obj for obj in images}
 
-        temp_file = tempfile.mkstemp(prefix=SPARCD_PREFIX)
-        os.close(temp_file[0])
-
         # Get the species information for each image
         upload_info_path = make_s3_path((upload_path, OBSERVATIONS_CSV_FILE_NAME))
-        csv_data = get_s3_file(minio, bucket, upload_info_path, temp_file[1])
-        if csv_data is not None:
+        with open_s3_file(minio, bucket, upload_info_path) as csv_file:
+            if csv_file is not None:
+                assemble_observation_images(csv_file, bucket, images_dict, upload_info_path)
+            else:
+                print(f'Unable to get observations information: {upload_info_path}')
 
-            reader = csv.reader(StringIO(csv_data))
-            for csv_info in reader:
-                common_name = get_common_name(csv_info[19])
+        return images
 
-                # Update the image with a species if we find it
-                cur_img = images_dict.get(csv_info[3])
-                if cur_img is not None:
 
-                    # Add the species
-                    if cur_img.get('species') is None:
-                        cur_img['species'] = []
+    @staticmethod
+    def list_uploads(url: str, user: str, password: str, bucket: str, \
+                     upload_names: Optional[tuple]=None, save_manifest: bool=False) -> \
+                                                                            Optional[tuple]:
+        """ Returns the upload information for a collection
+        Arguments:
+            url: the URL to the s3 instance
+            user: the name of the user to use when connecting
+            password: the user's password
+            bucket: the bucket of the uploads
+            upload_names: optional names of the only uploads to return
+            save_manifest: set to True to add the uploads that aren't in the collection's
+                    uploads manifest to it (see can_save_uploads_manifest())
+        Returns:
+            Returns the uploads, or None
+        Notes:
+            Uploads are loaded from the collection's uploads manifest when they're found in it
+        """
+        if not bucket.startswith(SPARCD_PREFIX):
+            print(f'Invalid bucket name specified: {bucket}')
+            return None
+
+        uploads_path = make_s3_path(('Collections', bucket[len(SPARCD_PREFIX):],
+                                                                S3_UPLOADS_PATH_PART)) + '/'
 
-                    # Only return items that have data
-                    if not csv_info[8] or not csv_info[9]:
-                        continue
+        minio = get_s3_client(url, user, password)
 
-                    cur_img['species'].append({ 'name':common_name, \
-                                                'scientificName':csv_info[8], \
-                                                'count':csv_info[9]})
-                else:
-                    print(f'Unable to find collection image: {csv_info[3]}')
-        else:
-            print(f'Unable to get observations information: {upload_info_path}')
+        # Get the upload folders and then load their information in parallel
+        upload_folders = [one_obj.object_name for one_obj in \
+                                                    minio.list_objects(bucket, uploads_path) \
+                                    if one_obj.is_dir and not one_obj.object_name == uploads_path]
+        if upload_names is not None:
+            upload_names = set(upload_names)
+            upload_folders = [one_folder for one_folder in upload_folders \
+                                    if os.path.basename(one_folder.rstrip('/\\')) in upload_names]
 
-        os.unlink(temp_file[1])
+        return [upload_entry_to_upload(one_entry) for one_entry in \
+                                load_upload_entries(minio, bucket, upload_folders, save_manifest)]
 
-        return images
+    @staticmethod
+    def has_uploads_manifest(url: str, user: str, password: str, bucket: str) -> bool:
+        """ Returns whether a collection has an uploads manifest
+        Arguments:
+            url: the URL to the s3 instance
+            user: the name of the user to use when connecting
+            password: the user's password
+            bucket: the bucket of the collection
+        Returns:
+            Returns True if the manifest is found and False if not
+        """
+        minio = get_s3_client(url, user, password)
+        try:
+            minio.stat_object(bucket, get_uploads_manifest_path(bucket))
+        except S3Error as ex:
+            if ex.code != "NoSuchKey":
+                print(f'Unable to check for the uploads manifest of {bucket}: {ex}')
+            return False
 
+        return True
 
     @staticmethod
-    def list_uploads(url: str, user: str, password: str, bucket: str) -> Optional[tuple]:
-        """ Returns the upload information for a collection
+    def list_upload_locations(url: str, user: str, password: str, bucket: str) -> \
+                                                                            Optional[tuple]:
+        """ Returns the location and elevation of each of a collection's uploads without
+            loading their observations
         Arguments:
             url: the URL to the s3 instance
             user: the name of the user to use when connecting
             password: the user's password
             bucket: the bucket of the uploads
         Returns:
-            Returns the uploads, or None
+            Returns the 'name', 'loc', and 'elevation' of each upload, or None
+        Notes:
+            Only the deployment information of the uploads is loaded
         """
         if not bucket.startswith(SPARCD_PREFIX):
             print(f'Invalid bucket name specified: {bucket}')
@@ -616,85 +1264,117 @@ class S3Connection:
         uploads_path = make_s3_path(('Collections', bucket[len(SPARCD_PREFIX):],
                                                                 S3_UPLOADS_PATH_PART)) + '/'
 
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
 
-        temp_file = tempfile.mkstemp(prefix=SPARCD_PREFIX)
-        os.close(temp_file[0])
-        # Get the uploads and their information
-        coll_uploads = []
-        for one_obj in minio.list_objects(bucket, uploads_path):
-            if one_obj.is_dir and not one_obj.object_name == uploads_path:
-                # Get the data on this upload
-
-                # Upload information
-                upload_info_path = make_s3_path((one_obj.object_name,S3_UPLOAD_META_JSON_FILE_NAME))
-                meta_info_data = get_s3_file(minio, bucket, upload_info_path, \
-                                             temp_file[1])
-                if meta_info_data is not None:
-                    meta_info_data = json.loads(meta_info_data)
-                else:
-                    print(f'list_uploads: Unable to get upload information: {upload_info_path}')
-                    continue
+        upload_folders = [one_obj.object_name for one_obj in \
+                                                    minio.list_objects(bucket, uploads_path) \
+                                if one_obj.is_dir and one_obj.object_name != uploads_path]
 
-                # Add the name
-                meta_info_data['name'] = os.path.basename(one_obj.object_name.rstrip('/\\'))
-
-                # Location data
-                meta_info_data['loc'] = None
-                upload_info_path = make_s3_path((one_obj.object_name, DEPLOYMENT_CSV_FILE_NAME))
-                csv_data = get_s3_file(minio, bucket, upload_info_path, temp_file[1])
-                if csv_data is not None:
-                    reader = csv.reader(StringIO(csv_data))
-                    for csv_info in reader:
-                        if len(csv_info) >= 23:
-                            meta_info_data['loc'] = csv_info[1]
-                            meta_info_data['elevation'] =  csv_info[12]
-                            break
-                else:
-                    print(f'Unable to get deployment information: {upload_info_path}')
-                    continue
+        upload_locations = []
+        if upload_folders:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=S3_UPLOAD_WORKERS) as executor:
+                for one_location in executor.map(lambda one_folder: \
+                                        get_upload_location_thread(minio, bucket, one_folder), \
+                                                                            upload_folders):
+                    if one_location is not None:
+                        upload_locations.append(one_location)
+
+        return upload_locations
+
+    @staticmethod
+    def update_uploads_manifest(url: str, user: str, password: str, bucket: str, \
+                                                            upload_path: str) -> Optional[dict]:
+        """ Reloads one upload and updates the collection's uploads manifest with it
+        Arguments:
+            url: the URL to the s3 instance
+            user: the name of the user to use when connecting
+            password: the user's password
+            bucket: the bucket of the upload
+            upload_path: the S3 path of the upload folder
+        Returns:
+            Returns the reloaded upload information, in the same format as list_uploads(), or
+            None if the upload couldn't be loaded
+        Notes:
+            Problems saving the manifest are reported and otherwise ignored
+        """
+        minio = get_s3_client(url, user, password)
+
+        upload_entry = get_upload_listing_thread(minio, bucket, upload_path)
+        if upload_entry is None:
+            return None
+
+        save_uploads_manifest(minio, bucket, (upload_entry,))
+
+        return upload_entry_to_upload(upload_entry)
+
+    @staticmethod
+    def refresh_uploads(url: str, user: str, password: str, bucket: str, \
+                        known_uploads: tuple, save_manifest: bool=False) -> Optional[tuple]:
+        """ Updates previously loaded uploads of a collection by only loading the uploads that
+            are new or whose data files have changed
+        Arguments:
+            url: the URL to the s3 instance
+            user: the name of the user to use when connecting
+            password: the user's password
+            bucket: the bucket of the uploads
+            known_uploads: the uploads previously returned by list_uploads() or this function
+            save_manifest: set to True to update the collection's uploads manifest with the
+                    reloaded uploads (see can_save_uploads_manifest())
+        Returns:
+            Returns the updated uploads, or None
+        Notes:
+            The upload folders and the ETags of their data files are found with one recursive
+            listing of the uploads. Known uploads are reloaded when the ETag of any of their
+            S3_UPLOAD_DATA_FILE_NAMES files has changed, or a file was added or removed
+        """
+        if not known_uploads:
+            return S3Connection.list_uploads(url, user, password, bucket, \
+                                             save_manifest=save_manifest)
 
-                # Uploaded images data
-                cur_images = []
-                upload_info_path = make_s3_path((one_obj.object_name, OBSERVATIONS_CSV_FILE_NAME))
-                csv_data = get_s3_file(minio, bucket, upload_info_path, temp_file[1])
-                if csv_data is not None:
-                    cur_row = 0
-                    reader = csv.reader(StringIO(csv_data))
-                    for csv_info  in reader:
-                        cur_row = cur_row + 1
-                        if len(csv_info) >= 20:
-                            # Get the fields of interest
-                            cur_species = { 'name':get_common_name(csv_info[19]), \
-                                            'scientificName':csv_info[8], \
-                                            'count':csv_info[9]}
-
-                            image_name = os.path.basename(csv_info[3].rstrip('/\\'))
-                            temp_image = [one_image for one_image in cur_images if \
-                                                one_image['name'] == image_name and \
-                                                one_image['bucket'] == bucket and \
-                                                one_image['s3_path'] == csv_info[3]]
-                            if temp_image and len(temp_image) > 0:
-                                temp_image = temp_image[0]
-
-                            if temp_image:
-                                temp_image['species'].append(cur_species)
-                            else:
-                                cur_images.append({ 'name':image_name,
-                                                    'timestamp':csv_info[4],
-                                                    'bucket': bucket,
-                                                    's3_path': csv_info[3],
-                                                    'species':[cur_species]})
-                        elif csv_info:
-                            print(f'Invalid CSV row ({cur_row}) read from {upload_info_path}')
+        if not bucket.startswith(SPARCD_PREFIX):
+            print(f'Invalid bucket name specified: {bucket}')
+            return None
+
+        uploads_path = make_s3_path(('Collections', bucket[len(SPARCD_PREFIX):],
+                                                                S3_UPLOADS_PATH_PART)) + '/'
+
+        minio = get_s3_client(url, user, password)
+
+        # Find the upload folders and the ETags of their data files
+        upload_etags = {}
+        for one_obj in minio.list_objects(bucket, uploads_path, recursive=True):
+            upload_name, _, file_path = one_obj.object_name[len(uploads_path):].partition('/')
+            if not file_path:
+                continue
+            file_etags = upload_etags.setdefault(upload_name, {})
+            if file_path in S3_UPLOAD_DATA_FILE_NAMES:
+                file_etags[file_path] = one_obj.etag
+
+        # Find the new uploads and the known ones that have changed
+        known_uploads = {one_upload['name']: one_upload for one_upload in known_uploads \
+                                                        if one_upload['name'] in upload_etags}
+        reload_folders = [uploads_path + upload_name + '/' for upload_name, file_etags in \
+                                                                sorted(upload_etags.items()) \
+                                if upload_name not in known_uploads or \
+                                        known_uploads[upload_name].get('etags') != file_etags]
+
+        # Reload the new and changed uploads
+        reloaded_entries = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=S3_UPLOAD_WORKERS) as executor:
+            for one_folder, one_entry in zip(reload_folders, executor.map(lambda one_folder: \
+                                            get_upload_listing_thread(minio, bucket, one_folder), \
+                                                                                reload_folders)):
+                upload_name = os.path.basename(one_folder.rstrip('/\\'))
+                if one_entry is not None:
+                    reloaded_entries.append(one_entry)
+                    known_uploads[upload_name] = upload_entry_to_upload(one_entry)
                 else:
-                    print(f'Unable to get deployment information: {upload_info_path}')
-                meta_info_data['images'] = cur_images
-                coll_uploads.append(meta_info_data)
+                    known_uploads.pop(upload_name, None)
 
-        os.unlink(temp_file[1])
+        if save_manifest and reloaded_entries:
+            save_uploads_manifest(minio, bucket, reloaded_entries)
 
-        return coll_uploads
+        return [known_uploads[one_name] for one_name in sorted(known_uploads.keys())]
 
     @staticmethod
     def get_configuration(filename: str, url: str, user: str, password: str):
@@ -705,32 +1385,50 @@ class S3Connection:
             user: the name of the user to use when connecting
             password: the user's password
         """
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
 
         # Find the name of our settings bucket
-        settings_bucket = None
-        for one_bucket in minio.list_buckets():
-            if one_bucket.name == SETTINGS_BUCKET_LEGACY:
-                settings_bucket = one_bucket.name
-                break
-            if one_bucket.name.startswith(SETTINGS_BUCKET_PREFIX):
-                settings_bucket = one_bucket.name
-
-        temp_file = tempfile.mkstemp(prefix=SPARCD_PREFIX)
-        os.close(temp_file[0])
+        settings_bucket = find_settings_bucket(minio)
 
         file_path = make_s3_path((SETTINGS_FOLDER, filename))
         config_data = None
         try:
-            config_data = get_s3_file(minio, settings_bucket, file_path, temp_file[1])
+            config_data = get_s3_file(minio, settings_bucket, file_path)
         except S3Error as ex:
             print(f'Unable to get configuration file {filename} from {settings_bucket}')
             print(ex)
-        finally:
-            os.unlink(temp_file[1])
 
         return config_data
 
+    @staticmethod
+    def get_configuration_version(filename: str, url: str, user: str, password: str) -> \
+                                                                                Optional[dict]:
+        """ Returns the version information of the configuration file without downloading it
+        Arguments:
+            filename: the name of the configuration to check
+            url: the URL to the s3 instance
+            user: the name of the user to use when connecting
+            password: the user's password
+        Return:
+            Returns a dict with the 'etag' and 'last_modified' (ISO format string) of the
+            file, or None if the file isn't found
+        """
+        minio = get_s3_client(url, user, password)
+
+        settings_bucket = find_settings_bucket(minio)
+
+        file_path = make_s3_path((SETTINGS_FOLDER, filename))
+        try:
+            stat = minio.stat_object(settings_bucket, file_path)
+        except S3Error as ex:
+            print(f'Unable to get configuration file version {filename} from {settings_bucket}')
+            print(ex)
+            return None
+
+        return {'etag': stat.etag,
+                'last_modified': stat.last_modified.isoformat() if stat.last_modified else None
+               }
+
     @staticmethod
     def put_configuration(filename: str, config: str, url: str, user: str, password: str):
         """ Updates the server with the configuration string in the file
@@ -741,16 +1439,10 @@ class S3Connection:
             user: the name of the user to use when connecting
             password: the user's password
         """
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
 
         # Find the name of our settings bucket
-        settings_bucket = None
-        for one_bucket in minio.list_buckets():
-            if one_bucket.name == SETTINGS_BUCKET_LEGACY:
-                settings_bucket = one_bucket.name
-                break
-            if one_bucket.name.startswith(SETTINGS_BUCKET_PREFIX):
-                settings_bucket = one_bucket.name
+        settings_bucket = find_settings_bucket(minio)
 
         temp_file = tempfile.mkstemp(prefix=SPARCD_PREFIX)
         os.close(temp_file[0])
@@ -780,10 +1472,25 @@ class S3Connection:
         Return:
             Returns a tuple containing the S3 URLs for the objects (each url subject to timeout)
         """
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
 
         return [minio.presigned_get_object(one_obj[0], one_obj[1]) for one_obj in object_info]
 
+    @staticmethod
+    def get_object_url(url: str, user: str, password: str, bucket: str, s3_path: str) -> str:
+        """ Returns a presigned URL for the object, generating one only when there isn't a
+            cached URL that's still valid
+        Arguments:
+            url: the URL to the s3 instance
+            user: the name of the user to use when connecting
+            password: the user's password
+            bucket: the bucket of the object
+            s3_path: the path of the object
+        Return:
+            Returns the S3 URL for the object (subject to timeout)
+        """
+        return get_presigned_url(url, user, password, bucket, s3_path)
+
     @staticmethod
     def download_images_cb(url: str, user: str, password:str, files: tuple, dest_path: str, \
                                                         callback: Callable, callback_data) -> None:
@@ -802,7 +1509,7 @@ class S3Connection:
             If a destination path is not specified for a file, the S3 path is used (starting at the
             root of the dest_path)
         """
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
 
         # Download the files one at a time and call the callback
         with concurrent.futures.ThreadPoolExecutor() as executor:
@@ -833,7 +1540,7 @@ class S3Connection:
             s3_path: the path to the file on S3
             dest_file_path: the location to download the file to
         """
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
 
         # Download the files one at a time and call the callback
         minio.fget_object(bucket, s3_path, dest_file_path)
@@ -854,7 +1561,7 @@ class S3Connection:
         Return:
             The bucket name and the path of the upload folder on the S3 instance
         """
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
 
         bucket = SPARCD_PREFIX + collection_id
         upload_folder = timestamp.strftime('%Y.%m.%d.%H.%M.%S') + '_' + user
@@ -902,7 +1609,7 @@ class S3Connection:
             path: path under the bucket to the object data
             localname: the local filename of the file to upload
         """
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
 
         minio.fput_object(bucket, path, localname)
 
@@ -919,7 +1626,7 @@ class S3Connection:
             data: the data to upload
             content_type: the content type of the upload
         """
-        minio = Minio(url, access_key=user, secret_key=password)
+        minio = get_s3_client(url, user, password)
 
         minio.put_object(bucket, path, BytesIO(data.encode()), len(data), content_type=content_type)
 
@@ -936,21 +1643,15 @@ class S3Connection:
         Return:
             Returns the loaded data or None
         """
-        minio = Minio(url, access_key=user, secret_key=password)
-
-        temp_file = tempfile.mkstemp(prefix=SPARCD_PREFIX)
-        os.close(temp_file[0])
-
-        csv_data = get_s3_file(minio, bucket, path, temp_file[1])
-
-        os.unlink(temp_file[1])
+        minio = get_s3_client(url, user, password)
 
         camtrap_data = []
-        if csv_data is not None:
-            reader = csv.reader(StringIO(csv_data))
-            for csv_row in reader:
-                if csv_row and len(csv_row) >= 5:
-                    camtrap_data.append(list(csv_row))
+        with open_s3_file(minio, bucket, path) as csv_file:
+            if csv_file is not None:
+                reader = csv.reader(csv_file)
+                for csv_row in reader:
+                    if csv_row and len(csv_row) >= 5:
+                        camtrap_data.append(list(csv_row))
 
         return camtrap_data
 
@@ -1052,14 +1753,11 @@ class S3Connection:
         Return:
             Returns True if no problem was found and False otherwise
         """
-        minio = Minio(url, access_key=user, secret_key=password)
-
-        temp_file = tempfile.mkstemp(prefix=SPARCD_PREFIX)
-        os.close(temp_file[0])
+        minio = get_s3_client(url, user, password)
 
         # Get the upload information
         upload_info_path = make_s3_path((upload_path, S3_UPLOAD_META_JSON_FILE_NAME))
-        coll_info_data = get_s3_file(minio, bucket, upload_info_path, temp_file[1])
+        coll_info_data = get_s3_file(minio, bucket, upload_info_path)
         if coll_info_data is not None:
             try:
                 coll_info = json.loads(coll_info_data)
@@ -1078,7 +1776,6 @@ class S3Connection:
         minio.put_object(bucket, upload_info_path, BytesIO(data.encode()), len(data),
                                                                     content_type='application/json')
 
-        os.unlink(temp_file[1])
         return True
 
 
@@ -1096,14 +1793,11 @@ class S3Connection:
         Return:
             Returns True if no problem was found and False otherwise
         """
-        minio = Minio(url, access_key=user, secret_key=password)
-
-        temp_file = tempfile.mkstemp(prefix=SPARCD_PREFIX)
-        os.close(temp_file[0])
+        minio = get_s3_client(url, user, password)
 
         # Get the upload information
         upload_info_path = make_s3_path((upload_path, S3_UPLOAD_META_JSON_FILE_NAME))
-        coll_info_data = get_s3_file(minio, bucket, upload_info_path, temp_file[1])
+        coll_info_data = get_s3_file(minio, bucket, upload_info_path)
         if coll_info_data is not None:
             try:
                 coll_info = json.loads(coll_info_data)
@@ -1122,5 +1816,4 @@ class S3Connection:
         minio.put_object(bucket, upload_info_path, BytesIO(data.encode()), len(data),
                                                                     content_type='application/json')
 
-        os.unlink(temp_file[1])
         return True
@@ -0,0 +1,202 @@
+""" Records metrics on the calls made to an S3 instance """
+
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+# Upper bounds, in seconds, of the latency histogram buckets. Anything larger goes in a final bucket
+LATENCY_BUCKETS_SEC = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Endpoint name used when a call isn't made while handling a request
+UNKNOWN_ENDPOINT = 'unknown'
+
+# The S3 client operations that are recorded. _put_object is the single request PUT used to
+# save objects conditionally
+INSTRUMENTED_OPERATIONS = ('fget_object', 'fput_object', 'get_object', 'list_buckets',
+                           'list_objects', 'presigned_get_object', 'put_object', 'stat_object',
+                           '_put_object')
+
+# Recorded metrics keyed by operation, endpoint, and bucket
+_METRICS = {}
+# Lock protecting the recorded metrics
+_METRICS_LOCK = threading.Lock()
+# The endpoint being handled by the current thread
+_REQUEST_INFO = threading.local()
+
+
+def set_request_endpoint(endpoint: Optional[str]) -> None:
+    """ Sets the name of the endpoint the current thread is handling
+    Arguments:
+        endpoint: the name of the endpoint
+    """
+    _REQUEST_INFO.endpoint = endpoint
+
+
+def get_request_endpoint() -> str:
+    """ Returns the name of the endpoint the current thread is handling
+    Return:
+        Returns the endpoint name, or UNKNOWN_ENDPOINT if one isn't set
+    """
+    return getattr(_REQUEST_INFO, 'endpoint', None) or UNKNOWN_ENDPOINT
+
+
+def record_operation(operation: str, endpoint: str, bucket: Optional[str], elapsed_sec: float, \
+                     num_bytes: int=0, failed: bool=False) -> None:
+    """ Records one S3 operation
+    Arguments:
+        operation: the name of the operation
+        endpoint: the name of the endpoint the operation was made for
+        bucket: the bucket of the operation, if there is one
+        elapsed_sec: the number of seconds the operation took
+        num_bytes: the number of bytes transferred
+        failed: set to True if the operation raised an exception
+    """
+    bucket_index = len(LATENCY_BUCKETS_SEC)
+    for index, one_bound in enumerate(LATENCY_BUCKETS_SEC):
+        if elapsed_sec <= one_bound:
+            bucket_index = index
+            break
+
+    metrics_key = (operation, endpoint, bucket)
+    with _METRICS_LOCK:
+        cur_metrics = _METRICS.get(metrics_key)
+        if cur_metrics is None:
+            cur_metrics = {'count': 0, 'errors': 0, 'bytes': 0, 'seconds': 0.0,
+                           'histogram': [0] * (len(LATENCY_BUCKETS_SEC) + 1)}
+            _METRICS[metrics_key] = cur_metrics
+
+        cur_metrics['count'] += 1
+        cur_metrics['errors'] += 1 if failed else 0
+        cur_metrics['bytes'] += num_bytes
+        cur_metrics['seconds'] += elapsed_sec
+        cur_metrics['histogram'][bucket_index] += 1
+
+
+def get_metrics() -> dict:
+    """ Returns the metrics recorded by this process
+    Return:
+        Returns a dict with the process ID, the latency bucket bounds, and the list of
+        operation metrics sorted by operation, endpoint, and bucket
+    """
+    with _METRICS_LOCK:
+        operations = [{'operation': one_key[0], 'endpoint': one_key[1], 'bucket': one_key[2],
+                       'count': one_metrics['count'], 'errors': one_metrics['errors'],
+                       'bytes': one_metrics['bytes'], 'seconds': one_metrics['seconds'],
+                       'histogram': list(one_metrics['histogram'])
+                      } for one_key, one_metrics in _METRICS.items()]
+
+    return {'pid': os.getpid(),
+            'latencyBucketsSec': LATENCY_BUCKETS_SEC,
+            'operations': sorted(operations, key=lambda item: (item['operation'],
+                                                              item['endpoint'],
+                                                              item['bucket'] or ''))
+           }
+
+
+def _transfer_bytes(operation: str, args: tuple, kwargs: dict, result) -> int:
+    """ Returns the number of bytes transferred by an operation
+    Arguments:
+        operation: the name of the operation
+        args: the positional arguments of the call
+        kwargs: the keyword arguments of the call
+        result: the value returned by the call
+    Return:
+        Returns the number of bytes, or 0 if it's not known
+    """
+    # pylint: disable=too-many-return-statements
+    if operation == 'get_object':
+        return int(result.headers.get('Content-Length', 0) or 0)
+    if operation == 'fget_object':
+        return int(result.size or 0) if result is not None else 0
+    if operation == 'put_object':
+        return int(args[3] if len(args) > 3 else kwargs.get('length', 0))
+    if operation == '_put_object':
+        return len(args[2] if len(args) > 2 else kwargs.get('data', b''))
+    if operation == 'fput_object':
+        file_path = args[2] if len(args) > 2 else kwargs.get('file_path')
+        return os.path.getsize(file_path) if file_path and os.path.exists(file_path) else 0
+
+    return 0
+
+
+class InstrumentedMinio:
+    """ Wraps an S3 client and records the operations made through it
+    """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, client, endpoint: str):
+        """ Initializer
+        Arguments:
+            client: the S3 client to wrap
+            endpoint: the name of the endpoint the operations are made for
+        """
+        self._client = client
+        self._endpoint = endpoint
+
+    def __getattr__(self, name: str):
+        """ Returns the client attribute, wrapping recorded operations
+        Arguments:
+            name: the name of the attribute
+        """
+        attr = getattr(self._client, name)
+        if name not in INSTRUMENTED_OPERATIONS:
+            return attr
+
+        if name == 'list_objects':
+            return self._wrap_listing(attr)
+
+        return self._wrap_call(name, attr)
+
+    def _wrap_call(self, operation: str, func: Callable) -> Callable:
+        """ Returns a function that records the call to the operation
+        Arguments:
+            operation: the name of the operation
+            func: the client function to call
+        """
+        def recorded_call(*args, **kwargs):
+            bucket = args[0] if args else kwargs.get('bucket_name')
+            start_time = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                record_operation(operation, self._endpoint, bucket,
+                                 time.perf_counter() - start_time, failed=True)
+                raise
+
+            record_operation(operation, self._endpoint, bucket, time.perf_counter() - start_time,
+                             _transfer_bytes(operation, args, kwargs, result))
+            return result
+
+        return recorded_call
+
+    def _wrap_listing(self, func: Callable) -> Callable:
+        """ Returns a function that records the time spent listing objects
+        Arguments:
+            func: the client listing function to call
+        Notes:
+            Listings are returned as generators, so the time is recorded once the listing is done
+        """
+        def recorded_listing(*args, **kwargs):
+            bucket = args[0] if args else kwargs.get('bucket_name')
+            elapsed_sec = 0.0
+            failed = False
+            try:
+                listing = func(*args, **kwargs)
+                while True:
+                    start_time = time.perf_counter()
+                    try:
+                        one_obj = next(listing)
+                    except StopIteration:
+                        break
+                    finally:
+                        elapsed_sec += time.perf_counter() - start_time
+                    yield one_obj
+            except Exception:
+                failed = True
+                raise
+            finally:
+                record_operation('list_objects', self._endpoint, bucket, elapsed_sec,
+                                 failed=failed)
+
+        return recorded_listing
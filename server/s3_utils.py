@@ -3,6 +3,7 @@
 import json
 import os
 import tempfile
+import threading
 from typing import Callable
 from urllib.parse import urlparse
 
@@ -11,6 +12,35 @@ from cryptography.fernet import InvalidToken
 from sparcd_file_utils import load_timed_info, save_timed_info
 from s3_access import S3Connection
 
+# Suffix of the file holding a configuration along with its S3 version information
+CONFIG_VERSION_FILE_SUFFIX = '.version'
+# Number of seconds a configuration's version file can be revalidated against S3
+CONFIG_VERSION_FILE_EXPIRE_SEC = 7 * 24 * 60 * 60
+
+# Counts of configuration loads that used the timed file (hit), were unchanged on S3
+# (revalidate), or were downloaded (miss)
+_CONFIG_CACHE_STATS = {'hit': 0, 'revalidate': 0, 'miss': 0}
+# Lock protecting the configuration counts
+_CONFIG_CACHE_STATS_LOCK = threading.Lock()
+
+
+def _count_config_load(stat_name: str) -> None:
+    """ Increments the count of configuration loads
+    Arguments:
+        stat_name: the name of the count to increment
+    """
+    with _CONFIG_CACHE_STATS_LOCK:
+        _CONFIG_CACHE_STATS[stat_name] += 1
+
+
+def get_config_cache_stats() -> dict:
+    """ Returns the counts of configuration loads for this process
+    Return:
+        Returns a dict of the number of loads that were hits, revalidated, and misses
+    """
+    with _CONFIG_CACHE_STATS_LOCK:
+        return dict(_CONFIG_CACHE_STATS)
+
 
 def web_to_s3_url(url: str, decrypt: Callable) -> str:
     """ Takes a web URL and converts it to something Minio can handle: converts
@@ -58,20 +88,38 @@ def load_sparcd_config(sparcd_file: str, timed_file: str, url: str, user: str, \
     Return:
         Returns the loaded configuration information or None if there's a
         problem
+    Notes:
+        Once the timed file expires, the configuration's version on S3 is checked against the
+        version of the last download. The configuration is only downloaded again if it changed
     """
     config_file_path = os.path.join(tempfile.gettempdir(), timed_file)
     loaded_config = load_timed_info(config_file_path)
     if loaded_config:
+        _count_config_load('hit')
         return loaded_config
 
+    # Check if what we downloaded last is still current
+    password = fetch_password()
+    version_file_path = config_file_path + CONFIG_VERSION_FILE_SUFFIX
+    cur_version = S3Connection.get_configuration_version(sparcd_file, url, user, password)
+    saved_version = load_timed_info(version_file_path, CONFIG_VERSION_FILE_EXPIRE_SEC)
+    if cur_version is not None and saved_version is not None and \
+                                            saved_version.get('etag') == cur_version['etag']:
+        _count_config_load('revalidate')
+        save_timed_info(config_file_path, saved_version['data'])
+        return saved_version['data']
+
     # Try to get the configuration information from S3
-    loaded_config = S3Connection.get_configuration(sparcd_file, url, user, fetch_password())
+    _count_config_load('miss')
+    loaded_config = S3Connection.get_configuration(sparcd_file, url, user, password)
     if loaded_config is None:
         return None
 
     try:
         loaded_config = json.loads(loaded_config)
         save_timed_info(config_file_path, loaded_config)
+        if cur_version is not None:
+            save_timed_info(version_file_path, cur_version | {'data': loaded_config})
     except ValueError as ex:
         print(f'Invalid JSON from configuration file {sparcd_file}')
         print(ex)
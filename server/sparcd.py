@@ -26,8 +26,11 @@ from flask_cors import cross_origin
 import spd_crypt as crypt
 from camtrap.v016 import camtrap
 import camtrap_utils as ctu
+from format_dr_sanderson import start_report_workers
 import image_utils
+import query_cache
 import query_helpers
+import query_jobs
 import query_utils
 from sparcd_db import SPARCdDatabase
 import sparcd_file_utils as sdfu
@@ -36,6 +39,7 @@ from s3_access import S3Connection, make_s3_path, DEPLOYMENT_CSV_FILE_NAME, MEDI
                       OBSERVATIONS_CSV_FILE_NAME, CAMTRAP_FILE_NAMES, SPARCD_PREFIX, \
                       S3_UPLOADS_PATH_PART, SPECIES_JSON_FILE_NAME
 import s3_utils as s3u
+import s3_metrics
 from text_formatters.results import Results
 from text_formatters.coordinate_utils import DEFAULT_UTM_ZONE,deg2utm, deg2utm_code, utm2deg
 import zip_utils as zu
@@ -120,6 +124,15 @@ DB = None
 print(f'Using database at {DEFAULT_DB_PATH}', flush=True)
 print(f'Temporary folder at {tempfile.gettempdir()}', flush=True)
 
+# Start the process that formats large reports in parallel before any threads are started
+start_report_workers()
+
+
+@app.before_request
+def tag_s3_metrics():
+    """ Tags the S3 metrics recorded while handling the request with its endpoint """
+    s3_metrics.set_request_endpoint(request.endpoint)
+
 
 def get_password(token: str, db: SPARCdDatabase) -> Optional[str]:
     """ Returns the password associated with the token in plain text
@@ -616,9 +629,11 @@ def upload():
 
     if all_images is None:
         # Get the collection information from the server
+        # Image URLs are presigned when they're first requested
         all_images = S3Connection.get_images(s3_url, user_info.name,
                                                 get_password(token, db),
-                                                collection_id, collection_upload)
+                                                collection_id, collection_upload,
+                                                need_url=False)
 
         # Save the images so we can reload them later
         sdfu.save_timed_info(save_path, {one_image['key']: one_image for one_image in all_images})
@@ -682,7 +697,7 @@ def upload():
         one_img['upload'] = collection_upload
 
         del one_img['bucket']
-        del one_img['s3_url']
+        one_img.pop('s3_url', None)
         del one_img['key']
 
     return json.dumps(all_images)
@@ -739,8 +754,16 @@ def image():
     if not image_key in image_data:
         return "Not Found", 422
 
+    # Presign the URL if it wasn't done when the image was listed
+    image_url = image_data[image_key].get('s3_url')
+    if not image_url:
+        s3_url = s3u.web_to_s3_url(user_info.url, lambda x: crypt.do_decrypt(WORKING_PASSCODE, x))
+        image_url = S3Connection.get_object_url(s3_url, user_info.name, get_password(token, db),
+                                                image_data[image_key]['bucket'],
+                                                image_data[image_key]['s3_path'])
+
     # Not to be confused with Flask's request
-    res = requests.get(image_data[image_key]['s3_url'],
+    res = requests.get(image_url,
                        timeout=DEFAULT_IMAGE_FETCH_TIMEOUT_SEC,
                        allow_redirects=False)
 
@@ -752,6 +775,120 @@ def image():
     #return res.content
 
 
+def run_query_job(job: query_jobs.QueryJob, token: str, user_info: object, filters: tuple,
+                                                                        interval: int) -> str:
+    """ Runs a query in the background
+    Arguments:
+        job: the query job used to report progress
+        token: the user's token
+        user_info: the user's information
+        filters: the filters of the query
+        interval: the image interval of the query
+    Return:
+        Returns the path to the saved query results
+    """
+    db = SPARCdDatabase(DEFAULT_DB_PATH)
+    db.connect()
+    s3_metrics.set_request_endpoint('query')
+
+    s3_url = s3u.web_to_s3_url(user_info.url, lambda x: crypt.do_decrypt(WORKING_PASSCODE, x))
+
+    # Get collections from the database
+    coll_info = db.get_collections(TIMEOUT_COLLECTIONS_SEC)
+    if coll_info is None or not coll_info:
+        all_collections = S3Connection.list_collections(s3_url, user_info.name,
+                                                        get_password(token, db))
+        coll_info = [{'name':one_coll['bucket'], 'json':one_coll} \
+                                                            for one_coll in all_collections]
+        if not db.save_collections([{'name':one_coll['bucket'], 'json':json.dumps(one_coll)} \
+                                                            for one_coll in all_collections]):
+            print('Warning: Unable to save collections to the database')
+    else:
+        coll_info = [{'name':one_coll['name'],'json':json.loads(one_coll['json'])} \
+                                                            for one_coll in coll_info]
+
+    # Filter collections
+    filter_colls = []
+    for one_filter in filters:
+        if one_filter[0] == 'collections':
+            filter_colls = filter_colls + \
+                                    [coll for coll in coll_info if coll['name'] in one_filter[1]]
+    if not filter_colls:
+        filter_colls = coll_info
+
+    # Get uploads information to further filter images
+    # TODO: resolve: this call needs both encrypted (for the DB) and plain text URL (for S3 access)
+    #                [maybe make the S3URL parameter a tuple?]
+    db_s3_url = crypt.do_decrypt(WORKING_PASSCODE, user_info.url)
+    results_id = uuid.uuid4().hex
+
+    # Use the saved results of the same query if none of the data has changed
+    cache_key = query_helpers.get_query_cache_key(db, filter_colls, db_s3_url, filters, interval,
+                                                                            user_info.settings)
+    first_tab = query_helpers.get_first_query_tab(user_info.settings)
+    cached_info = query_cache.load_query_results(cache_key) if cache_key else None
+    if not isinstance(cached_info, dict):
+        cached_info = {}
+    if 'output' in cached_info:
+        print('QUERY CACHE HIT', cache_key, flush=True)
+        return_info = cached_info.get('output')
+        snapshot = cached_info.get('snapshot')
+        if return_info:
+            return_info = return_info | {'id': results_id}
+    else:
+        # The collections are loaded and filtered as the results are consumed
+        query_results = query_helpers.filter_collections(db, filter_colls,
+                                                db_s3_url,
+                                                user_info.name,
+                                                lambda: get_password(token, db),
+                                                filters,
+                                                job.progress)
+
+        # Get the species and locations
+        cur_species = s3u.load_sparcd_config(SPECIES_JSON_FILE_NAME,
+                                            hash2str(s3_url)+'-'+TEMP_SPECIES_FILE_NAME,
+                                            s3_url,user_info.name, lambda: get_password(token, db))
+        cur_locations = sdu.load_locations(s3_url, user_info.name,
+                                            lambda: get_password(token, db), hash2str(s3_url))
+
+        results = Results(query_results, cur_species, cur_locations,
+                            s3_url, user_info.name, get_password(token, db),
+                            user_info.settings, interval)
+
+        # Get the key with the versions of any uploads that were loaded by the query
+        cache_key = query_helpers.get_query_cache_key(db, filter_colls, db_s3_url, filters,
+                                                                interval, user_info.settings)
+
+        # Format the first tab that's shown, the others are formatted from the snapshot of the
+        # results when they're first asked for
+        return_info = query_helpers.query_output(results, results_id, job.progress, (first_tab,))
+        snapshot = results.get_snapshot() if return_info else None
+        if cache_key:
+            query_cache.save_query_results(cache_key, {'output': return_info,
+                                                       'snapshot': snapshot})
+
+    # Check for old queries and clean them up
+    sdu.cleanup_old_queries(db, token)
+
+    # Save the query for lookup when downloading results
+    save_path = os.path.join(tempfile.gettempdir(), SPARCD_PREFIX + 'query_' + \
+                                                                results_id + '.json')
+    sdfu.save_timed_info(save_path, return_info)
+    if snapshot:
+        sdfu.save_timed_info(sdfu.get_companion_path(save_path,
+                                                query_helpers.QUERY_SNAPSHOT_NAME), snapshot)
+
+    # A job that's been cancelled or replaced mustn't become the user's current query
+    if job.is_superseded():
+        for one_path in (save_path,) + sdfu.get_companion_paths(save_path):
+            os.unlink(one_path)
+        raise query_jobs.QueryCancelledError(f'Query job {job.id} was cancelled before its ' \
+                                                                        'results were saved')
+    db.save_query_path(token, save_path)
+
+    return save_path
+
+
 @app.route('/query', methods = ['POST'])
 @cross_origin(origins="http://localhost:3000", supports_credentials=True)
 def query():
@@ -762,11 +899,11 @@ def query():
         password - the user credentials
         token - the token to check for
     Return:
-        Returns the session key and associated user information
+        Returns the ID of the query job that's started. The job's progress is available
+        from /queryStatus and its results from /queryResult
     Notes:
         All parameters can be specified. If a token is specified, it's checked
-        for expiration first. If valid login information is specified, and the token
-        is invalid/missing/expired, a new token is returned
+        for expiration first. Any previous query job of the user is cancelled
     """
     db = SPARCdDatabase(DEFAULT_DB_PATH)
     token = request.args.get('t')
@@ -814,67 +951,155 @@ def query():
         print('NO FILTERS SPECIFIED')
         return "Not Found", 406
 
-    s3_url = s3u.web_to_s3_url(user_info.url, lambda x: crypt.do_decrypt(WORKING_PASSCODE, x))
+    # Run the query in the background
+    job_id = query_jobs.start_query_job(token, query_helpers.QUERY_PROGRESS_STAGES + \
+                                        (query_helpers.get_first_query_tab(user_info.settings),),
+                                        run_query_job, token, user_info, filters, interval)
 
-    # Get collections from the database
-    coll_info = db.get_collections(TIMEOUT_COLLECTIONS_SEC)
-    if coll_info is None or not coll_info:
-        all_collections = S3Connection.list_collections(s3_url, user_info.name,
-                                                        get_password(token, db))
-        coll_info = [{'name':one_coll['bucket'], 'json':one_coll} \
-                                                            for one_coll in all_collections]
-        if not db.save_collections([{'name':one_coll['bucket'], 'json':json.dumps(one_coll)} \
-                                                            for one_coll in all_collections]):
-            print('Warning: Unable to save collections to the database')
-    else:
-        coll_info = [{'name':one_coll['name'],'json':json.loads(one_coll['json'])} \
-                                                            for one_coll in coll_info]
+    return json.dumps({'jobId': job_id})
 
-    # Filter collections
-    filter_colls = []
-    for one_filter in filters:
-        if one_filter[0] == 'collections':
-            filter_colls = filter_colls + \
-                                    [coll for coll in coll_info if coll['name'] in one_filter[1]]
-    if not filter_colls:
-        filter_colls = coll_info
 
-    # Get uploads information to further filter images
-    # TODO: resolve: this call needs both encrypted (for the DB) and plain text URL (for S3 access)
-    #                [maybe make the S3URL parameter a tuple?]
-    all_results = query_helpers.filter_collections(db, filter_colls,
-                                            crypt.do_decrypt(WORKING_PASSCODE, user_info.url),
-                                            user_info.name,
-                                            lambda: get_password(token, db),
-                                            filters)
+@app.route('/queryStatus', methods = ['GET'])
+@cross_origin(origins="http://localhost:3000", supports_credentials=True)
+def query_status():
+    """ Returns the status and progress of a query job
+    Arguments: (GET)
+        t - the session token
+        j - the ID of the query job
+    Return:
+        Returns the status of the job and the progress of each of its stages
+    Notes:
+         If the token is invalid, or the job isn't found, a 404 error is returned
+   """
+    db = SPARCdDatabase(DEFAULT_DB_PATH)
+    token = request.args.get('t')
 
-    # Get the species and locations
-    cur_species = s3u.load_sparcd_config(SPECIES_JSON_FILE_NAME,
-                                            hash2str(s3_url)+'-'+TEMP_SPECIES_FILE_NAME,
-                                            s3_url,user_info.name, lambda: get_password(token, db))
-    cur_locations = sdu.load_locations(s3_url, user_info.name, lambda: get_password(token, db),
-                                            hash2str(s3_url))
+    # Check the credentials
+    token_valid, user_info = sdu.token_user_valid(db, request, token, SESSION_EXPIRE_SECONDS)
+    if token_valid is None or user_info is None:
+        return "Not Found", 404
+    if not token_valid or not user_info:
+        return "Unauthorized", 401
 
-    results = Results(all_results, cur_species, cur_locations,
-                        s3_url, user_info.name, get_password(token, db),
-                        user_info.settings, interval)
+    job_status = query_jobs.get_query_job_status(token, request.args.get('j'))
+    if job_status is None:
+        return "Not Found", 404
 
-    # Format and return the results
-    results_id = uuid.uuid4().hex
-    return_info = query_helpers.query_output(results, results_id)
+    return json.dumps(job_status)
 
-    # Check for old queries and clean them up
-    sdu.cleanup_old_queries(db, token)
 
-    # Save the query for lookup when downloading results
-    save_path = os.path.join(tempfile.gettempdir(), SPARCD_PREFIX + 'query_' + \
-                                                                results_id + '.json')
-    sdfu.save_timed_info(save_path, return_info)
-    db.save_query_path(token, save_path)
+@app.route('/queryResult', methods = ['GET'])
+@cross_origin(origins="http://localhost:3000", supports_credentials=True)
+def query_result():
+    """ Returns the results of a finished query job
+    Arguments: (GET)
+        t - the session token
+        j - the ID of the query job
+    Return:
+        Returns the formatted query results
+    Notes:
+         If the token is invalid, or the job isn't found, a 404 error is returned. If
+         the job hasn't finished, or the results have expired, a 422 error is returned
+   """
+    db = SPARCdDatabase(DEFAULT_DB_PATH)
+    token = request.args.get('t')
+    print('QUERY RESULT', request, flush=True)
+
+    # Check the credentials
+    token_valid, user_info = sdu.token_user_valid(db, request, token, SESSION_EXPIRE_SECONDS)
+    if token_valid is None or user_info is None:
+        return "Not Found", 404
+    if not token_valid or not user_info:
+        return "Unauthorized", 401
+
+    results_path = query_jobs.get_query_job_results_path(token, request.args.get('j'))
+    if not results_path:
+        return "Not Found", 422
+
+    return_info = sdfu.load_timed_info(results_path, QUERY_RESULTS_TIMEOUT_SEC)
+    if return_info is None:
+        return "Not Found", 422
 
     return json.dumps(return_info)
 
 
+@app.route('/queryTab', methods = ['GET'])
+@cross_origin(origins="http://localhost:3000", supports_credentials=True)
+def query_tab():
+    """ Returns the formatted results of one tab of the user's query
+    Arguments: (GET)
+        t - the session token
+        q - the name of the tab
+        r - the ID of the query results the tab belongs to
+    Return:
+        Returns the formatted results of the tab
+    Notes:
+         If the token is invalid, or the tab isn't found, a 404 error is returned. If
+         the results have expired, or have been replaced by a newer query, a 422 error
+         is returned
+   """
+    db = SPARCdDatabase(DEFAULT_DB_PATH)
+    token = request.args.get('t')
+    print('QUERY TAB', request, flush=True)
+
+    # Check the credentials
+    token_valid, user_info = sdu.token_user_valid(db, request, token, SESSION_EXPIRE_SECONDS)
+    if token_valid is None or user_info is None:
+        return "Not Found", 404
+    if not token_valid or not user_info:
+        return "Unauthorized", 401
+
+    tab = request.args.get('q')
+    results_id = request.args.get('r')
+    if not tab or not results_id:
+        return "Not Found", 406
+
+    # Get the query information
+    query_info = db.get_query(token)
+    if not query_info:
+        return "Not Found", 422
+    query_info_path = query_info[0]
+
+    # Only return tabs of the results the user is looking at
+    query_results = sdfu.load_timed_info(query_info_path, QUERY_RESULTS_TIMEOUT_SEC)
+    if not query_results or query_results.get('id') != results_id:
+        return "Not Found", 422
+
+    tab_results = query_helpers.get_query_tab(query_info_path, query_results, tab,
+                                              user_info.name, lambda: get_password(token, db),
+                                              QUERY_RESULTS_TIMEOUT_SEC)
+    if tab_results is None:
+        return "Not Found", 404
+
+    return json.dumps(tab_results)
+
+
+@app.route('/queryCancel', methods = ['POST'])
+@cross_origin(origins="http://localhost:3000", supports_credentials=True)
+def query_cancel():
+    """ Cancels a query job
+    Arguments: (POST)
+        t - the session token
+        j - the ID of the query job
+    Return:
+        Returns whether the job is being cancelled
+    Notes:
+         If the token is invalid a 404 error is returned
+   """
+    db = SPARCdDatabase(DEFAULT_DB_PATH)
+    token = request.args.get('t')
+    print('QUERY CANCEL', request, flush=True)
+
+    # Check the credentials
+    token_valid, user_info = sdu.token_user_valid(db, request, token, SESSION_EXPIRE_SECONDS)
+    if token_valid is None or user_info is None:
+        return "Not Found", 404
+    if not token_valid or not user_info:
+        return "Unauthorized", 401
+
+    return json.dumps({'success': query_jobs.cancel_query_job(token, request.args.get('j'))})
+
+
 @app.route('/query_dl', methods = ['GET'])
 @cross_origin(origins="*", supports_credentials=True)
 def query_dl():
@@ -914,6 +1139,15 @@ def query_dl():
     if not query_results:
         return "Not Found", 422
 
+    # Format the tab if it hasn't been viewed yet
+    if tab not in query_results:
+        tab_results = query_helpers.get_query_tab(query_info_path, query_results, tab,
+                                                  user_info.name, lambda: get_password(token, db),
+                                                  QUERY_RESULTS_TIMEOUT_SEC)
+        if tab_results is None:
+            return "Not Found", 404
+        query_results[tab] = tab_results
+
     match(tab):
         case 'DrSandersonOutput':
             dl_name = target if target else 'drsanderson.txt'
@@ -1544,6 +1778,14 @@ def sandbox_completed():
                                                         get_password(token, db),
                                                         s3_bucket, s3_path, num_files_with_species)
 
+    # Update the collection's uploads manifest, and saved uploads, with the completed upload
+    updated_upload = S3Connection.update_uploads_manifest(s3_url, user_info.name,
+                                                get_password(token, db), s3_bucket, s3_path)
+    db_s3_url = crypt.do_decrypt(WORKING_PASSCODE, user_info.url)
+    if updated_upload:
+        db.update_upload(db_s3_url, s3_bucket, updated_upload)
+    db.bump_data_version(db_s3_url, s3_bucket)
+
     # Update the collection to reflect the new upload metadata
     updated_collection = S3Connection.get_collection_info(s3_url, user_info.name, \
                                             get_password(token, db), s3_bucket)
@@ -1658,7 +1900,13 @@ def image_location():
                                 bucket, make_s3_path((upload_path, OBSERVATIONS_CSV_FILE_NAME)),
                                 obs_info )
 
-    # Get and update the Observation information
+    # Update the collection's uploads manifest, and saved uploads, with the new location
+    updated_upload = S3Connection.update_uploads_manifest(s3_url, user_info.name,
+                                                get_password(token, db), bucket, upload_path)
+    db_s3_url = crypt.do_decrypt(WORKING_PASSCODE, user_info.url)
+    if updated_upload:
+        db.update_upload(db_s3_url, bucket, updated_upload)
+    db.bump_data_version(db_s3_url, bucket)
 
     # Update the collection to reflect the new upload location
     updated_collection = S3Connection.get_collection_info(s3_url, user_info.name, \
@@ -1788,6 +2036,8 @@ def image_edit_complete():
 
     if success_files:
         db.complete_image_edits(user_info.name, success_files)
+        db.bump_data_version(crypt.do_decrypt(WORKING_PASSCODE, user_info.url),
+                                                                        SPARCD_PREFIX + coll_id)
 
     if errored_files:
         return {'success': False, 'retry': True, 'message': 'Not all the edits could be completed',\
@@ -1879,6 +2129,14 @@ def images_all_edited():
                                                 datetime.datetime.fromisoformat(timestamp).\
                                                         strftime("%Y.%m.%d.%H.%M.%S"))
 
+    # Update the collection's uploads manifest, and saved uploads, with the edits
+    updated_upload = S3Connection.update_uploads_manifest(s3_url, user_info.name,
+                                                get_password(token, db), s3_bucket, s3_path)
+    db_s3_url = crypt.do_decrypt(WORKING_PASSCODE, user_info.url)
+    if updated_upload:
+        db.update_upload(db_s3_url, s3_bucket, updated_upload)
+    db.bump_data_version(db_s3_url, s3_bucket)
+
     return {'success': True, 'message': "The images have been successfully updated"}
 
 
@@ -1997,6 +2255,37 @@ def admin_check_changes():
     return {'success': True, 'locationsChanged': changed['locationsCount'] > 0, \
             'speciesChanged': changed['speciesCount'] > 0}
 
+@app.route('/adminMetrics', methods = ['GET'])
+@cross_origin(origins="http://localhost:3000", supports_credentials=True)
+def admin_metrics():
+    """ Returns the S3, configuration cache, and analysis reuse metrics of the server process
+    Arguments: (GET)
+        t - the session token
+    Return:
+        Returns the metrics of the process handling the request
+    Notes:
+         If the token is invalid, or a problem occurs, a 404 error is returned
+   """
+    db = SPARCdDatabase(DEFAULT_DB_PATH)
+    token = request.args.get('t')
+    print('ADMIN METRICS', flush=True)
+
+    # Check the credentials
+    token_valid, user_info = sdu.token_user_valid(db, request, token, SESSION_EXPIRE_SECONDS)
+    if token_valid is None or user_info is None:
+        return "Not Found", 404
+    if not token_valid or not user_info:
+        return "Unauthorized", 401
+
+    # Make sure this user is an admin
+    if user_info.admin != 1:
+        return "Not Found", 404
+
+    return json.dumps({'s3': s3_metrics.get_metrics(),
+                       'configCache': s3u.get_config_cache_stats(),
+                       'analysisReuse': query_helpers.get_analysis_reuse_stats()
+                      })
+
 
 @app.route('/settingsAdmin', methods = ['POST'])
 @cross_origin(origins="http://localhost:3000", supports_credentials=True)
@@ -2818,6 +3107,9 @@ def admin_complete_changes():
     if not changes:
         return {'success': True, 'message': "There were no changes found to apply"}
 
+    # Queries of any of the collections need to use the changed locations and species
+    db.bump_data_version(crypt.do_decrypt(WORKING_PASSCODE, user_info.url))
+
     # Update the location
     if 'locations' in changes and changes['locations']:
         if not sdu.update_admin_locations(s3_url, user_info.name,
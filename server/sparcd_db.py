@@ -2,14 +2,50 @@
 """
 
 import os
+import json
 import logging
 from typing import Optional
 
 from spd_types.userinfo import UserInfo
-from spd_database.spdsqlite import SPDSQLite
+from spd_database.spdsqlite import SPDSQLite, POSTING_KIND_SPECIES, POSTING_KIND_LOCATION, \
+                                    POSTING_KIND_YEAR, DATA_VERSION_ALL_BUCKETS
+from query_filters import QueryFilter, get_image_datetime, get_image_time_fields, \
+                          get_epoch_microseconds
 
 MAX_ALLOWED_EXPIRED_TOKENS_PER_USER = 1
 
+
+def _get_upload_image_rows(upload_info: dict) -> tuple:
+    """ Returns the normalized image rows of an upload for saving to the database
+    Arguments:
+        upload_info: the upload's information
+    Return:
+        Returns a tuple of (name, s3_path, timestamp, epoch, year, month, weekday, hour,
+        loc_id, elevation, species) image rows
+    Notes:
+        Images with invalid timestamps are never returned by a query and are skipped
+    """
+    try:
+        elevation = float(upload_info['elevation'])
+    except (KeyError, TypeError, ValueError):
+        elevation = None
+
+    image_rows = []
+    for one_image in upload_info['images']:
+        try:
+            image_dt = get_image_datetime(one_image.get('timestamp'))
+        except ValueError:
+            continue
+
+        time_fields = get_image_time_fields(image_dt) if image_dt is not None else \
+                                                                    (None, None, None, None, None)
+        image_rows.append((one_image['name'], one_image['s3_path'], one_image.get('timestamp'), \
+                           *time_fields, upload_info.get('loc'), elevation, \
+                           tuple((one_species['name'], one_species['scientificName'], \
+                                  one_species['count']) for one_species in one_image['species'])))
+
+    return tuple(image_rows)
+
 class SPARCdDatabase:
     """Class handling access connections to the database
     """
@@ -35,6 +71,11 @@ class SPARCdDatabase:
 
         return ('Not defined yet',)
 
+    @property
+    def database_path(self) -> str:
+        """ Returns the path of the database file """
+        return self._db.database_path
+
     def connect(self, database_path: str = None) -> None:
         """Performs the actual connection to the database
         Arguments:
@@ -207,13 +248,14 @@ class SPARCdDatabase:
                  'location_id': row[3]
                } for row in res]
 
-    def get_uploads(self, s3_url: str, bucket: str, timeout_sec: int) -> Optional[tuple]:
+    def get_uploads(self, s3_url: str, bucket: str, timeout_sec: Optional[int]) -> \
+                                                                                Optional[tuple]:
         """ Returns the uploads for this collection from the database
         Arguments:
             s3_url: the URL associated with this request
             bucket: The bucket to get uploads for
             timeout_sec: the amount of time before the table entries can be
-                         considered expired
+                         considered expired. Set to None to return expired uploads
         Return:
             Returns the loaded tuple of upload names and data
         """
@@ -224,6 +266,97 @@ class SPARCdDatabase:
 
         return [{'name':row[0], 'json':row[1]} for row in res]
 
+    def get_uploads_version(self, s3_url: str, bucket: str, timeout_sec: int) -> Optional[tuple]:
+        """ Returns the version of the uploads saved for this collection
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: The bucket to get the uploads version for
+            timeout_sec: the amount of time before the table entries can be
+                         considered expired
+        Return:
+            Returns the version of the saved uploads, or None if there are no saved
+            uploads or they have expired
+        Notes:
+            The version changes when the uploads are saved and when the bucket's data version
+            is changed
+        """
+        return self._db.get_uploads_version(s3_url, bucket, timeout_sec)
+
+    def get_data_version(self, s3_url: str, bucket: str=None) -> Optional[int]:
+        """ Returns the version of a bucket's data that's changed every time the data is edited
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket to get the version of. If not specified, the version of the
+                    changes that apply to all the buckets is returned
+        Return:
+            Returns the version of the data, or None if the data versions aren't available
+        """
+        return self._db.get_data_version(s3_url, bucket if bucket is not None else \
+                                                                    DATA_VERSION_ALL_BUCKETS)
+
+    def bump_data_version(self, s3_url: str, bucket: str=None) -> bool:
+        """ Changes the version of a bucket's data after it's been edited
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket that was edited. If not specified, the version of the changes
+                    that apply to all the buckets is changed
+        Return:
+            Returns True if the version was changed and False if not
+        Notes:
+            Anything cached from the bucket's data, such as query results and image indexes,
+            is no longer used once the version changes
+        """
+        return self._db.bump_data_version(s3_url, bucket if bucket is not None else \
+                                                                    DATA_VERSION_ALL_BUCKETS)
+
+    def _get_upload_locations_version(self, s3_url: str, bucket: str) -> Optional[str]:
+        """ Returns the version of the data that saved upload locations belong to
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket of the collection
+        Return:
+            Returns the version, or None if the data versions aren't available
+        """
+        all_version = self.get_data_version(s3_url)
+        bucket_version = self.get_data_version(s3_url, bucket)
+        if all_version is None or bucket_version is None:
+            return None
+
+        return f'{all_version}.{bucket_version}'
+
+    def get_upload_locations(self, s3_url: str, bucket: str, timeout_sec: int) -> Optional[dict]:
+        """ Returns the saved locations and elevations of a collection's uploads
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket of the collection
+            timeout_sec: the amount of time before the saved locations are considered expired
+        Return:
+            Returns a dict of the (location ID, elevation) of each upload keyed by the upload
+            name, or None if the saved locations aren't available
+        Notes:
+            Locations saved before the collection's data was last edited aren't returned
+        """
+        version = self._get_upload_locations_version(s3_url, bucket)
+        if version is None:
+            return None
+
+        return self._db.get_upload_locations(s3_url, bucket, version, timeout_sec)
+
+    def save_upload_locations(self, s3_url: str, bucket: str, locations: tuple) -> bool:
+        """ Saves the locations and elevations of a collection's uploads
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket of the collection
+            locations: the uploads' 'name', 'loc', and 'elevation'
+        Return:
+            Returns True if the locations were saved and False if not
+        """
+        version = self._get_upload_locations_version(s3_url, bucket)
+        if version is None:
+            return False
+
+        return self._db.save_upload_locations(s3_url, bucket, version, locations)
+
     def save_uploads(self, s3_url: str, bucket: str, uploads: tuple) -> bool:
         """ Save the upload information into the table
         Arguments:
@@ -233,8 +366,138 @@ class SPARCdDatabase:
                 upload name, and associated JSON
         Return:
             Returns True if the data was saved and False if something went wrong
+        Notes:
+            The images of the uploads are also saved in normalized form for querying
         """
-        return self._db.save_uploads(s3_url, bucket, uploads)
+        return self._db.save_uploads(s3_url, bucket, [one_upload | {'images': \
+                                        _get_upload_image_rows(one_upload['info'] if 'info' in \
+                                                    one_upload else json.loads(one_upload['json']))}
+                                            for one_upload in uploads])
+
+    def update_upload(self, s3_url: str, bucket: str, upload_info: dict) -> bool:
+        """ Replaces, or adds, one upload of a collection whose uploads are saved
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket name of the upload
+            upload_info: the upload's information
+        Return:
+            Returns True if the upload was saved and False if not
+        Notes:
+            The upload's normalized images and posting lists are also updated
+        """
+        return self._db.update_upload(s3_url, bucket, {'name': upload_info['name'],
+                                                       'json': json.dumps(upload_info),
+                                                       'images': \
+                                                            _get_upload_image_rows(upload_info)
+                                                      })
+
+    def get_image_posting_sizes(self, s3_url: str, bucket: str, \
+                                                    query_filter: QueryFilter) -> Optional[list]:
+        """ Returns the posting lists needed for the species, location, and year filters,
+            with their sizes
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket to get the posting lists of
+            query_filter: the compiled query filters
+        Return:
+            Returns a list of (size, kind, values) tuples sorted by size, or None if there
+            was a problem
+        """
+        postings = []
+        for kind, values in ((POSTING_KIND_SPECIES, query_filter.species),
+                             (POSTING_KIND_LOCATION, query_filter.locations),
+                             (POSTING_KIND_YEAR, range(query_filter.year_start, \
+                                                        query_filter.year_end + 1) if \
+                                            query_filter.year_start is not None else None)):
+            if values is None:
+                continue
+            values = tuple(values)
+            size = self._db.count_image_postings(s3_url, bucket, kind, values) if values else 0
+            if size is None:
+                return None
+            postings.append((size, kind, values))
+
+        return sorted(postings, key=lambda posting: posting[0])
+
+    def get_image_postings(self, s3_url: str, bucket: str, kind: str, values: tuple, \
+                                        image_ids: Optional[tuple]=None) -> Optional[tuple]:
+        """ Returns the posting list of the images with any of the values
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket to get the image IDs of
+            kind: the kind of posting list (species, location, or year)
+            values: the values to get the image IDs of
+            image_ids: the optional sorted image IDs to intersect the posting list with
+        Return:
+            Returns the sorted tuple of image IDs, or None if there was a problem
+        """
+        if not values:
+            return tuple()
+
+        return self._db.get_image_postings(s3_url, bucket, kind, values, image_ids)
+
+    def get_upload_images(self, s3_url: str, bucket: str, query_filter: QueryFilter, \
+                                            image_ids: Optional[tuple]=None) -> Optional[list]:
+        """ Returns the saved images of a collection that match the filters
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket to get the images of
+            query_filter: the compiled query filters
+            image_ids: the optional sorted image IDs, found with the posting lists, to
+                restrict the images to
+        Return:
+            Returns the list of upload information with their matching images, in the same
+            format as QueryFilter.filter_uploads(), or None if the collection doesn't have
+            any saved images
+        Notes:
+            The uploads only contain their name, location, elevation, and images. The
+            species, location, and year filters are not checked again for the image IDs
+        """
+        have_ids = image_ids is not None
+        res = self._db.get_upload_images(s3_url, bucket, {
+                        'locations': query_filter.locations if not have_ids else None,
+                        'species': query_filter.species if not have_ids else None,
+                        'months': query_filter.months,
+                        'days': query_filter.days,
+                        'hours': query_filter.hours,
+                        'startEpoch': get_epoch_microseconds(query_filter.start_epoch) if \
+                                                query_filter.start_epoch is not None else None,
+                        'endEpoch': get_epoch_microseconds(query_filter.end_epoch) if \
+                                                query_filter.end_epoch is not None else None,
+                        'yearStart': query_filter.year_start if not have_ids else None,
+                        'yearEnd': query_filter.year_end if not have_ids else None,
+                        'elevations': query_filter.elevations,
+                        'needsTimestamp': query_filter.needs_timestamp,
+                        }, image_ids)
+        if res is None:
+            return None
+
+        uploads = []
+        cur_upload = None
+        cur_image = None
+        cur_image_id = None
+        for image_id, upload, name, s3_path, timestamp, loc_id, elevation, common_name, \
+                                                        scientific_name, count in res:
+            if cur_upload is None or cur_upload['name'] != upload:
+                cur_upload = {'name': upload, 'loc': loc_id, 'elevation': elevation, \
+                              'images': []}
+                uploads.append(cur_upload)
+            if image_id != cur_image_id:
+                cur_image = {'name': name,
+                             'timestamp': timestamp,
+                             'bucket': bucket,
+                             's3_path': s3_path,
+                             'species': [],
+                             'image_dt': get_image_datetime(timestamp)
+                            }
+                cur_upload['images'].append(cur_image)
+                cur_image_id = image_id
+            if scientific_name is not None:
+                cur_image['species'].append({'name': common_name, \
+                                             'scientificName': scientific_name, \
+                                             'count': count})
+
+        return uploads
 
     def save_query_path(self, token: str, file_path: str) -> bool:
         """ Stores the specified query file path in the database
@@ -1,6 +1,7 @@
 """ Functions for handling common files """
 
 import datetime
+import glob
 import json
 import os
 import time
@@ -109,3 +110,26 @@ def load_timed_info(load_path: str, timeout_sec: int=TEMP_FILE_EXPIRE_SEC):
         return None
 
     return loaded_data['data']
+
+
+def get_companion_path(file_path: str, name: str) -> str:
+    """ Returns the path of a file that's kept alongside another file
+    Arguments:
+        file_path: the path of the main file
+        name: the name of the companion file
+    Return:
+        Returns the path of the companion file
+    """
+    base_path, file_ext = os.path.splitext(file_path)
+    return base_path + '_' + name + file_ext
+
+
+def get_companion_paths(file_path: str) -> tuple:
+    """ Returns the paths of all the files kept alongside another file
+    Arguments:
+        file_path: the path of the main file
+    Return:
+        Returns the paths of the existing companion files
+    """
+    base_path, file_ext = os.path.splitext(file_path)
+    return tuple(glob.glob(glob.escape(base_path) + '_*' + file_ext))
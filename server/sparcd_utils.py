@@ -128,17 +128,20 @@ def cleanup_old_queries(db: SPARCdDatabase, token: str) -> None:
     """ Cleans up old queries off the file system
     Arguments:
         db - connections to the current database
+        token - the session token of the user
     """
     expired_queries = db.get_clear_queries(token)
     if expired_queries:
         for one_query_path in expired_queries:
-            if os.path.exists(one_query_path):
-                try:
-                    os.unlink(one_query_path)
-                # pylint: disable=broad-exception-caught
-                except Exception as ex:
-                    print(f'Unable to remove old query file: {one_query_path}')
-                    print(ex)
+            # Include the files of the tabs and results snapshot saved with the query
+            for one_path in (one_query_path,) + sdfu.get_companion_paths(one_query_path):
+                if os.path.exists(one_path):
+                    try:
+                        os.unlink(one_path)
+                    # pylint: disable=broad-exception-caught
+                    except Exception as ex:
+                        print(f'Unable to remove old query file: {one_path}')
+                        print(ex)
 
 
 def load_locations(s3_url: str, user_name: str, fetch_password: Callable, s3_id: str, \
@@ -3,10 +3,66 @@
 
 import logging
 import sqlite3
+import threading
 from time import sleep
 from typing import Optional
 import uuid
 
+# The elevation comparisons that can be used when filtering images
+ELEVATION_COMPARISONS = ('=', '<', '>', '<=', '>=')
+
+# The kinds of image posting lists
+POSTING_KIND_SPECIES = 'species'
+POSTING_KIND_LOCATION = 'location'
+POSTING_KIND_YEAR = 'year'
+
+# The maximum number of image IDs used in one query
+IMAGE_ID_QUERY_CHUNK_SIZE = 500
+
+# The bucket name of the data version that applies to all the buckets of an S3 instance
+DATA_VERSION_ALL_BUCKETS = ''
+
+# The statements that add the tables and indexes missing from databases created by earlier
+# versions of create_db.py. These are the same definitions as create_db.py uses, and can be
+# run on any database
+SCHEMA_UPGRADE_STMTS = (
+    'CREATE TABLE IF NOT EXISTS images(id INTEGER PRIMARY KEY ASC, s3_url TEXT NOT NULL, ' \
+                'bucket TEXT NOT NULL, upload TEXT NOT NULL, name TEXT NOT NULL, ' \
+                's3_path TEXT NOT NULL, timestamp TEXT, epoch INTEGER, ' \
+                'year INTEGER, month INTEGER, weekday INTEGER, hour INTEGER, ' \
+                'loc_id TEXT, elevation REAL)',
+    'CREATE INDEX IF NOT EXISTS images_bucket_epoch ON images(s3_url, bucket, epoch)',
+    'CREATE INDEX IF NOT EXISTS images_bucket_loc_epoch ON images(s3_url, bucket, loc_id, epoch)',
+    'CREATE TABLE IF NOT EXISTS observations(id INTEGER PRIMARY KEY ASC, ' \
+                'image_id INTEGER NOT NULL, common_name TEXT, scientific_name TEXT NOT NULL, ' \
+                'count TEXT)',
+    'CREATE INDEX IF NOT EXISTS observations_species_image ON ' \
+                'observations(scientific_name, image_id)',
+    'CREATE INDEX IF NOT EXISTS observations_image ON observations(image_id)',
+    'CREATE TABLE IF NOT EXISTS image_postings(id INTEGER PRIMARY KEY ASC, ' \
+                's3_url TEXT NOT NULL, bucket TEXT NOT NULL, kind TEXT NOT NULL, ' \
+                'value TEXT NOT NULL, image_id INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS image_postings_lookup ON image_postings(s3_url, bucket, kind, ' \
+                'value, image_id)',
+    'CREATE INDEX IF NOT EXISTS image_postings_image ON image_postings(image_id)',
+    'CREATE TABLE IF NOT EXISTS data_versions(id INTEGER PRIMARY KEY ASC, ' \
+                's3_url TEXT NOT NULL, bucket TEXT NOT NULL, ' \
+                'version INTEGER NOT NULL DEFAULT 0, UNIQUE(s3_url, bucket))',
+    'CREATE TABLE IF NOT EXISTS upload_locations(id INTEGER PRIMARY KEY ASC, ' \
+                's3_url TEXT NOT NULL, bucket TEXT NOT NULL, upload TEXT NOT NULL, ' \
+                'loc_id TEXT, elevation TEXT, version TEXT NOT NULL, ' \
+                'timestamp INTEGER, UNIQUE(s3_url, bucket, upload))',
+)
+# The normalized image tables that are dropped and added again when the observation counts
+# aren't saved as text, as they were by earlier versions. The images are saved again the next
+# time their collection's uploads are saved
+SCHEMA_REBUILD_TABLES = ('image_postings', 'observations', 'images')
+
+# The paths of the databases that have been upgraded by this process
+_UPGRADED_DATABASES = set()
+# Lock protecting the upgraded databases
+_UPGRADED_DATABASES_LOCK = threading.Lock()
+
 class SPDSQLite:
     """Class handling access connections to the database
     """
@@ -39,6 +95,11 @@ class SPDSQLite:
              f'api level: {sqlite3.apilevel}',
             )
 
+    @property
+    def database_path(self) -> str:
+        """ Returns the path of the database file """
+        return self._path
+
     def connect(self, database_path: str = None) -> None:
         """Performs the actual connection to the database
         Arguments:
@@ -53,6 +114,38 @@ class SPDSQLite:
                    ) if param is not None)
                 self._logger.info(f'Connecting to the database {print_params}')
             self._conn = sqlite3.connect(database_path)
+            self._upgrade_schema(database_path)
+
+    def _upgrade_schema(self, database_path: str) -> None:
+        """ Adds any missing tables and indexes to the database the first time this process
+            connects to it
+        Arguments:
+            database_path: the path of the connected database
+        Notes:
+            If the upgrade fails it's tried again on the next connection.
+            The tables in SCHEMA_REBUILD_TABLES are added again if the observation counts
+            aren't saved as text
+        """
+        with _UPGRADED_DATABASES_LOCK:
+            if database_path in _UPGRADED_DATABASES:
+                return
+
+            try:
+                cursor = self._conn.cursor()
+                cursor.execute('PRAGMA table_info(observations)')
+                if any(one_column[1] == 'count' and one_column[2].upper() != 'TEXT' \
+                                                        for one_column in cursor.fetchall()):
+                    for one_table in SCHEMA_REBUILD_TABLES:
+                        cursor.execute(f'DROP TABLE IF EXISTS {one_table}')
+                for one_stmt in SCHEMA_UPGRADE_STMTS:
+                    cursor.execute(one_stmt)
+                self._conn.commit()
+                cursor.close()
+            except sqlite3.Error as ex:
+                print(f'Unable to upgrade the database {database_path}: {ex}', flush=True)
+                return
+
+            _UPGRADED_DATABASES.add(database_path)
 
     def reconnect(self) -> None:
         """Attempts a reconnection if we're not connected
@@ -357,13 +450,14 @@ class SPDSQLite:
 
         return res
 
-    def get_uploads(self, s3_url: str, bucket: str, timeout_sec: int) -> Optional[tuple]:
+    def get_uploads(self, s3_url: str, bucket: str, timeout_sec: Optional[int]) -> \
+                                                                                Optional[tuple]:
         """ Returns the uploads for this collection from the database
         Arguments:
             s3_url: the URL associated with this request
             bucket: The bucket to get uploads for
             timeout_sec: the amount of time before the table entries can be
-                         considered expired
+                         considered expired. Set to None to return expired uploads
         Return:
             Returns a tuple of row tuples containing the name and json of the upload, or None
             if no uploads are found
@@ -373,13 +467,15 @@ class SPDSQLite:
 
         # Check for expired collection uploads
         cursor = self._conn.cursor()
-        cursor.execute('SELECT (strftime("%s", "now")-timestamp) AS elapsed_sec from ' \
-                       'table_timeout where name=(?) ORDER BY elapsed_sec DESC LIMIT 1', \
-                       (bucket,))
+        if timeout_sec is not None:
+            cursor.execute('SELECT (strftime("%s", "now")-timestamp) AS elapsed_sec from ' \
+                           'table_timeout where name=(?) ORDER BY elapsed_sec DESC LIMIT 1', \
+                           (bucket,))
 
-        res = cursor.fetchone()
-        if not res or len(res) < 1 or int(res[0]) >= timeout_sec:
-            return None
+            res = cursor.fetchone()
+            if not res or len(res) < 1 or int(res[0]) >= timeout_sec:
+                cursor.close()
+                return None
 
         cursor.execute('SELECT name,json FROM uploads WHERE s3_url=? AND bucket=?',
                                                                                 (s3_url, bucket))
@@ -388,6 +484,163 @@ class SPDSQLite:
 
         return res
 
+    def get_uploads_version(self, s3_url: str, bucket: str, timeout_sec: int) -> Optional[tuple]:
+        """ Returns the version of the uploads saved for this collection
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: The bucket to get the uploads version for
+            timeout_sec: the amount of time before the table entries can be
+                         considered expired
+        Return:
+            Returns a tuple of the timestamp of when the uploads were saved and the data
+            version of the bucket, or None if there are no saved uploads or they have expired
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to access database before connecting')
+
+        cursor = self._conn.cursor()
+        cursor.execute('SELECT timestamp, (strftime("%s", "now")-timestamp) AS elapsed_sec ' \
+                       'FROM table_timeout WHERE name=(?) ORDER BY elapsed_sec DESC LIMIT 1', \
+                       (bucket,))
+        res = cursor.fetchone()
+        if not res or len(res) < 2 or int(res[1]) >= timeout_sec:
+            cursor.close()
+            return None
+
+        cursor.execute('SELECT COUNT(1) FROM uploads WHERE s3_url=? AND bucket=?', \
+                                                                                (s3_url, bucket))
+        count_res = cursor.fetchone()
+        cursor.close()
+
+        if not count_res or int(count_res[0]) <= 0:
+            return None
+
+        return (int(res[0]), self.get_data_version(s3_url, bucket) or 0)
+
+    def get_data_version(self, s3_url: str, bucket: str) -> Optional[int]:
+        """ Returns the version of a bucket's data that's changed every time the data is edited
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket to get the version of, or DATA_VERSION_ALL_BUCKETS for the
+                    version of the changes that apply to all buckets
+        Return:
+            Returns the version of the data, or None if the data versions aren't available
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to access database before connecting')
+
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute('SELECT version FROM data_versions WHERE s3_url=? AND bucket=?', \
+                                                                                (s3_url, bucket))
+        except sqlite3.Error as ex:
+            print(f'Unable to get the data version: {ex} {bucket}')
+            cursor.close()
+            return None
+
+        res = cursor.fetchone()
+        cursor.close()
+
+        return int(res[0]) if res else 0
+
+    def bump_data_version(self, s3_url: str, bucket: str) -> bool:
+        """ Changes the version of a bucket's data after it's been edited
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket that was edited, or DATA_VERSION_ALL_BUCKETS for changes that
+                    apply to all buckets
+        Return:
+            Returns True if the version was changed and False if not
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to access database before connecting')
+
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute('INSERT INTO data_versions(s3_url, bucket, version) VALUES(?,?,1) ' \
+                           'ON CONFLICT(s3_url, bucket) DO UPDATE SET version=version+1', \
+                                                                                (s3_url, bucket))
+        except sqlite3.Error as ex:
+            print(f'Unable to update the data version: {ex} {bucket}')
+            cursor.close()
+            return False
+
+        self._conn.commit()
+        cursor.close()
+
+        return True
+
+    def get_upload_locations(self, s3_url: str, bucket: str, version: str, \
+                                                            timeout_sec: int) -> Optional[dict]:
+        """ Returns the saved locations and elevations of a collection's uploads
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket of the collection
+            version: the version of the data the locations need to have been saved with
+            timeout_sec: the amount of time before the saved locations are considered expired
+        Return:
+            Returns a dict of the (location ID, elevation) of each upload keyed by the upload
+            name, or None if the saved locations aren't available
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to access database before connecting')
+
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute('SELECT upload, loc_id, elevation FROM upload_locations WHERE ' \
+                           's3_url=? AND bucket=? AND version=? AND ' \
+                           '(strftime("%s", "now")-timestamp) < ?', \
+                                                        (s3_url, bucket, version, timeout_sec))
+        except sqlite3.Error as ex:
+            print(f'Unable to get the upload locations: {ex} {bucket}')
+            cursor.close()
+            return None
+
+        res = cursor.fetchall()
+        cursor.close()
+
+        return {one_row[0]: (one_row[1], one_row[2]) for one_row in res}
+
+    def save_upload_locations(self, s3_url: str, bucket: str, version: str, \
+                                                                    locations: tuple) -> bool:
+        """ Saves the locations and elevations of a collection's uploads
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket of the collection
+            version: the version of the data the locations were loaded with
+            locations: the uploads' 'name', 'loc', and 'elevation'
+        Return:
+            Returns True if the locations were saved and False if not
+        Notes:
+            Locations saved with a different version of the data are removed
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to access database before connecting')
+
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute('DELETE FROM upload_locations WHERE s3_url=? AND bucket=? AND ' \
+                           'version<>?', (s3_url, bucket, version))
+            cursor.executemany('INSERT INTO upload_locations(s3_url, bucket, upload, loc_id, ' \
+                               'elevation, version, timestamp) ' \
+                               'VALUES(?,?,?,?,?,?,strftime("%s", "now")) ' \
+                               'ON CONFLICT(s3_url, bucket, upload) DO UPDATE SET ' \
+                               'loc_id=excluded.loc_id, elevation=excluded.elevation, ' \
+                               'version=excluded.version, timestamp=excluded.timestamp', \
+                               [(s3_url, bucket, one_location['name'], one_location['loc'], \
+                                 one_location['elevation'], version) \
+                                                                for one_location in locations])
+        except sqlite3.Error as ex:
+            print(f'Unable to save the upload locations: {ex} {bucket}')
+            self._conn.rollback()
+            cursor.close()
+            return False
+
+        self._conn.commit()
+        cursor.close()
+
+        return True
+
     def save_uploads(self, s3_url: str, bucket: str, uploads: tuple) -> bool:
         """ Save the upload information into the table
         Arguments:
@@ -442,6 +695,12 @@ class SPDSQLite:
             cursor.close()
             return False
 
+        # Replace the normalized images of the uploads
+        if not self._save_upload_images(cursor, s3_url, bucket, uploads):
+            cursor.execute('ROLLBACK TRANSACTION')
+            cursor.close()
+            return False
+
         # Update the timeout table for uploads and do some cleanup if needed
         cursor.execute('SELECT COUNT(1) FROM table_timeout WHERE name=(?)', (bucket,))
         res = cursor.fetchone()
@@ -463,6 +722,303 @@ class SPDSQLite:
 
         return True
 
+    def _save_upload_images(self, cursor: sqlite3.Cursor, s3_url: str, bucket: str, \
+                            uploads: tuple, only_uploads: bool=False) -> bool:
+        """ Replaces the normalized image, observation, and posting list rows of a
+            collection's uploads
+        Arguments:
+            cursor: the cursor of the current uploads transaction
+            s3_url: the URL associated with this request
+            bucket: the bucket name to save the images under
+            uploads: the uploads with their 'name' and optional 'images' tuple of
+                (name, s3_path, timestamp, epoch, year, month, weekday, hour, loc_id,
+                elevation, species) values, where species is a tuple of
+                (common name, scientific name, count) values
+            only_uploads: set to True to only replace the rows of these uploads instead
+                of all the collection's rows
+        Return:
+            Returns True if the images were saved and False if something went wrong
+        Notes:
+            The images are saved within a savepoint so that a problem leaves the saved images
+            unchanged. Callers need to roll back the uploads they saved when False is returned
+            so that the uploads and their images stay the same
+        """
+        if only_uploads:
+            image_select = 'SELECT id FROM images WHERE s3_url=? AND bucket=? AND upload IN ' \
+                                                            f'({",".join("?" * len(uploads))})'
+            image_params = (s3_url, bucket, *(one_upload['name'] for one_upload in uploads))
+        else:
+            image_select = 'SELECT id FROM images WHERE s3_url=? AND bucket=?'
+            image_params = (s3_url, bucket)
+
+        cursor.execute('SAVEPOINT upload_images')
+        try:
+            cursor.execute(f'DELETE FROM image_postings WHERE image_id IN ({image_select})', \
+                                                                                    image_params)
+            cursor.execute(f'DELETE FROM observations WHERE image_id IN ({image_select})', \
+                                                                                    image_params)
+            cursor.execute(f'DELETE FROM images WHERE id IN ({image_select})', image_params)
+
+            # Assign the IDs here so that observations can be inserted in bulk
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM images')
+            next_id = int(cursor.fetchone()[0]) + 1
+
+            image_rows = []
+            observation_rows = []
+            posting_rows = []
+            for one_upload in uploads:
+                for one_image in one_upload.get('images', []):
+                    image_rows.append((next_id, s3_url, bucket, one_upload['name'], \
+                                                                            *one_image[:10]))
+                    observation_rows.extend([(next_id, *one_species) for one_species in \
+                                                                                one_image[10]])
+
+                    # Add the image to its posting lists
+                    posting_rows.extend([(s3_url, bucket, POSTING_KIND_SPECIES, one_name, \
+                                                                                    next_id) \
+                                    for one_name in {one_species[1] for one_species in \
+                                                                                one_image[10]}])
+                    if one_image[8] is not None:
+                        posting_rows.append((s3_url, bucket, POSTING_KIND_LOCATION, \
+                                                                        one_image[8], next_id))
+                    if one_image[4] is not None:
+                        posting_rows.append((s3_url, bucket, POSTING_KIND_YEAR, \
+                                                                    str(one_image[4]), next_id))
+                    next_id += 1
+
+            cursor.executemany('INSERT INTO images(id, s3_url, bucket, upload, name, s3_path, ' \
+                                    'timestamp, epoch, year, month, weekday, hour, loc_id, ' \
+                                    'elevation) VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?)', image_rows)
+            cursor.executemany('INSERT INTO observations(image_id, common_name, ' \
+                                    'scientific_name, count) VALUES(?,?,?,?)', observation_rows)
+            cursor.executemany('INSERT INTO image_postings(s3_url, bucket, kind, value, ' \
+                                    'image_id) VALUES(?,?,?,?,?)', posting_rows)
+        except sqlite3.Error as ex:
+            print(f'Unable to save upload images: {ex.sqlite_errorcode} {bucket}')
+            print('   ',ex)
+            cursor.execute('ROLLBACK TO upload_images')
+            cursor.execute('RELEASE upload_images')
+            return False
+
+        cursor.execute('RELEASE upload_images')
+        return True
+
+    def update_upload(self, s3_url: str, bucket: str, upload: dict) -> bool:
+        """ Replaces, or adds, one upload of a collection whose uploads are saved
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket name of the upload
+            upload: the upload containing the upload name, associated JSON, and the
+                optional normalized 'images' (see _save_upload_images())
+        Return:
+            Returns True if the upload was saved and False if not
+        Notes:
+            Nothing is saved if the collection's uploads haven't been saved since a partial
+            set of uploads would be treated as all of them.
+            If the upload can't be saved, the collection's saved uploads are removed so that
+            they're loaded again instead of the out of date upload being used
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to access database before connecting')
+
+        cursor = self._conn.cursor()
+        cursor.execute('SELECT COUNT(1) FROM uploads WHERE s3_url=? AND bucket=?', \
+                                                                                (s3_url, bucket))
+        res = cursor.fetchone()
+        if not res or int(res[0]) <= 0:
+            cursor.close()
+            return False
+
+        saved = True
+        try:
+            cursor.execute('DELETE FROM uploads WHERE s3_url=? AND bucket=? AND name=?', \
+                                                            (s3_url, bucket, upload['name']))
+            cursor.execute('INSERT INTO uploads(s3_url, bucket, name, json) values(?,?,?,?)', \
+                                                (s3_url, bucket, upload['name'], upload['json']))
+        except sqlite3.Error as ex:
+            print(f'Unable to update upload: {ex.sqlite_errorcode} {bucket} {upload["name"]}')
+            saved = False
+
+        if not saved or not self._save_upload_images(cursor, s3_url, bucket, (upload,), True):
+            cursor.execute('ROLLBACK TRANSACTION')
+            try:
+                cursor.execute('DELETE FROM uploads WHERE s3_url=? AND bucket=?', \
+                                                                            (s3_url, bucket))
+                self._conn.commit()
+            except sqlite3.Error as ex:
+                print(f'Unable to remove out of date uploads: {ex.sqlite_errorcode} {bucket}')
+                self._conn.rollback()
+            cursor.close()
+            return False
+
+        self._conn.commit()
+        cursor.close()
+
+        return True
+
+    def count_image_postings(self, s3_url: str, bucket: str, kind: str, \
+                                                                values: tuple) -> Optional[int]:
+        """ Returns the length of the posting list of the images with any of the values
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket to count the image IDs of
+            kind: the kind of posting list (species, location, or year)
+            values: the values to count the image IDs of
+        Return:
+            Returns the number of postings, or None if there was a problem
+        Notes:
+            An image with more than one of the values is counted for each value
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to access database before connecting')
+
+        values = tuple(str(one_value) for one_value in values)
+
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute('SELECT COUNT(1) FROM image_postings WHERE s3_url=? AND bucket=? ' \
+                                f'AND kind=? AND value IN ({",".join("?" * len(values))})', \
+                           (s3_url, bucket, kind, *values))
+            res = cursor.fetchone()
+        except sqlite3.Error as ex:
+            print(f'Unable to count image postings: {ex.sqlite_errorcode} {bucket}')
+            cursor.close()
+            return None
+
+        cursor.close()
+
+        return int(res[0]) if res else 0
+
+    def get_image_postings(self, s3_url: str, bucket: str, kind: str, values: tuple, \
+                                        image_ids: Optional[tuple]=None) -> Optional[tuple]:
+        """ Returns the posting list of the images with any of the values
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket to get the image IDs of
+            kind: the kind of posting list (species, location, or year)
+            values: the values to get the image IDs of
+            image_ids: the optional sorted image IDs to intersect the posting list with
+        Return:
+            Returns the sorted tuple of image IDs, or None if there was a problem
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to access database before connecting')
+
+        values = tuple(str(one_value) for one_value in values)
+        query = 'SELECT DISTINCT image_id FROM image_postings WHERE s3_url=? AND bucket=? ' \
+                                f'AND kind=? AND value IN ({",".join("?" * len(values))})'
+        params = (s3_url, bucket, kind, *values)
+
+        cursor = self._conn.cursor()
+        try:
+            if image_ids is None:
+                cursor.execute(query + ' ORDER BY image_id', params)
+                res = cursor.fetchall()
+            else:
+                # Sorted chunks of IDs keep the result sorted
+                res = []
+                for start in range(0, len(image_ids), IMAGE_ID_QUERY_CHUNK_SIZE):
+                    chunk_ids = tuple(image_ids[start:start + IMAGE_ID_QUERY_CHUNK_SIZE])
+                    cursor.execute(query + \
+                                    f' AND image_id IN ({",".join("?" * len(chunk_ids))}) ' \
+                                        'ORDER BY image_id', (*params, *chunk_ids))
+                    res.extend(cursor.fetchall())
+        except sqlite3.Error as ex:
+            print(f'Unable to query image postings: {ex.sqlite_errorcode} {bucket}')
+            cursor.close()
+            return None
+
+        cursor.close()
+
+        return tuple(one_row[0] for one_row in res)
+
+    def get_upload_images(self, s3_url: str, bucket: str, filters: dict, \
+                                        image_ids: Optional[tuple]=None) -> Optional[tuple]:
+        """ Returns the saved images of a collection that match the filters
+        Arguments:
+            s3_url: the URL associated with this request
+            bucket: the bucket to get the images of
+            filters: the filters with any of the following keys: 'locations', 'species',
+                'months', 'days', and 'hours' collections of values; 'startEpoch' and
+                'endEpoch' microsecond bounds; 'yearStart' and 'yearEnd' bounds;
+                'elevations' tuple of (comparison, meters) values; and 'needsTimestamp'
+                set to True if images need a timestamp
+            image_ids: the optional sorted image IDs to restrict the images to
+        Return:
+            Returns a tuple of (image id, upload, name, s3_path, timestamp, loc_id, elevation,
+            common name, scientific name, count) rows ordered by image, with a row for each
+            of an image's observations. None is returned if the collection doesn't have any
+            saved images
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to access database before connecting')
+
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute('SELECT id FROM images WHERE s3_url=? AND bucket=? LIMIT 1', \
+                                                                                (s3_url, bucket))
+            if not cursor.fetchone():
+                cursor.close()
+                return None
+        except sqlite3.Error as ex:
+            print(f'Unable to query upload images: {ex.sqlite_errorcode} {bucket}')
+            cursor.close()
+            return None
+
+        # Specified image IDs are looked up by their key instead of through an index
+        if image_ids is None:
+            where = ['i.s3_url=?', 'i.bucket=?']
+        else:
+            where = ['+i.s3_url=?', '+i.bucket=?']
+        params = [s3_url, bucket]
+
+        # Add the filters that are lists of values
+        for filter_name, column in (('locations', 'i.loc_id'), ('months', 'i.month'), \
+                                    ('days', 'i.weekday'), ('hours', 'i.hour')):
+            if filters.get(filter_name) is not None:
+                values = tuple(filters[filter_name])
+                where.append(f'{column} IN ({",".join("?" * len(values))})')
+                params.extend(values)
+
+        if filters.get('species') is not None:
+            values = tuple(filters['species'])
+            where.append('i.id IN (SELECT image_id FROM observations WHERE scientific_name IN ' \
+                                                            f'({",".join("?" * len(values))}))')
+            params.extend(values)
+
+        # Add the range filters
+        if filters.get('needsTimestamp', False):
+            where.append('i.epoch IS NOT NULL')
+        for filter_name, condition in (('startEpoch', 'i.epoch>=?'), ('endEpoch', 'i.epoch<=?'), \
+                                       ('yearStart', 'i.year>=?'), ('yearEnd', 'i.year<=?')):
+            if filters.get(filter_name) is not None:
+                where.append(condition)
+                params.append(filters[filter_name])
+        for comparison, meters in filters.get('elevations', []):
+            if comparison not in ELEVATION_COMPARISONS:
+                raise ValueError(f'Invalid elevation filter comparison specified: {comparison}')
+            where.append(f'i.elevation{comparison}?')
+            params.append(meters)
+
+        query = 'SELECT i.id, i.upload, i.name, i.s3_path, i.timestamp, i.loc_id, ' \
+                        'i.elevation, o.common_name, o.scientific_name, o.count ' \
+                    'FROM images i LEFT JOIN observations o ON o.image_id=i.id ' \
+                    f'WHERE {" AND ".join(where)}'
+        if image_ids is None:
+            cursor.execute(query + ' ORDER BY i.id, o.id', params)
+            res = cursor.fetchall()
+        else:
+            # Sorted chunks of IDs keep the rows in image order
+            res = []
+            for start in range(0, len(image_ids), IMAGE_ID_QUERY_CHUNK_SIZE):
+                chunk_ids = tuple(image_ids[start:start + IMAGE_ID_QUERY_CHUNK_SIZE])
+                cursor.execute(query + f' AND i.id IN ({",".join("?" * len(chunk_ids))}) ' \
+                                            'ORDER BY i.id, o.id', (*params, *chunk_ids))
+                res.extend(cursor.fetchall())
+        cursor.close()
+
+        return res
+
     def save_query_path(self, token: str, file_path: str) -> bool:
         """ Stores the specified query file path in the database
         Arguments:
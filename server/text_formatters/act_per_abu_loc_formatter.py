@@ -3,7 +3,6 @@
 import dataclasses
 import os
 
-from .analysis import Analysis
 from .results import Results
 
 # pylint: disable=consider-using-f-string
@@ -42,12 +41,12 @@ class ActPerAbuLocFormatter:
                                                                     one_species['scientificName'])
                 year_image_total = year_image_total + len(year_species_images)
                 year_activity_total += \
-                        Analysis.activity_for_image_list(year_species_images)
+                        results.activity_for_image_list(year_species_images)
                 year_period_total += \
-                        Analysis.period_for_image_list(year_species_images, results.get_interval())
+                        results.period_for_image_list(year_species_images)
                 year_abundance_total += \
-                        Analysis.abundance_for_image_list(year_species_images, \
-                                            results.get_interval(), one_species['scientificName'])
+                        results.abundance_for_image_list(year_species_images, \
+                                                         one_species['scientificName'])
             image_total += year_image_total
             activity_total += year_activity_total
             period_total += year_period_total
@@ -89,11 +88,10 @@ class ActPerAbuLocFormatter:
 
             for one_year in results.get_years():
                 species_year_images = results.filter_year(species_images, one_year)
-                species_activity = Analysis.activity_for_image_list(species_year_images)
-                species_period = Analysis.period_for_image_list(species_year_images, \
-                                                                            results.get_interval())
-                species_abundance = Analysis.abundance_for_image_list(species_year_images, \
-                                            results.get_interval(), one_species['scientificName'])
+                species_activity = results.activity_for_image_list(species_year_images)
+                species_period = results.period_for_image_list(species_year_images)
+                species_abundance = results.abundance_for_image_list(species_year_images, \
+                                                                     one_species['scientificName'])
                 species_location = len(results.locations_for_image_list(species_year_images))
                 species_image_total += len(species_year_images)
                 species_activity_total += species_activity
@@ -136,8 +134,7 @@ class ActPerAbuLocFormatter:
                 year_species_images = results.filter_species(year_images, \
                                                                     one_species['scientificName'])
                 year_period_total += \
-                            Analysis.period_for_image_list(year_species_images, \
-                                                                            results.get_interval())
+                            results.period_for_image_list(year_species_images)
             period_total = period_total + year_period_total
 
         for one_species in results.get_species_by_name():
@@ -147,8 +144,7 @@ class ActPerAbuLocFormatter:
             for one_year in results.get_years():
                 species_year_images = results.filter_year(species_images, one_year)
                 species_period_total += \
-                                Analysis.period_for_image_list(species_year_images, \
-                                                                            results.get_interval())
+                                results.period_for_image_list(species_year_images)
             result += '  {:<28s} {:5d}  {:7.2f}'.format(one_species['name'], species_period_total, \
                                     (float(species_period_total) / float(period_total)) * 100.0) + \
                       os.linesep
@@ -185,10 +181,10 @@ class ActPerAbuLocFormatter:
             for one_year in results.get_years():
                 species_year_images = results.filter_year(species_images, one_year)
                 period_over_all_species += \
-                        Analysis.period_for_image_list(species_year_images, results.get_interval())
+                        results.period_for_image_list(species_year_images)
                 num_animals_photographed += \
-                        Analysis.abundance_for_image_list(species_year_images, \
-                                            results.get_interval(), one_species['scientificName'])
+                        results.abundance_for_image_list(species_year_images, \
+                                                         one_species['scientificName'])
 
         for one_species in results.get_species():
             species_images = results.get_species_images(one_species['scientificName'])
@@ -197,11 +193,10 @@ class ActPerAbuLocFormatter:
             for one_year in results.get_years():
                 species_year_images = results.filter_year(species_images, one_year)
                 abundance_total += \
-                            Analysis.abundance_for_image_list(species_year_images, \
-                                            results.get_interval(), one_species['scientificName'])
+                            results.abundance_for_image_list(species_year_images, \
+                                                             one_species['scientificName'])
                 period_total += \
-                            Analysis.period_for_image_list(species_year_images, \
-                                                                            results.get_interval())
+                            results.period_for_image_list(species_year_images)
 
             result += '{:<28s} {:7d}               {:7.2f}             {:7.2f}             ' \
                       '{:7.2f}'.format(one_species['name'], period_total, \
@@ -246,15 +241,14 @@ class ActPerAbuLocFormatter:
                 for one_location in results.get_locations():
                     year_species_loc_images = results.filter_location(year_species_images, \
                                                                         one_location['idProperty'])
-                    abundance = Analysis.abundance_for_image_list(year_species_loc_images, \
-                                            results.get_interval(), one_species['scientificName'])
+                    abundance = results.abundance_for_image_list(year_species_loc_images, \
+                                                                 one_species['scientificName'])
 
                     loc_species_images = results.filter_species(\
                                             results.filter_location(results.get_images(), \
                                                                     one_location['idProperty']), \
                                             one_species['scientificName'])
-                    period = Analysis.period_for_image_list(loc_species_images, \
-                                                                            results.get_interval())
+                    period = results.period_for_image_list(loc_species_images)
 
                     result += '{:5.2f} '.format(0.0 if period == 0 else \
                                                                 float(abundance) / float(period))
@@ -292,14 +286,14 @@ class ActPerAbuLocFormatter:
             for one_location in results.get_locations():
                 species_loc_images = results.filter_location(species_images, \
                                                                         one_location['idProperty'])
-                abundance = Analysis.abundance_for_image_list(species_loc_images, \
-                                            results.get_interval(), one_species['scientificName'])
+                abundance = results.abundance_for_image_list(species_loc_images, \
+                                                             one_species['scientificName'])
 
                 loc_species_images = \
                             results.filter_species( \
                                         results.get_location_images(one_location['idProperty']), \
                                         one_species['scientificName'])
-                period = Analysis.period_for_image_list(loc_species_images, results.get_interval())
+                period = results.period_for_image_list(loc_species_images)
 
                 result += '{:5.2f} '.format(0.0 if period == 0 else float(abundance)/float(period))
 
@@ -1,13 +1,33 @@
 """ Formats species activity patterns """
 
 import dataclasses
-import math
 import os
 import sys
 
-from .analysis import Analysis
+import numpy as np
+
 from .results import Results
 
+
+def hourly_frequency_differences(frequencies: np.ndarray) -> np.ndarray:
+    """ Returns the sum of the squared differences of the hourly frequencies of each pair
+    Arguments:
+        frequencies: the array of frequencies with a row for each species and a column
+                for each hour
+    Return:
+        Returns the array of summed squared differences with a row and column for each species
+    Notes:
+        The hours are added one at a time, in order, so that the sums are the same as adding
+        each pair's differences in a loop
+    """
+    differences = np.zeros((frequencies.shape[0], frequencies.shape[0]))
+    for one_hour in range(0, frequencies.shape[1]):
+        hour_differences = frequencies[:, one_hour, np.newaxis] - \
+                                                        frequencies[np.newaxis, :, one_hour]
+        differences = differences + hour_differences * hour_differences
+
+    return differences
+
 # pylint: disable=consider-using-f-string
 @dataclasses.dataclass
 class ActivityPatternFormatter:
@@ -56,10 +76,10 @@ class ActivityPatternFormatter:
                 for one_month in range(-1, 12):
                     # -1 = all months
                     if one_month == -1:
-                        activity = Analysis.activity_for_image_list(species_hour_images)
+                        activity = results.activity_for_image_list(species_hour_images)
                     else:
                         species_month_images = results.filter_month(species_hour_images, one_month)
-                        activity = Analysis.activity_for_image_list(species_month_images)
+                        activity = results.activity_for_image_list(species_month_images)
                     total_activities[one_month + 1] += activity
 
             # 24 hrs
@@ -72,11 +92,11 @@ class ActivityPatternFormatter:
                     activity = 0
                     # -1 = all months
                     if one_month == -1:
-                        activity = Analysis.activity_for_image_list(species_hour_images)
+                        activity = results.activity_for_image_list(species_hour_images)
                     else:
                         species_hour_month_images = results.filter_month(species_hour_images, \
                                                                                         one_month)
-                        activity = Analysis.activity_for_image_list(species_hour_month_images)
+                        activity = results.activity_for_image_list(species_hour_month_images)
 
                     if activity != 0:
                         to_add += '{:6d} {:10.3f}'.format(activity, \
@@ -126,30 +146,17 @@ class ActivityPatternFormatter:
             result += '{:<8s} '.format(species['name'][:8])
         result += os.linesep
 
-        for species in results.get_species_by_name():
+        species_hours = results.get_species_hour_activity()
+        species_rows = [species_hours['index'][species['scientificName']] for species in \
+                                                                results.get_species_by_name()]
+        activity_similarity = hourly_frequency_differences( \
+                            species_hours['activity'][species_rows] / \
+                            species_hours['activity_totals'][species_rows, np.newaxis]).tolist()
+
+        for species, similarity_row in zip(results.get_species_by_name(), activity_similarity):
             result += '{:<27s}'.format(species['name'])
-            for other_species in results.get_species_by_name():
-                species_image = results.get_species_images(species['scientificName'])
-                other_species_image = results.get_species_images(other_species['scientificName'])
-                total_activity = Analysis.activity_for_image_list(species_image)
-                total_activity_other = Analysis.activity_for_image_list(other_species_image)
-
-                activity_similarity = 0.0
-
-                # 24 hrs
-                for one_hour in range(0, 24):
-                    species_image_hour = results.filter_hours(species_image, one_hour, one_hour + 1)
-                    other_species_image_hour = results.filter_hours(other_species_image, \
-                                                                            one_hour, one_hour + 1)
-                    activity = Analysis.activity_for_image_list(species_image_hour)
-                    activity_other = Analysis.activity_for_image_list(other_species_image_hour)
-                    frequency = activity / total_activity
-                    frequency_other = activity_other / total_activity_other
-                    difference = frequency - frequency_other
-                    # Frequency squared
-                    activity_similarity = activity_similarity + (difference * difference)
-
-                result += '{:6.3f}   '.format(activity_similarity)
+            for one_similarity in similarity_row:
+                result += '{:6.3f}   '.format(one_similarity)
 
             result += os.linesep
 
@@ -173,61 +180,33 @@ class ActivityPatternFormatter:
         lowest_other = None
         lowest_frequency = sys.float_info.max
 
-        for species in results.get_species_by_name():
-            for other_species in results.get_species_by_name():
-                species_images = results.get_species_images(species['scientificName'])
-                other_species_images = results.get_species_images(other_species['scientificName'])
-
-                activity_similarity = 0.0
-
-                if (len(species_images) >= 25 and len(other_species_images) >= 25 and \
+        all_species = results.get_species_by_name()
+        species_hours = results.get_species_hour_activity()
+        species_rows = [species_hours['index'][species['scientificName']] for species in \
+                                                                                    all_species]
+        image_totals = species_hours['image_totals'][species_rows]
+        frequencies = species_hours['images'][species_rows] / image_totals[:, np.newaxis]
+        activity_similarity = np.sqrt(hourly_frequency_differences(frequencies)).tolist()
+        image_totals = image_totals.tolist()
+
+        for species_idx, species in enumerate(all_species):
+            for other_idx, other_species in enumerate(all_species):
+                if (image_totals[species_idx] >= 25 and image_totals[other_idx] >= 25 and \
                                     species['scientificName'] != other_species['scientificName']):
-                    # 24 hrs
-                    for one_hour in range(0, 24):
-                        species_image_hour = results.filter_hours(species_images, \
-                                                                            one_hour, one_hour + 1)
-                        other_species_image_hour = results.filter_hours(other_species_images, \
-                                                                            one_hour, one_hour + 1)
-                        num_images = float(len(species_image_hour))
-                        num_images_other = float(len(other_species_image_hour))
-                        frequency = num_images / float(len(species_images))
-                        frequency_other = num_images_other / float(len(other_species_images))
-                        difference = frequency - frequency_other
-                        # Frequency squared
-                        activity_similarity = activity_similarity + (difference * difference)
-
-                    activity_similarity = math.sqrt(activity_similarity)
-
-                    if lowest_frequency >= activity_similarity:
-                        lowest_frequency = activity_similarity
-                        lowest = species
-                        lowest_other = other_species
+                    if lowest_frequency >= activity_similarity[species_idx][other_idx]:
+                        lowest_frequency = activity_similarity[species_idx][other_idx]
+                        lowest = species_idx
+                        lowest_other = other_idx
 
         if lowest is not None:
-            result += 'Hour            {:<28s} {:<28s}'.format(lowest['name'], \
-                                                            lowest_other['name']) + os.linesep
-
-            species_images = results.get_species_images(lowest['scientificName'])
-            other_species_images = results.get_species_images(lowest_other['scientificName'])
-            total_images = len(species_images)
-            total_images_other = len(other_species_images)
-            activity_similarity = 0.0
+            result += 'Hour            {:<28s} {:<28s}'.format(all_species[lowest]['name'], \
+                                                    all_species[lowest_other]['name']) + os.linesep
 
             # 24 hrs
             for one_hour in range(0, 24):
-                species_image_hour = results.filter_hours(species_images, one_hour, one_hour + 1)
-                other_species_image_hour = results.filter_hours(other_species_images, \
-                                                                        one_hour, one_hour + 1)
-                num_images = float(len(species_image_hour))
-                num_images_other = float(len(other_species_image_hour))
-                frequency = num_images / total_images
-                frequency_other = num_images_other / total_images_other
-                difference = frequency - frequency_other
-                # Frequency squared
-                activity_similarity = activity_similarity + difference * difference
-
                 result += '{:02d}:00-{:02d}:00     {:5.3f}                        {:5.3f}'.format(\
-                                    one_hour, one_hour + 1, frequency, frequency_other) + os.linesep
+                                    one_hour, one_hour + 1, frequencies[lowest, one_hour], \
+                                    frequencies[lowest_other, one_hour]) + os.linesep
 
         result += os.linesep
 
@@ -257,33 +236,20 @@ class ActivityPatternFormatter:
 
         result += os.linesep
 
-        for species in results.get_species_by_name():
-            species_images = results.get_species_images(species['scientificName'])
-            if len(species_images) >= 25:
+        species_hours = results.get_species_hour_activity()
+        species_rows = [species_hours['index'][species['scientificName']] for species in \
+                                                                results.get_species_by_name()]
+        image_totals = species_hours['image_totals'][species_rows]
+        chi_square = ((1.0 - hourly_frequency_differences(species_hours['images'][species_rows] / \
+                                            image_totals[:, np.newaxis])) / 1.0).tolist()
+        image_totals = image_totals.tolist()
+
+        for species, species_total, chi_square_row in zip(results.get_species_by_name(), \
+                                                                    image_totals, chi_square):
+            if species_total >= 25:
                 result += '{:<28s}'.format(species['name'])
-                for other_species in results.get_species_by_name():
-                    other_species_images = \
-                                        results.get_species_images(other_species['scientificName'])
-
-                    activity_similarity = 0.0
-
-                    # 24 hrs
-                    for one_hour in range(0, 24):
-                        species_image_hour = results.filter_hours(species_images, \
-                                                                            one_hour, one_hour + 1)
-                        other_species_image_hour = results.filter_hours(other_species_images, \
-                                                                            one_hour, one_hour + 1)
-                        num_images = float(len(species_image_hour))
-                        num_images_other = float(len(other_species_image_hour))
-                        frequency = num_images / float(len(species_images))
-                        frequency_other = num_images_other / float(len(other_species_images))
-                        difference = frequency - frequency_other
-                        # Frequency squared
-                        activity_similarity = activity_similarity + (difference * difference)
-
-                    chi_square = (1.0 - activity_similarity) / 1.0
-
-                    if chi_square >= 0.95 and len(other_species_images) >= 25:
+                for other_total, one_chi_square in zip(image_totals, chi_square_row):
+                    if one_chi_square >= 0.95 and other_total >= 25:
                         result += '   X     '
                     else:
                         result += '         '
@@ -379,7 +345,7 @@ class ActivityPatternFormatter:
                 species_season_images = results.filter_month_list(species_images,
                                                                                 seasons[one_season])
 
-                activity = Analysis.activity_for_image_list(species_season_images)
+                activity = results.activity_for_image_list(species_season_images)
                 result += '{:7d}               '.format(activity)
                 images_per_season[one_season] = activity
             result += os.linesep
@@ -425,8 +391,8 @@ class ActivityPatternFormatter:
                     species_season_hour_images = results.filter_month(species_hour_images, \
                                                                                 seasons[one_season])
 
-                    num_pics = Analysis.activity_for_image_list(species_season_hour_images)
-                    total_pics = Analysis.activity_for_image_list(species_season_images)
+                    num_pics = results.activity_for_image_list(species_season_hour_images)
+                    total_pics = results.activity_for_image_list(species_season_images)
                     frequency = 0.0
                     if total_pics != 0:
                         frequency = float(num_pics) / float(total_pics)
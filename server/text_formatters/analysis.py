@@ -3,11 +3,17 @@
 import dataclasses
 import datetime
 import math
+from typing import Callable
 
 import ephem
+import numpy as np
 
 # The number of seconds in a day as a float to capture fractions of days
 SECONDS_IN_DAY = 60.0 * 60.0 * 24.0
+# The number of microseconds in a second
+MICROSECONDS_IN_SECOND = 1000000
+# The number of minutes between images before a new activity is counted
+ACTIVITY_INTERVAL_MINUTES = 60
 
 @dataclasses.dataclass
 class Analysis:
@@ -157,6 +163,124 @@ class Analysis:
 
         return abundance
 
+    @staticmethod
+    def get_minimum_gap(interval_minutes: int, gap_minutes: Callable) -> int:
+        """ Returns the smallest number of microseconds between two images that's at least the
+            interval
+        Arguments:
+            interval_minutes: the number of minutes before a new event is considered
+            gap_minutes: returns the number of minutes the image list functions compare against
+                    the interval for a number of microseconds
+        Return:
+            Returns the smallest number of microseconds that's considered a new event
+        Notes:
+            Searching with the same calculation as the image list functions keeps their
+            floating point rounding at the interval boundary
+        """
+        if gap_minutes(0) >= interval_minutes:
+            return 0
+
+        upper = 1
+        while gap_minutes(upper) < interval_minutes:
+            upper *= 2
+
+        lower = upper // 2
+        while upper - lower > 1:
+            middle = (lower + upper) // 2
+            if gap_minutes(middle) >= interval_minutes:
+                upper = middle
+            else:
+                lower = middle
+
+        return upper
+
+    @staticmethod
+    def period_for_groups(epochs: np.ndarray, group_starts: np.ndarray, \
+                          interval_minutes: int) -> np.ndarray:
+        """ Returns the number of distinct periods of each group of images
+        Arguments:
+            epochs: the microsecond timestamps of the images, sorted by group and then by time
+            group_starts: the sorted positions of the first image of each group
+            interval_minutes: the number of minutes before a new event is considered
+        Return:
+            Returns the number of distinct periods of each group
+        Notes:
+            Matches period_for_image_list() for each group's images. A period starts with the
+            first image that's at least the interval after the start of the previous period
+        """
+        group_ends = np.append(group_starts[1:], len(epochs))
+        if len(epochs) == 0:
+            return np.zeros(len(group_starts), dtype=np.int64)
+
+        # Stay inside the integers when the interval is longer than all the images
+        min_gap = min(Analysis.get_minimum_gap(interval_minutes, \
+                                    lambda gap: gap / MICROSECONDS_IN_SECOND / 60.0), \
+                      int(epochs.max() - epochs.min()) + 1)
+        if min_gap <= 0:
+            return group_ends - group_starts
+
+        # Find the image that starts the period after each image using the rank of each
+        # timestamp so that the group can be part of the search key
+        group_ids = np.repeat(np.arange(len(group_starts)), group_ends - group_starts)
+        sorted_epochs = np.sort(epochs)
+        key_width = len(sorted_epochs) + 1
+        image_keys = group_ids * key_width + np.searchsorted(sorted_epochs, epochs)
+        next_keys = group_ids * key_width + np.searchsorted(sorted_epochs, epochs + min_gap)
+        next_starts = np.searchsorted(image_keys, next_keys)
+        next_starts[next_starts >= group_ends[group_ids]] = len(epochs)
+
+        # Count the periods from each group's first image by doubling the jumps between
+        # period starts until they all reach the end
+        jumps = np.append(next_starts, len(epochs))
+        counts = np.append(np.ones(len(epochs), dtype=np.int64), 0)
+        while np.any(jumps[group_starts] != len(epochs)):
+            counts = counts + counts[jumps]
+            jumps = jumps[jumps]
+
+        return counts[group_starts]
+
+    @staticmethod
+    def activity_for_groups(epochs: np.ndarray, group_starts: np.ndarray) -> np.ndarray:
+        """ Returns the number of distinct actions of each group of images
+        Arguments:
+            epochs: the microsecond timestamps of the images, sorted by group and then by time
+            group_starts: the sorted positions of the first image of each group
+        Return:
+            Returns the number of distinct actions of each group
+        Notes:
+            Matches activity_for_image_list() for each group's images
+        """
+        return Analysis.period_for_groups(epochs, group_starts, ACTIVITY_INTERVAL_MINUTES)
+
+    @staticmethod
+    def abundance_for_groups(epochs: np.ndarray, counts: np.ndarray, group_starts: np.ndarray, \
+                             interval_minutes: int) -> np.ndarray:
+        """ Returns the abundance of each group of images
+        Arguments:
+            epochs: the microsecond timestamps of the images, sorted by group and then by time
+            counts: the most animals of the species being looked for in each image, or zero
+            group_starts: the sorted positions of the first image of each group
+            interval_minutes: the number of minutes before a new event is considered
+        Return:
+            Returns the abundance of each group
+        Notes:
+            Matches abundance_for_image_list() for each group's images. An event ends when the
+            time between two images is at least the interval and each event adds its largest
+            count to the abundance
+        """
+        if len(epochs) == 0:
+            return np.zeros(len(group_starts), dtype=np.int64)
+
+        min_gap = Analysis.get_minimum_gap(interval_minutes, \
+                            lambda gap: math.ceil(gap / MICROSECONDS_IN_SECOND / 60.0))
+
+        event_starts = np.diff(epochs, prepend=epochs[0]) >= min_gap
+        event_starts[group_starts] = True
+        event_starts = np.flatnonzero(event_starts)
+        event_counts = np.maximum(np.maximum.reduceat(counts, event_starts), 0)
+
+        return np.add.reduceat(event_counts, np.searchsorted(event_starts, group_starts))
+
     @staticmethod
     def get_full_moons(first: datetime, last: datetime) -> tuple:
         """ Returns the full moon dates that fall between the first and last dates, inclusive
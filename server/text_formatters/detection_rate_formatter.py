@@ -4,7 +4,6 @@ import dataclasses
 import datetime
 import os
 
-from .analysis import Analysis
 from .results import Results
 
 def last_day_of_month(year: int, month: int) -> int:
@@ -93,8 +92,7 @@ class DetectionRateFormatter:
                         year_location_species_images = results.filter_species(year_location_images,\
                                                                         species['scientificName'])
                         period_total = period_total + \
-                                Analysis.period_for_image_list(year_location_species_images, \
-                                                                            results.get_interval())
+                                results.period_for_image_list(year_location_species_images)
 
                     total_pics = total_pics + period_total
 
@@ -106,8 +104,7 @@ class DetectionRateFormatter:
                     for species_index, species in enumerate(results.get_species_by_name()):
                         year_location_species_images = results.filter_species(year_location_images,\
                                                                         species['scientificName'])
-                        period = Analysis.period_for_image_list(year_location_species_images, \
-                                                                            results.get_interval())
+                        period = results.period_for_image_list(year_location_species_images)
                         result += ' {:5.2f}'.format(100.0 * \
                                                     (float(period) / float(total_days_for_loc)))
                         average_rate[species_index] = average_rate[species_index] + float(period)
@@ -197,8 +194,7 @@ class DetectionRateFormatter:
                                                                         species['scientificName']),\
                                                                     one_year)
                     period_total = period_total + \
-                                    Analysis.period_for_image_list(location_species_year_images, \
-                                                                            results.get_interval())
+                                    results.period_for_image_list(location_species_year_images)
 
             total_pics += period_total
 
@@ -214,8 +210,7 @@ class DetectionRateFormatter:
                                                                         species['scientificName']),\
                                                                     one_year)
 
-                    period += Analysis.period_for_image_list(location_species_year_images, \
-                                                                            results.get_interval())
+                    period += results.period_for_image_list(location_species_year_images)
 
                 result += ' {:5.2f}'.format(float(period) / float(total_days_loc))
                 average_rate[species_index] += float(period)
@@ -296,8 +291,7 @@ class DetectionRateFormatter:
                         year_location_species = results.filter_species(year_location_images, \
                                                                        species['scientificName'])
                         period_total = period_total + \
-                            Analysis.period_for_image_list(year_location_species, \
-                                                                            results.get_interval())
+                            results.period_for_image_list(year_location_species)
 
                     total_pics = total_pics + period_total
 
@@ -313,8 +307,7 @@ class DetectionRateFormatter:
                                                                     species['scientificName']), \
                                                     one_month)
                             period = period + \
-                                        Analysis.period_for_image_list(yl_month_species_images, \
-                                                                            results.get_interval())
+                                        results.period_for_image_list(yl_month_species_images)
                         result += ' {:5.2f}  '.format(float(period) / float(total_days_for_loc))
 
                         average_rate[one_month] = average_rate[one_month] + float(period)
@@ -400,9 +393,8 @@ class DetectionRateFormatter:
                                                                     location_images, \
                                                                     species['scientificName']), \
                                                                 one_year)
-                    period_total = period_total + Analysis.period_for_image_list( \
-                                                    location_species_year_images, \
-                                                                            results.get_interval())
+                    period_total = period_total + results.period_for_image_list( \
+                                                                   location_species_year_images)
 
             total_pics = total_pics + period_total
 
@@ -421,8 +413,7 @@ class DetectionRateFormatter:
                                                                 species['scientificName']), \
                                                             one_year)
                         period = period + \
-                                    Analysis.period_for_image_list(loc_month_species_year_images,\
-                                                                            results.get_interval())
+                                    results.period_for_image_list(loc_month_species_year_images)
                 result += ' {:5.2f}  '.format(float(period) / float(total_days_loc))
 
                 average_rate[one_month] = average_rate[one_month] + float(period)
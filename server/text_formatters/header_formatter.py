@@ -3,7 +3,6 @@
 import dataclasses
 import os
 
-from .analysis import Analysis
 from .results import Results
 
 
@@ -57,9 +56,8 @@ class HeaderFormatter:
             for location in results.get_locations():
                 species_location_images = results.filter_location(species_images, \
                                                                             location['idProperty'])
-                total_activity += Analysis.activity_for_image_list(species_location_images)
-                total_period += Analysis.period_for_image_list(species_location_images, \
-                                                                            results.get_interval())
+                total_activity += results.activity_for_image_list(species_location_images)
+                total_period += results.period_for_image_list(species_location_images)
 
         return "FOR ALL SPECIES AT ALL LOCATIONS " + os.linesep + \
             "Number of pictures processed = " + str(total_images) + os.linesep + \
@@ -4,7 +4,6 @@ import dataclasses
 import os
 import sys
 
-from .analysis import Analysis
 from .coordinate_utils import distance_between
 from .results import Results
 
@@ -45,13 +44,11 @@ class LocationStatFormatter:
             for location in results.get_locations():
                 have_location_images = results.filter_location(have_species_images, \
                                                                             location['idProperty'])
-                total_period = Analysis.period_for_image_list(have_location_images, \
-                                                                            results.get_interval())
+                total_period = results.period_for_image_list(have_location_images)
                 location_species_images = results.filter_species( \
                                             results.get_location_images(location['idProperty']), \
                                             species['scientificName'])
-                period = Analysis.period_for_image_list(location_species_images, \
-                                                                            results.get_interval())
+                period = results.period_for_image_list(location_species_images)
                 result += '{:5d} {:7.2f}                   '.format(period, \
                                (float(period) / float(total_period) if \
                                                             total_period != 0.0 else 0.0) * 100.0)
@@ -63,8 +60,7 @@ class LocationStatFormatter:
             location_images = [one_image for one_image in results.get_images() if \
                                                         one_image['loc'] == location['idProperty']]
             result += '{:5d}  100.00                   '.format(\
-                                Analysis.period_for_image_list(location_images, \
-                                                                            results.get_interval()))
+                                results.period_for_image_list(location_images))
 
         result += os.linesep + os.linesep
 
@@ -109,8 +105,7 @@ class LocationStatFormatter:
                                 yls_month_images = results.filter_month(\
                                                                     year_locations_species_images, \
                                                                     one_month)
-                                period = Analysis.period_for_image_list(yls_month_images, \
-                                                                            results.get_interval())
+                                period = results.period_for_image_list(yls_month_images)
                                 result += '{:5d}  '.format(period)
                                 total_pics = total_pics + period
 
@@ -121,8 +116,7 @@ class LocationStatFormatter:
                     for one_month in range(0, 12):
                         year_location_month_images = results.filter_month(year_location_images, \
                                                                                         one_month)
-                        period = Analysis.period_for_image_list(year_location_month_images, \
-                                                                            results.get_interval())
+                        period = results.period_for_image_list(year_location_month_images)
                         result += '{:5d}  '.format(period)
                         total_pics = total_pics + period
 
@@ -155,8 +149,7 @@ class LocationStatFormatter:
                     for one_month in range(0, 12):
                         year_location_month_images = results.filter_month(year_location_images, \
                                                                                         one_month)
-                        period = Analysis.period_for_image_list(year_location_month_images, \
-                                                                            results.get_interval())
+                        period = results.period_for_image_list(year_location_month_images)
                         effort = 0
                         if first_month == last_month and first_month == one_month:
                             effort = last_day - first_day + 1
@@ -210,8 +203,7 @@ class LocationStatFormatter:
                         for one_month in range(0, 12):
                             location_species_month_images = results.filter_month( \
                                                                 location_species_images, one_month)
-                            period = Analysis.period_for_image_list(location_species_month_images, \
-                                                                            results.get_interval())
+                            period = results.period_for_image_list(location_species_month_images)
                             result += '{:5d}  '.format(period)
                             total_pics += period
                         result += '{:5d}  '.format(total_pics) + os.linesep
@@ -220,8 +212,7 @@ class LocationStatFormatter:
                 total_pics = 0
                 for one_month in range(0, 12):
                     location_month_images = results.filter_month(location_images, one_month)
-                    period = Analysis.period_for_image_list(location_month_images, \
-                                                                            results.get_interval())
+                    period = results.period_for_image_list(location_month_images)
                     result += '{:5d}  '.format(period)
                     total_pics += period
                 result += '{:5d}  '.format(total_pics) + os.linesep
@@ -252,8 +243,7 @@ class LocationStatFormatter:
                 result += 'Total/Total effort          '
                 for one_month in range(0, 12):
                     location_month_images = results.filter_month(location_images, one_month)
-                    period = Analysis.period_for_image_list(location_month_images, \
-                                                                            results.get_interval())
+                    period = results.period_for_image_list(location_month_images)
                     effort = 0
                     if first_month == last_month and first_month == one_month:
                         effort = last_day - first_day + 1
@@ -1,12 +1,48 @@
 """ Contains the results of a query """
 
-from typing import Optional
+import datetime
+import itertools
+from typing import Callable, Iterable, Optional
+
+import numpy as np
 
 from .analysis import Analysis
 from .coordinate_utils import DEFAULT_UTM_ZONE
 
 # The default interval value
 DEFAULT_INTERVAL_MIN=0
+# The number of hours in a day
+HOURS_IN_DAY = 24
+
+# The positions of the (year, month, location, species, hour) dimensions of the image cube keys
+CUBE_YEAR = 0
+CUBE_MONTH = 1
+CUBE_LOCATION = 2
+CUBE_SPECIES = 3
+CUBE_HOUR = 4
+# Image cube key value for a dimension that isn't being filtered on
+_CUBE_ANY = object()
+# Image cube key value for the species of an image that doesn't have any
+_CUBE_NO_SPECIES = object()
+# Image cube key of all the images
+_CUBE_ALL = (_CUBE_ANY,) * 5
+
+
+class CubeImages(list):
+    """ A list of images that's a slice of the image cube of a Results instance """
+    __slots__ = ('cube_key', 'owner')
+
+    def __init__(self, images: Iterable, owner: object, cube_key: tuple):
+        """ Initializer
+        Arguments:
+            images: the images of the slice, sorted by date
+            owner: the Results instance the slice belongs to
+            cube_key: the (year, month, location, species, hour) key of the slice
+        """
+        super().__init__(images)
+        self.owner = owner
+        self.cube_key = cube_key
+
 
 class Results:
     """ Contains the results of a query """
@@ -21,8 +57,6 @@ class Results:
     interval_minutes = DEFAULT_INTERVAL_MIN
     # Sorted unique location ID
     _locations = None
-    # Original results
-    _results = None
     # Sorted unique species by nane
     _species = None
     # Sorted unique year
@@ -37,13 +71,31 @@ class Results:
     _s3_info = None
     # User settings
     _user_settings = None
-
-    def __init__(self, results: tuple, all_species: tuple, all_locations: tuple, \
+    # Image positions keyed by their (year, month, location, species, hour)
+    _cube = None
+    # The image cube keys that have a value, for each dimension
+    _cube_cells = None
+    # Slices of the image cube that have been looked up
+    _cube_slices = None
+    # Species whose images aren't the same when filtered and pre-filtered
+    _irregular_species = None
+    # Analysis reductions of image cube slices keyed by their kind, slice, and interval
+    _reductions = None
+    # The number of times analysis reductions were found, computed, or couldn't be saved
+    _reduction_stats = None
+    # The (dimensions, kind, values) of the analysis reductions saved for all their slices
+    _reduced_groups = None
+    # The image cube dimensions of the images as arrays
+    _cube_columns = None
+    # The activity and number of images of each species by hour
+    _species_hours = None
+
+    def __init__(self, results: Iterable, all_species: tuple, all_locations: tuple, \
                  s3_url: str, s3_user: str, s3_pw: str, user_settings: dict, \
                  interval_minutes:int=DEFAULT_INTERVAL_MIN):
         """ Initializer
         Arguments:
-            results: the search results
+            results: the search results, which are only iterated over once
             all_locations: all the known locations
             all_species: all the known species
             s3_url: the URL of  the S3 instance
@@ -60,7 +112,6 @@ class Results:
         # problem ocurrs
         self._all_locations = all_locations
         self._all_species = all_species
-        self._results = results
         self._images = []
         self._locations = []
         self._species = []
@@ -71,6 +122,9 @@ class Results:
         self._year_images = []
         self._s3_info = {'url': s3_url, 'user': s3_user, 'pw': s3_pw}
         self._user_settings = user_settings
+        self._reductions = {}
+        self._reduction_stats = {'hits': 0, 'misses': 0, 'uncached': 0}
+        self._reduced_groups = set()
 
         # Check that we have results
         if results is None:
@@ -78,11 +132,9 @@ class Results:
 
         # Make sure results are iterable
         try:
-            _ = results[0]
+            results = iter(results)
         except TypeError:
             return
-        except IndexError:
-            return
 
         try:
             cur_images, cur_locations, cur_years, cur_species = self._initialize(results, \
@@ -92,19 +144,19 @@ class Results:
             print(ex, flush=True)
             return
 
-        # Sort images by year (we need a list of lists)
-        year_images = [[]] * len(cur_years)
-        for one_image in cur_images:
-            cur_index = cur_years.index(one_image['image_dt'].year)
-            year_images[cur_index].append(one_image)
-
         # Get pre-filtered lists of images
         by_location, by_species, by_year = self._prefilter(cur_images, cur_locations, cur_species, \
                                                                                         cur_years)
 
+        # Group the images so that subsets can be looked up
+        cube, cube_cells, irregular_species = self._build_cube(cur_images)
+
         # We are initialized, set our results
-        self._results = results
-        self._images = cur_images
+        self._images = CubeImages(cur_images, self, _CUBE_ALL)
+        self._cube = cube
+        self._cube_cells = cube_cells
+        self._cube_slices = {}
+        self._irregular_species = irregular_species
         self._locations = cur_locations
         self._species = cur_species
         self._years = cur_years
@@ -136,9 +188,59 @@ class Results:
 
     def have_results(self):
         """ Returns whether or not we have results """
-        return self._results is not None and len(self._results) > 0
+        return self._images is not None and len(self._images) > 0
 
-    def _initialize(self, results: tuple, all_locations: tuple) -> tuple:
+    def get_snapshot(self) -> dict:
+        """ Returns a compact copy of the results that can be saved as JSON
+        Return:
+            Returns the snapshot of the results that's used by from_snapshot()
+        Notes:
+            The S3 user and password are not included in the snapshot since it can be used
+            for other users' queries. Each image is stored as a
+            tuple of its location, name, bucket, S3 path, timestamp, ISO image date, and
+            a tuple of the (name, scientific name, count) of its species
+        """
+        return {'url': self._s3_info['url'],
+                'settings': self._user_settings,
+                'interval': self._interval_minutes,
+                'species': self._all_species,
+                'locations': self._all_locations,
+                'images': [(one_image['loc'], one_image['name'], one_image['bucket'],
+                            one_image['s3_path'], one_image.get('timestamp'),
+                            one_image['image_dt'].isoformat(),
+                            [(one_species.get('name'), one_species.get('scientificName'),
+                              one_species.get('count')) for one_species in one_image['species']])
+                                for one_image in self._images or []],
+               }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict, s3_user: str, s3_pw: str) -> 'Results':
+        """ Returns the results saved by get_snapshot()
+        Arguments:
+            snapshot: the saved snapshot
+            s3_user: the user name for S3
+            s3_pw: the password for S3
+        Return:
+            Returns a new instance of the results
+        """
+        results = ({'loc': loc,
+                    'images': [{'name': name,
+                                'bucket': bucket,
+                                's3_path': s3_path,
+                                'timestamp': timestamp,
+                                'image_dt': datetime.datetime.fromisoformat(image_dt),
+                                'species': [{'name': common_name,
+                                             'scientificName': scientific_name,
+                                             'count': count}
+                                        for common_name, scientific_name, count in species]
+                               }]
+                   } for loc, name, bucket, s3_path, timestamp, image_dt, species in \
+                                                                            snapshot['images'])
+
+        return cls(results, snapshot['species'], snapshot['locations'], snapshot['url'], \
+                   s3_user, s3_pw, snapshot['settings'], snapshot['interval'])
+
+    def _initialize(self, results: Iterable, all_locations: tuple) -> tuple:
         """ Returns the image, locations, years, and species of the search results
         Arguments:
             results: the search results
@@ -252,6 +354,116 @@ class Results:
 
         return locations_filtered, species_filtered, years_filtered
 
+    def _build_cube(self, images: tuple) -> tuple:
+        """ Groups the positions of the images by their year, month, location, species,
+            and hour
+        Arguments:
+            images: the date sorted images
+        Return:
+            Returns a tuple of the image positions keyed by their (year, month, location,
+            species, hour), the keys that have each value of each dimension, and the set of
+            species whose pre-filtered images don't match filtering by the species
+        Notes:
+            An image with more than one species has its position under each of its species
+        """
+        cube = {}
+        irregular_species = set()
+        for position, one_image in enumerate(images):
+            image_dt = one_image['image_dt']
+
+            # Count each species' entries that are used when pre-filtering
+            image_species = {}
+            for one_species in one_image['species']:
+                have_names = 'name' in one_species and 'scientificName' in one_species and \
+                                        one_species['name'] and one_species['scientificName']
+                species_name = one_species.get('scientificName')
+                image_species[species_name] = image_species.get(species_name, 0) + \
+                                                                        (1 if have_names else 0)
+
+            # Species with images that aren't pre-filtered, or are pre-filtered more than once
+            irregular_species.update(species_name for species_name, count in \
+                                                            image_species.items() if count != 1)
+
+            for species_name in image_species or (_CUBE_NO_SPECIES,):
+                cube_key = (image_dt.year, image_dt.month, one_image['loc'], species_name, \
+                                                                                image_dt.hour)
+                if cube_key in cube:
+                    cube[cube_key].append(position)
+                else:
+                    cube[cube_key] = [position]
+
+        cube_cells = tuple({} for _ in _CUBE_ALL)
+        for cube_key in cube:
+            for dimension, value in enumerate(cube_key):
+                if value in cube_cells[dimension]:
+                    cube_cells[dimension][value].append(cube_key)
+                else:
+                    cube_cells[dimension][value] = [cube_key]
+
+        return cube, cube_cells, irregular_species
+
+    def get_cube_images(self, cube_key: tuple) -> list:
+        """ Returns the images of a slice of the image cube
+        Arguments:
+            cube_key: the (year, month, location, species, hour) of the images
+        Return:
+            Returns the date sorted images
+        Notes:
+            Each slice is only gathered the first time it's asked for
+        """
+        found_images = self._cube_slices.get(cube_key)
+        if found_images is not None:
+            return found_images
+
+        fixed_values = tuple((dimension, value) for dimension, value in enumerate(cube_key) \
+                                                                    if value is not _CUBE_ANY)
+        if not fixed_values:
+            return self._images
+
+        # Gather the positions from the cells of the dimension with the fewest cells
+        positions = []
+        for cube_cell in min((self._cube_cells[dimension].get(value, ()) for dimension, value \
+                                                                    in fixed_values), key=len):
+            for dimension, value in fixed_values:
+                if cube_cell[dimension] != value:
+                    break
+            else:
+                positions.extend(self._cube[cube_cell])
+
+        # Images with more than one species can be in more than one cell
+        if cube_key[CUBE_SPECIES] is _CUBE_ANY:
+            positions = set(positions)
+
+        found_images = CubeImages((self._images[one_position] for one_position in \
+                                                            sorted(positions)), self, cube_key)
+        self._cube_slices[cube_key] = found_images
+
+        return found_images
+
+    def _filter_cube(self, images: tuple, dimension: int, value: object) -> Optional[list]:
+        """ Filters images that are a slice of the image cube by one more dimension
+        Arguments:
+            images: the images to filter
+            dimension: the dimension to filter on
+            value: the value of the dimension to filter on
+        Return:
+            Returns the filtered images, or None if the images aren't a slice of the cube
+        """
+        if not isinstance(images, CubeImages) or images.owner is not self:
+            return None
+
+        # Values that can't be looked up, such as lists, are left to the caller
+        try:
+            hash(value)
+        except TypeError:
+            return None
+
+        cube_key = images.cube_key
+        if cube_key[dimension] is not _CUBE_ANY:
+            return images if cube_key[dimension] == value else []
+
+        return self.get_cube_images(cube_key[:dimension] + (value,) + cube_key[dimension + 1:])
+
     def get_interval(self) -> int:
         """ Returns the image interval in seconds """
         return self._interval_minutes
@@ -329,7 +541,11 @@ class Results:
         """
         if self._location_images is not None:
             if location_id in self._location_images:
-                return self._location_images[location_id]
+                # Unknown locations are grouped together when pre-filtered
+                if location_id == 'unknown':
+                    return self._location_images[location_id]
+                return self.get_cube_images((_CUBE_ANY, _CUBE_ANY, location_id, _CUBE_ANY, \
+                                                                                    _CUBE_ANY))
             return ()
 
         raise RuntimeError('Call made to Results.get_location_images after bad initialization')
@@ -343,7 +559,10 @@ class Results:
         """
         if self._species_images is not None:
             if species_sci_name in self._species_images:
-                return self._species_images[species_sci_name]
+                if species_sci_name in self._irregular_species:
+                    return self._species_images[species_sci_name]
+                return self.get_cube_images((_CUBE_ANY, _CUBE_ANY, _CUBE_ANY, species_sci_name, \
+                                                                                    _CUBE_ANY))
             return ()
 
         raise RuntimeError('Call made to Results.get_species_images after bad initialization')
@@ -358,7 +577,7 @@ class Results:
         """
         if self._year_images is not None:
             if year in self._year_images:
-                return self._year_images[year]
+                return self.get_cube_images((year, _CUBE_ANY, _CUBE_ANY, _CUBE_ANY, _CUBE_ANY))
             return ()
 
         raise RuntimeError('Call made to Results.get_year_images after bad initialization')
@@ -459,6 +678,10 @@ class Results:
         Return:
             A tuple containing the images for that hour range
         """
+        found_images = self._filter_cube(images, CUBE_YEAR, year)
+        if found_images is not None:
+            return found_images
+
         return [one_image for one_image in images if \
                                             one_image['image_dt'].year == year]
 
@@ -471,6 +694,11 @@ class Results:
         Return:
             A tuple containing the images for that hour range
         """
+        if hour_end == hour_start + 1:
+            found_images = self._filter_cube(images, CUBE_HOUR, hour_start)
+            if found_images is not None:
+                return found_images
+
         return [one_image for one_image in images if \
                                             one_image['image_dt'].hour >= hour_start and \
                                             one_image['image_dt'].hour < hour_end]
@@ -483,6 +711,10 @@ class Results:
         Return:
             A tuple containing the images for that month
         """
+        found_images = self._filter_cube(images, CUBE_MONTH, month)
+        if found_images is not None:
+            return found_images
+
         return [one_image for one_image in images if one_image['image_dt'].month == month]
 
     def filter_month_list(self, images: tuple, months: tuple) -> tuple:
@@ -503,6 +735,10 @@ class Results:
         Return:
             A tuple containing the images for that location
         """
+        found_images = self._filter_cube(images, CUBE_LOCATION, location_id)
+        if found_images is not None:
+            return found_images
+
         return [one_image for one_image in images if one_image['loc'] == location_id]
 
     def filter_species(self, images: tuple, species_sci_name: str) -> tuple:
@@ -513,6 +749,10 @@ class Results:
         Return:
             A tuple containing the images for that species
         """
+        found_images = self._filter_cube(images, CUBE_SPECIES, species_sci_name)
+        if found_images is not None:
+            return found_images
+
         return [one_image for one_image in images if \
                                             Analysis.image_has_species(one_image, species_sci_name)]
 
@@ -522,7 +762,285 @@ class Results:
             images: the tuple of images to search
         Return:
             Returns the tuple consisting of the unique locations
+        Notes:
+            The locations are in the order they're first found in the images. The order of a
+            set of strings changes with each process's hash seed, which made the trap effort
+            and elevation sections of the same query come out in a different order after a
+            restart, in each gunicorn worker, and in each report worker process
         """
+        return tuple(dict.fromkeys(item['loc'] for item in images))
 
-        # pylint: disable=consider-using-set-comprehension
-        return tuple(set([item['loc'] for item in images]))
+    def _get_cube_columns(self) -> dict:
+        """ Returns the image cube dimensions of the images as arrays for grouped analysis
+        Return:
+            Returns a dictionary with the microsecond 'epochs' of the images relative to the
+            first image, the 'values' of each dimension as a list of arrays, the 'decode'
+            list of each dimension's values by code, and the 'species_codes' by species name.
+            The 'images' array has each image's position and the 'rows' array has the
+            position of each (image, species) pair, whose species codes are the values of the
+            species dimension. 'species_entries' has the (position, species) of each image's
+            species entries by scientific name
+        Notes:
+            The columns are only gathered the first time they're needed
+        """
+        if self._cube_columns is not None:
+            return self._cube_columns
+
+        first_dt = self._images[0]['image_dt'] if self._images else None
+        one_microsecond = datetime.timedelta(microseconds=1)
+        epochs, years, months, hours, locations = [], [], [], [], []
+        row_positions, row_species = [], []
+        location_codes, species_codes = {}, {}
+        species_entries = {}
+        for position, one_image in enumerate(self._images):
+            image_dt = one_image['image_dt']
+            epochs.append((image_dt - first_dt) // one_microsecond)
+            years.append(image_dt.year)
+            months.append(image_dt.month)
+            hours.append(image_dt.hour)
+            locations.append(location_codes.setdefault(one_image['loc'], len(location_codes)))
+
+            # Each image is grouped once for each different species it has
+            image_species = []
+            for one_species in one_image['species']:
+                species_name = one_species.get('scientificName')
+                species_entries.setdefault(species_name, []).append((position, one_species))
+                if species_name not in image_species:
+                    image_species.append(species_name)
+            for species_name in image_species or (_CUBE_NO_SPECIES,):
+                row_positions.append(position)
+                row_species.append(species_codes.setdefault(species_name, len(species_codes)))
+
+        self._cube_columns = {'epochs': np.array(epochs, dtype=np.int64),
+                              'images': np.arange(len(self._images)),
+                              'rows': np.array(row_positions, dtype=np.int64),
+                              'values': [np.array(years, dtype=np.int64),
+                                         np.array(months, dtype=np.int64),
+                                         np.array(locations, dtype=np.int64),
+                                         np.array(row_species, dtype=np.int64),
+                                         np.array(hours, dtype=np.int64)],
+                              'decode': [None, None, list(location_codes), list(species_codes), \
+                                         None],
+                              'species_codes': species_codes,
+                              'species_entries': species_entries,
+                             }
+
+        return self._cube_columns
+
+    def _reduce_cube_groups(self, reduction_key: tuple, cube_key: tuple, \
+                            reduce_groups: Callable, only_species: object) -> None:
+        """ Saves the analysis reduction of every slice of the image cube that has the same
+            dimensions as the cube key
+        Arguments:
+            reduction_key: the kind of reduction and any values that it depends on
+            cube_key: the (year, month, location, species, hour) of a slice
+            reduce_groups: called with the sorted microsecond timestamps, the image positions,
+                    and the first row of each group to compute the reduction of each group
+            only_species: when the species is a dimension, only the slices of this species
+                    are reduced unless it's _CUBE_ANY
+        """
+        columns = self._get_cube_columns()
+        dimensions = tuple(dimension for dimension, value in enumerate(cube_key) \
+                                                                    if value is not _CUBE_ANY)
+
+        # Species rows repeat images that have more than one species
+        if CUBE_SPECIES in dimensions:
+            row_indexes = slice(None)
+            if only_species is not _CUBE_ANY:
+                row_indexes = columns['values'][CUBE_SPECIES] == \
+                                                columns['species_codes'].get(only_species, -1)
+            positions = columns['rows'][row_indexes]
+            row_values = [columns['values'][dimension][row_indexes] if dimension == CUBE_SPECIES \
+                          else columns['values'][dimension][positions] for dimension in dimensions]
+        else:
+            positions = columns['images']
+            row_values = [columns['values'][dimension] for dimension in dimensions]
+
+        # Combine the dimension values into one group code and order the rows by group and date
+        group_codes = np.zeros(len(positions), dtype=np.int64)
+        for one_values in row_values:
+            unique_values, value_codes = np.unique(one_values, return_inverse=True)
+            group_codes = group_codes * len(unique_values) + value_codes.reshape(-1)
+        row_order = np.lexsort((positions, group_codes))
+        group_codes = group_codes[row_order]
+        positions = positions[row_order]
+        group_starts = np.flatnonzero(np.append(True, group_codes[1:] != group_codes[:-1])) \
+                                                    if len(group_codes) else np.array([], dtype=int)
+
+        group_values = reduce_groups(columns['epochs'][positions], positions, group_starts)
+
+        # Save the reduction with the cube key of each group
+        key_values = [itertools.repeat(_CUBE_ANY) for _ in _CUBE_ALL]
+        for dimension, one_values in zip(dimensions, row_values):
+            key_values[dimension] = one_values[row_order][group_starts].tolist()
+            if columns['decode'][dimension] is not None:
+                key_values[dimension] = [columns['decode'][dimension][one_code] \
+                                                        for one_code in key_values[dimension]]
+
+        self._reductions.update(((one_key,) + reduction_key, one_value) for one_key, one_value \
+                                            in zip(zip(*key_values), group_values.tolist()))
+        self._reduced_groups.add((dimensions,) + reduction_key)
+
+    def _reduce_images(self, reduction_key: tuple, images: tuple, reduce_func: Callable, \
+                       reduce_groups: Callable, only_species: object=_CUBE_ANY) -> int:
+        """ Returns the analysis reduction of the images, only computing it once for each slice
+            of the image cube
+        Arguments:
+            reduction_key: the kind of reduction and any values that it depends on
+            images: the tuple of images to reduce
+            reduce_func: called with the images to compute the reduction
+            reduce_groups: called with the sorted microsecond timestamps, the image positions,
+                    and the first row of each group to compute the reduction of each group
+            only_species: when the species is a dimension, only the slices of this species
+                    are reduced together unless it's _CUBE_ANY
+        Return:
+            Returns the reduction of the images
+        Notes:
+            Images that aren't a slice of this instance's image cube are always reduced.
+            The first time a slice is reduced, all the slices with the same dimensions are
+            reduced together
+        """
+        if not isinstance(images, CubeImages) or images.owner is not self:
+            self._reduction_stats['uncached'] += 1
+            return reduce_func(images)
+
+        cube_reduction_key = (images.cube_key,) + reduction_key
+        found_value = self._reductions.get(cube_reduction_key)
+        if found_value is not None:
+            self._reduction_stats['hits'] += 1
+            return found_value
+
+        self._reduction_stats['misses'] += 1
+        dimensions = tuple(dimension for dimension, value in enumerate(images.cube_key) \
+                                                                    if value is not _CUBE_ANY)
+        if (dimensions,) + reduction_key not in self._reduced_groups:
+            self._reduce_cube_groups(reduction_key, images.cube_key, reduce_groups, only_species)
+            found_value = self._reductions.get(cube_reduction_key)
+
+        # Slices without any images, or of other species, aren't one of the groups
+        if found_value is None:
+            found_value = reduce_func(images)
+            self._reductions[cube_reduction_key] = found_value
+
+        return found_value
+
+    def _get_abundance_counts(self, species_filter: Optional[str]) -> np.ndarray:
+        """ Returns the most animals in each image for calculating abundance
+        Arguments:
+            species_filter: optional name of a specific species to count
+        Return:
+            Returns the counts by image position
+        """
+        columns = self._get_cube_columns()
+        counts = np.zeros(len(self._images), dtype=np.int64)
+        for species_name, species_entries in columns['species_entries'].items():
+            if species_filter is not None and species_name != species_filter:
+                continue
+            for position, one_species in species_entries:
+                counts[position] = max(counts[position], int(one_species['count']))
+
+        return counts
+
+    def activity_for_image_list(self, images: tuple) -> int:
+        """ Returns the number of distinct actions of the images
+        Arguments:
+            images: the tuple of images to process
+        Return:
+            The number of distinct actions found
+        Notes:
+            See Analysis.activity_for_image_list()
+        """
+        return self._reduce_images(('activity',), images, Analysis.activity_for_image_list, \
+                    lambda epochs, _, group_starts: Analysis.activity_for_groups(epochs, \
+                                                                                 group_starts))
+
+    def period_for_image_list(self, images: tuple) -> int:
+        """ Returns the number of distinct periods of the images using the image interval
+        Arguments:
+            images: the tuple of images to process
+        Return:
+            The number of distinct periods found
+        Notes:
+            See Analysis.period_for_image_list()
+        """
+        return self._reduce_images(('period', self._interval_minutes), images, \
+                    lambda images: Analysis.period_for_image_list(images, self._interval_minutes), \
+                    lambda epochs, _, group_starts: Analysis.period_for_groups(epochs, \
+                                                            group_starts, self._interval_minutes))
+
+    def abundance_for_image_list(self, images: tuple, species_filter: str=None) -> int:
+        """ Returns the abundance of the images using the image interval
+        Arguments:
+            images: the tuple of images to process
+            species_filter: optional name of a specific species to look for
+        Return:
+            The abundance of the images
+        Notes:
+            See Analysis.abundance_for_image_list()
+        """
+        return self._reduce_images(('abundance', self._interval_minutes, species_filter), \
+                    images, lambda images: Analysis.abundance_for_image_list(images, \
+                                                        self._interval_minutes, species_filter), \
+                    lambda epochs, positions, group_starts: Analysis.abundance_for_groups(epochs, \
+                                self._get_abundance_counts(species_filter)[positions], \
+                                group_starts, self._interval_minutes), \
+                    _CUBE_ANY if species_filter is None else species_filter)
+
+    def get_species_hour_activity(self) -> dict:
+        """ Returns the activity and number of images of each species for each hour of the day
+        Return:
+            Returns a dictionary with the 'index' of each species' row by scientific name, the
+            'activity' and 'images' arrays with a row for each species and a column for each
+            hour, and the 'activity_totals' and 'image_totals' arrays of each species
+        Notes:
+            The species' images and hours are found the same way as get_species_images() and
+            filter_hours(). The arrays are only calculated the first time they're needed
+        """
+        if self._species_hours is not None:
+            return self._species_hours
+
+        if self._species is None:
+            raise RuntimeError('Call made to Results.get_species_hour_activity after bad ' \
+                                                                                'initialization')
+
+        activity = np.zeros((len(self._species), HOURS_IN_DAY), dtype=np.int64)
+        images = np.zeros((len(self._species), HOURS_IN_DAY), dtype=np.int64)
+        activity_totals = np.zeros(len(self._species), dtype=np.int64)
+        image_totals = np.zeros(len(self._species), dtype=np.int64)
+        for row, one_species in enumerate(self._species):
+            species_images = self.get_species_images(one_species['scientificName'])
+            activity_totals[row] = self.activity_for_image_list(species_images)
+            image_totals[row] = len(species_images)
+            for one_hour in range(0, HOURS_IN_DAY):
+                species_hour_images = self.filter_hours(species_images, one_hour, one_hour + 1)
+                activity[row, one_hour] = self.activity_for_image_list(species_hour_images)
+                images[row, one_hour] = len(species_hour_images)
+
+        self._species_hours = {'index': {one_species['scientificName']: row \
+                                                for row, one_species in enumerate(self._species)},
+                               'activity': activity,
+                               'images': images,
+                               'activity_totals': activity_totals,
+                               'image_totals': image_totals,
+                              }
+
+        return self._species_hours
+
+    def add_reduction_stats(self, reduction_stats: dict) -> None:
+        """ Adds the analysis reduction counts of formatting done with a copy of the results
+        Arguments:
+            reduction_stats: the 'hits', 'misses', and 'uncached' counts to add
+        """
+        for one_key, one_count in reduction_stats.items():
+            self._reduction_stats[one_key] += one_count
+
+    def get_reduction_stats(self) -> dict:
+        """ Returns how often analysis reductions were reused
+        Return:
+            Returns a dictionary with the number of 'hits' of saved reductions, 'misses' that
+            were computed and saved, 'uncached' reductions of images that aren't a slice of the
+            image cube, and the 'hit_rate' of the reductions that could be saved
+        """
+        saved_count = self._reduction_stats['hits'] + self._reduction_stats['misses']
+        return self._reduction_stats | {'hit_rate': \
+                    (self._reduction_stats['hits'] / saved_count if saved_count else 0.0)}
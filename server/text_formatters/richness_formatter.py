@@ -3,7 +3,6 @@
 import dataclasses
 import os
 
-from .analysis import Analysis
 from .results import Results
 
 # pylint: disable=consider-using-f-string
@@ -41,8 +40,7 @@ class RichnessFormatter:
                 location_species_images = results.filter_species(location_images, \
                                                                         species['scientificName'])
 
-                period = Analysis.period_for_image_list(location_species_images, \
-                                                                            results.get_interval())
+                period = results.period_for_image_list(location_species_images)
                 horizontal_richness = horizontal_richness + (0 if period == 0 else 1)
                 result += '{:5d}  '.format(period)
 
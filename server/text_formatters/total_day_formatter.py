@@ -3,7 +3,6 @@
 import dataclasses
 import os
 
-from .analysis import Analysis
 from .results import Results
 
 # pylint: disable=consider-using-f-string
@@ -47,8 +46,7 @@ class TotalDayFormatter:
                         year_location_month_images = results.filter_month(year_location_images,
                                                                           one_month)
 
-                        period = Analysis.period_for_image_list(year_location_month_images,
-                                                                results.get_interval())
+                        period = results.period_for_image_list(year_location_month_images)
                         total = total + period
                         result += '{:5d} '.format(period)
 
@@ -66,8 +64,7 @@ class TotalDayFormatter:
                                                             location['idProperty']),
                                                         one_month)
 
-                    period = Analysis.period_for_image_list(year_location_month_images,
-                                                                            results.get_interval())
+                    period = results.period_for_image_list(year_location_month_images)
                     total_pic += period
                     total_period += period
                     total_pics[one_month] += period
@@ -148,8 +145,7 @@ class TotalDayFormatter:
             for one_month in range(0, 12):
                 location_month_images = results.filter_month(location_images, one_month)
 
-                period = Analysis.period_for_image_list(location_month_images,
-                                                                            results.get_interval())
+                period = results.period_for_image_list(location_month_images)
                 pics_in_year = pics_in_year + period
                 result += '{:5d} '.format(period)
 
@@ -165,8 +161,7 @@ class TotalDayFormatter:
                                                                         location['idProperty']),
                                                             one_month)
 
-                period = Analysis.period_for_image_list(location_month_images,
-                                                                            results.get_interval())
+                period = results.period_for_image_list(location_month_images)
                 total_pic += period
                 total_period += period
                 total_pics[one_month] += period
@@ -256,8 +251,7 @@ class TotalDayFormatter:
                         year_species_month_images = results.filter_month(year_species_images,
                                                                          one_month)
 
-                        period = Analysis.period_for_image_list(year_species_month_images,
-                                                                            results.get_interval())
+                        period = results.period_for_image_list(year_species_month_images)
                         total = total + period
                         result += '{:5d} '.format(period)
                         total_richness[one_month] = total_richness[one_month] + \
@@ -277,8 +271,7 @@ class TotalDayFormatter:
                 for location in results.get_locations():
                     year_month_location_images = results.filter_location(year_month_images,
                                                                          location['idProperty'])
-                    period = Analysis.period_for_image_list(year_month_location_images,
-                                                            results.get_interval())
+                    period = results.period_for_image_list(year_month_location_images)
                     total_pic = total_pic + period
                     total_period = total_period + period
                     total_pics[one_month] = total_pics[one_month] + period
@@ -364,8 +357,7 @@ class TotalDayFormatter:
             total = 0
             for one_month in range(0, 12):
                 species_month_images = results.filter_month(species_images, one_month)
-                period = Analysis.period_for_image_list(species_month_images,
-                                                                            results.get_interval())
+                period = results.period_for_image_list(species_month_images)
                 total = total + period
                 result += '{:5d} '.format(period)
                 total_richness[one_month] = total_richness[one_month] + (0 if period == 0 else 1)
@@ -386,8 +378,7 @@ class TotalDayFormatter:
                                                                         location['idProperty']),
                                                     one_year)
 
-                    period = Analysis.period_for_image_list(month_location_year_images,
-                                                                            results.get_interval())
+                    period = results.period_for_image_list(month_location_year_images)
                     total_pic = total_pic + period
                     total_period = total_period + period
                     total_pics[one_month] = total_pics[one_month] + period
@@ -484,8 +475,7 @@ class TotalDayFormatter:
                             for one_month in range(0, 12):
                                 syl_month_images = results.filter_month(
                                                             species_year_location_images, one_month)
-                                period = Analysis.period_for_image_list(syl_month_images,
-                                                                            results.get_interval())
+                                period = results.period_for_image_list(syl_month_images)
                                 total = total + period
                                 result += '{:5d} '.format(period)
 
@@ -507,8 +497,7 @@ class TotalDayFormatter:
                             smy_location_images = results.filter_location(
                                                                     species_month_year_images,
                                                                     location['idProperty'])
-                            period = Analysis.period_for_image_list(smy_location_images,
-                                                                            results.get_interval())
+                            period = results.period_for_image_list(smy_location_images)
                             total_pic = total_pic + period
                             total_period = total_period + period
                             total_pics[one_month] = total_pics[one_month] + period
@@ -591,8 +580,7 @@ class TotalDayFormatter:
                         for one_year in results.get_years():
                             lsm_year_images = results.filter_year(location_species_month_images,
                                                                   one_year)
-                            period = Analysis.period_for_image_list(lsm_year_images,
-                                                                            results.get_interval())
+                            period = results.period_for_image_list(lsm_year_images)
                             total_period = total_period + period
                             total = total + period
 
@@ -617,8 +605,7 @@ class TotalDayFormatter:
                                                                         species_month_images,
                                                                         one_year),
                                                                     location['idProperty'])
-                        period = Analysis.period_for_image_list(sm_year_location_images,
-                                                                            results.get_interval())
+                        period = results.period_for_image_list(sm_year_location_images)
                         total_pic = total_pic + period
                         total_period = total_period + period
                         total_pics[one_month] = total_pics[one_month] + period
@@ -715,9 +702,8 @@ class TotalDayFormatter:
                                 syl_month_images = results.filter_month(
                                                                     species_year_location_images,
                                                                     one_month)
-                                abundance = Analysis.abundance_for_image_list(syl_month_images,
-                                                                        results.get_interval(),
-                                                                        species['scientificName'])
+                                abundance = results.abundance_for_image_list(syl_month_images, \
+                                                                          species['scientificName'])
                                 total = total + abundance
                                 result += '{:5d} '.format(abundance)
 
@@ -736,8 +722,7 @@ class TotalDayFormatter:
                             sym_location_images = results.filter_location(
                                                                         species_year_month_images,
                                                                         location['idProperty'])
-                            period = Analysis.period_for_image_list(sym_location_images,
-                                                                            results.get_interval())
+                            period = results.period_for_image_list(sym_location_images)
                             total_pic = total_pic + period
                             total_period = total_period + period
                             total_pics[one_month] = total_pics[one_month] + period
@@ -757,9 +742,8 @@ class TotalDayFormatter:
                             sym_location_images = results.filter_location(
                                                                         species_year_month_images,
                                                                         location['idProperty'])
-                            abundance = Analysis.abundance_for_image_list(sym_location_images,
-                                                                        results.get_interval(),
-                                                                        species['scientificName'])
+                            abundance = results.abundance_for_image_list(sym_location_images, \
+                                                                         species['scientificName'])
                             total_abundance_pics = total_abundance_pics + abundance
                             total_abundance = total_abundance + abundance
 
@@ -855,9 +839,8 @@ class TotalDayFormatter:
                                                                   one_year)
 
                             abundance = abundance + \
-                                        Analysis.abundance_for_image_list(slm_year_images,
-                                                                          results.get_interval(),
-                                                                          species['scientificName'])
+                                        results.abundance_for_image_list(slm_year_images, \
+                                                                         species['scientificName'])
                             total = total + abundance
 
                         result += '{:5d} '.format(abundance)
@@ -870,8 +853,7 @@ class TotalDayFormatter:
             total_pics = [0] * 12
             for one_month in range(0, 12):
                 species_month_images = results.filter_month(species_images, one_month)
-                period = Analysis.period_for_image_list(species_month_images,
-                                                                            results.get_interval())
+                period = results.period_for_image_list(species_month_images)
                 total_pic = total_pic + period
                 total_pics[one_month] = period
                 result += '{:5d} '.format(period)
@@ -892,9 +874,8 @@ class TotalDayFormatter:
                         sml_year_images = results.filter_year(species_month_location_images,
                                                               one_year)
                         abundance = abundance + \
-                                    Analysis.abundance_for_image_list(sml_year_images,
-                                                                      results.get_interval(),
-                                                                      species['scientificName'])
+                                    results.abundance_for_image_list(sml_year_images, \
+                                                                     species['scientificName'])
 
                     total_abundance_pics = total_abundance_pics + abundance
                     total_abundance = total_abundance + abundance
@@ -996,8 +977,7 @@ class TotalDayFormatter:
                                                                        one_year)
                     if species_location_year_images:
                         period_total = period_total + \
-                                    Analysis.period_for_image_list(species_location_year_images,
-                                                                            results.get_interval())
+                                    results.period_for_image_list(species_location_year_images)
 
                 effort_total = 0
                 for one_year in results.get_years():
@@ -1093,14 +1073,12 @@ class TotalDayFormatter:
                         species_year_location_images = results.filter_location(species_year_images,
                                                                             location2['idProperty'])
                         by_species_period = by_species_period + \
-                            Analysis.period_for_image_list(species_year_location_images,
-                                                                            results.get_interval())
+                            results.period_for_image_list(species_year_location_images)
 
                     species_location_year_images = results.filter_year(species_location_images,
                                                                        one_year)
                     by_species_and_loc_period = by_species_and_loc_period + \
-                                    Analysis.period_for_image_list(species_location_year_images,
-                                                                            results.get_interval())
+                                    results.period_for_image_list(species_location_year_images)
 
                 result  += '{:6.2f} '.format(0.0 if by_species_period == 0 else \
                                 100.0 * float(by_species_and_loc_period) / float(by_species_period))